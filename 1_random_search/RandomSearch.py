@@ -1,13 +1,26 @@
 import multiprocessing
-import random
+import numpy as np
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from ..common.Lexicon import Lexicon
 from ..common.Judge import Judge
+from ..common.CompiledLexicon import CompiledLexicon
 from datetime import datetime
 from ..common.PriorityQueue import PriorityQueue
+from ..common.TopK import TopK
+from ..common.PermutationGenerator import PermutationGenerator
+from ..common.Budget import Budget
+from ..common.Screen import Screen
+from ..common.CubeGeometry import CubeGeometry
 
-#create objects for Lexicon and Judge
-lex = Lexicon()
-judge = Judge(lex.alphabet,lex.word_list)
+#the number of cubes, and of faces (colors) per cube
+geometry = CubeGeometry(cubes=6, faces=6)
+
+#created by load, from the lexicon read by the main process
+judge = None
+base_permutation = None
+screen = None
 
 #import number of past iterations
 past_iterations_file = open('out/random_search/iterations.txt', 'r')
@@ -29,147 +42,374 @@ for name in best.keys():
     for item in best_data:
         wc, permutation, found_at = item[:-1].split(',')
         wc = int(wc)
-        pq.put(wc,(permutation,found_at))
+        pq.put(wc,0,(permutation,found_at))
     
     best[name] = pq
 
 
-top_mono_wc, top_mono_per = best['mono_max'].peek()
-top_rainbow_wc, top_rainbow_per = best['rainbow_max'].peek()
-top_sum_wc, top_sum_per = best['sum_max'].peek()
+top_mono_wc, top_mono_sub, top_mono_per = best['mono_max'].peek()
+top_rainbow_wc, top_rainbow_sub, top_rainbow_per = best['rainbow_max'].peek()
+top_sum_wc, top_sum_sub, top_sum_per = best['sum_max'].peek()
+
 
-num_cubes = 6
-base_permutation = [lex.alphabet[i] for i in lex.calculate_letter_reps(num_cubes)[1]]
+def load(compiled:CompiledLexicon, base:list, screen_spec:dict=None):
+    """
+    Creates the judge used by run from a compiled lexicon, and sets the letters of the random permutations,
+    and the screen of the screening mode when screen_spec is given (see Screen.spec).
+    Only the main process reads and compiles the lexicon, the workers attach to a shared memory copy
+    of it (see init_worker), so importing this module in a worker does not read or parse anything
+    """
+    global judge, base_permutation, screen
+    judge = Judge(compiled.alphabet, None, compiled=compiled, geometry=geometry)
+    base_permutation = base
+    screen = Screen(judge, **screen_spec) if screen_spec is not None else None
 
 
-def random_permutation():
+def init_worker(shared:dict, base:list, screen_spec:dict=None):
     """
-    Creates a random permutation from reps_lits_indices
+    Initializer of the pool workers, attaches once to the compiled lexicon shared by the main process
+    (see CompiledLexicon.share), so every chunk the worker runs afterwards starts right away
     """
-    permutation = base_permutation.copy()
-    for i in range(len(permutation)):
-        #get a random index from the permutation list
-        j = random.randint(0,len(permutation)-1)
-        
-        #swap the item at index i with the item at index j
-        permutation[i],permutation[j] = permutation[j],permutation[i]
-    return permutation  
+    load(CompiledLexicon.attach(shared), base, screen_spec)
+
 
+def screened_counts(indices:np.ndarray, fraction:float, mono_floor:int, audit:bool, screening:dict)->tuple:
+    """
+    Scores a block of candidates in two stages: every candidate is scored by the screen (exact mono words, and
+    rainbow words estimated from a subset of the lexicon), and only the ones that pass it (see Screen.select) get a full count.
+    Returns a two-item tuple with the list of (mono, rainbow) counts aligned with indices, None for the rejected candidates,
+    and the boolean mask of the candidates that passed.
+    When audit is True every candidate gets a full count, and the candidates that should have passed (by their full counts)
+    but were rejected are added to the false rejections of screening
 
-def run(max_iterations=100, shared_list:list=[], lock=None)-> tuple:
+    Parameters
+    ----------
+    indices:np.ndarray
+        (candidates x positions) array of alphabet indices
+
+    fraction:float
+        the fraction of the block that passes the screen, see Screen.select
+
+    mono_floor:int
+        the mono words that always pass the screen, i.e. the mono record
+
+    audit:bool
+        True to fully score the whole block
+
+    screening:dict
+        the counters of the screening mode, see run
+    """
+    mono, rainbow = screen.score_many(indices)
+    passed = screen.select(mono, rainbow, fraction, mono_floor)
+    screening['screened'] += len(indices)
+
+    if audit:
+        full_mono, full_rainbow = judge.count_words_many(indices)
+        should_pass = screen.select(full_mono, full_rainbow, fraction, mono_floor)
+        screening['full'] += len(indices)
+        screening['audited'] += int(should_pass.sum())
+        screening['false_rejections'] += int((should_pass & ~passed).sum())
+        return list(zip(full_mono, full_rainbow)), passed
+
+    counts = [None]*len(indices)
+    selected = np.flatnonzero(passed)
+    full_mono, full_rainbow = judge.count_words_many(indices[selected])
+    for i, selected_mono, selected_rainbow in zip(selected, full_mono, full_rainbow):
+        counts[i] = (selected_mono, selected_rainbow)
+    screening['full'] += len(selected)
+    return counts, passed
+
+
+def screening_summary(screening:dict)->str:
+    """
+    Returns a line with the full counts and the false rejection rate of the screening mode
+    """
+    line = ('screen: '+str(screening['full'])+' full counts for '+str(screening['screened'])+' candidates ('
+            +format(100*screening['full']/max(1, screening['screened']), '.1f')+'%)')
+    if screening['audited'] == 0:
+        return line+', no audited blocks'
+    return (line+', false rejection rate '+format(100*screening['false_rejections']/screening['audited'], '.2f')+'% ('
+            +str(screening['false_rejections'])+' of '+str(screening['audited'])+' audited candidates that should pass), '
+            +str(screening['missed_records'])+' audited records rejected')
+
+
+def run(max_iterations=100, results=None, batch_size:int=1, first_iteration:int=0, generator:PermutationGenerator=None,
+        budget:Budget=None, fraction:float=1.0, audit_rate:float=0.0)-> tuple:
     """
     will create random permutations looking only for the best permutation 
-    for mono words, for the specified number of iterations
+    for mono words, for the specified number of iterations, or until budget is exhausted when it is given
+    (it then also keeps the best sum of mono and rainbow words, see Budget.improve).
+    The permutations are drawn from generator in blocks (see PermutationGenerator.batch), a new unseeded
+    generator of base_permutation when it is None.
+    When batch_size is greater than 1, the permutations are drawn and scored
+    batch_size at a time with judge.count_words_many.
+    When a screen is loaded (see load) and fraction is less than 1, the permutations are scored in two stages
+    (see screened_counts), and a share audit_rate of the blocks is fully scored to measure the false rejections.
+    The updates, the best permutations of every queue (as a TopK) and the counters of the screening mode
+    are sent to the main process as a single message through results, a multiprocessing.Queue, and also returned.
+    The iterations are numbered from first_iteration (after the past iterations)
     """
     process_name = multiprocessing.current_process().name
     mono_q = PriorityQueue(10)
-    mono_q.put(top_mono_wc, top_mono_per)
+    mono_q.put(top_mono_wc, top_mono_sub, top_mono_per)
 
     rainbow_q = PriorityQueue(5)
-    rainbow_q.put(top_rainbow_wc, top_rainbow_per)
+    rainbow_q.put(top_rainbow_wc, top_rainbow_sub, top_rainbow_per)
 
     sum_q = PriorityQueue(5)
-    sum_q.put(top_sum_wc, top_sum_per)
+    sum_q.put(top_sum_wc, top_sum_sub, top_sum_per)
 
 
-    #will keep count of how many iterations are performed
-    iterations=0
+    #the budget keeps count of how many iterations are performed
+    if budget is None:
+        budget = Budget(max_iterations)
     
     #will keep track of how many times the current process 
     #found a better permutation than the one in record
     updates = {'mono_max':[], 'rainbow_max':[], 'sum_max':[]}
-    
-    while iterations < max_iterations:
-        #increase the iteration count
-        iterations +=1
 
-        #generate new random permutation
-        permutation = random_permutation()
-        
-        string_version = ''.join(permutation)
+    if generator is None:
+        generator = PermutationGenerator(judge.compiled.alphabet, base_permutation)
 
-        #get the total mono words that can be spelled
-        mono, rainbow = judge.count_words(permutation)
-        
-        sum = mono + rainbow
-        current_iteration = iterations+past_iterations
-        
-        #increase the number of updates for every case
-        if mono >= mono_q.peek()[0]:
-            updates['mono_max'].append(current_iteration)
-        
-        if rainbow >= rainbow_q.peek()[0]:
-            updates['rainbow_max'].append(current_iteration)
-        
-        if sum >= sum_q.peek()[0]:
-            updates['sum_max'].append(current_iteration)
+    #the permutations scored one by one are still drawn a block at a time
+    block_size = batch_size if batch_size > 1 else 1024
 
-        #try to add to their respective priority queues regardless
-        mono_q.put(mono,(string_version,current_iteration))      
-        rainbow_q.put(rainbow,(string_version,current_iteration))
-        sum_q.put(sum, (string_version, current_iteration))      
+    #candidates screened, fully counted, that should pass the screen in the audited blocks, and that were rejected anyway,
+    #and the records (of any queue) that were rejected in the audited blocks
+    screening = {'screened':0, 'full':0, 'audited':0, 'false_rejections':0, 'missed_records':0}
+    screened = screen is not None and fraction < 1
+    if screened:
+        #the audited blocks are picked with their own stream, so the permutations are the same with or without audits
+        audits = np.random.default_rng(generator.seed_sequence.spawn(1)[0])
+    
+    while not budget.exhausted():
+        #draw new random permutations, as alphabet indices
+        indices = generator.batch(budget.remaining(block_size))
+        permutations = generator.strings(indices)
+        passed = None
+
+        #get the total mono and rainbow words that can be spelled
+        if screened:
+            audit = audits.random() < audit_rate
+            counts, passed = screened_counts(indices, fraction, mono_q.peek()[0], audit, screening)
+            if not audit:
+                passed = None
+        elif batch_size > 1:
+            counts = zip(*judge.count_words_many(indices))
+            screening['full'] += len(indices)
+        else:
+            counts = (judge.count_words(permutation) for permutation in permutations)
+            screening['full'] += len(indices)
+
+        for i, (string_version, count) in enumerate(zip(permutations, counts)):
+            #increase the iteration count
+            budget.spend()
+
+            #rejected by the screen
+            if count is None:
+                continue
+
+            mono, rainbow = int(count[0]), int(count[1])
+            
+            sum = mono + rainbow
+            current_iteration = budget.evaluations+past_iterations+first_iteration
+            budget.improve(sum, mono, rainbow)
+            
+            #increase the number of updates for every case
+            if mono >= mono_q.peek()[0]:
+                updates['mono_max'].append(current_iteration)
+            
+            if rainbow >= rainbow_q.peek()[0]:
+                updates['rainbow_max'].append(current_iteration)
+            
+            if sum >= sum_q.peek()[0]:
+                updates['sum_max'].append(current_iteration)
+
+            #a record of an audited block that the screen rejected would have been lost
+            if passed is not None and not passed[i] and (mono >= mono_q.peek()[0] or rainbow >= rainbow_q.peek()[0] or sum >= sum_q.peek()[0]):
+                screening['missed_records'] += 1
+
+            #try to add to their respective priority queues regardless
+            mono_q.put(mono, rainbow, (string_version,current_iteration))      
+            rainbow_q.put(rainbow, mono, (string_version,current_iteration))
+            sum_q.put(sum, mono, (string_version, current_iteration))      
+
+            #the permutations that are scored one by one stop as soon as the time is up
+            if batch_size == 1 and budget.exhausted():
+                break
         
 
-    with lock:
-        shared_list.append((process_name,{
-            'mono_max': ([str(item) for item in updates['mono_max']], mono_q),
-            'rainbow_max': ([str(item) for item in updates['rainbow_max']], rainbow_q),
-            'sum_max': ([str(item) for item in updates['sum_max']], sum_q)}))
+    output = (process_name,{
+        'mono_max': ([str(item) for item in updates['mono_max']], TopK.from_queue(mono_q)),
+        'rainbow_max': ([str(item) for item in updates['rainbow_max']], TopK.from_queue(rainbow_q)),
+        'sum_max': ([str(item) for item in updates['sum_max']], TopK.from_queue(sum_q))}, screening)
 
+    if results is not None:
+        results.put(output)
+    return output
 
 
-if __name__ == '__main__':
-    
 
-    #A manager for multiprocessing
-    manager = multiprocessing.Manager()
-    #a lock object
-    lock = multiprocessing.Lock()
+def run_chunk(first_iteration:int, size:int, seed:int, batch_size:int=1, deadline:float=None,
+              fraction:float=1.0, audit_rate:float=0.0)->tuple:
+    """
+    Runs a chunk of the random search in a pool worker, and returns a three-item tuple with the first iteration
+    of the chunk, the output of run, and the Budget of the chunk (with the evaluations it did and its best sum).
+    The chunk stops early at deadline, the time.time() instant when the budget of the whole search is exhausted.
+    Every chunk draws from its own stream of seed, numbered with first_iteration (see PermutationGenerator.substream),
+    so the chunks are independent and a chunk that is run again gives the same result.
+    fraction and audit_rate are the ones of the screening mode, see run
+    """
+    budget = Budget(size, deadline=deadline)
+    generator = PermutationGenerator(judge.compiled.alphabet, base_permutation, seed).substream(first_iteration)
+    output = run(size, None, batch_size, first_iteration, generator, budget, fraction, audit_rate)
+    return first_iteration, output, budget
+
 
-    iterations = 150000
-    processes = 10 #Dont change this number
-    processes_list = []
+def search(shared:dict, base:list, iterations:int, workers:int=None, chunk_size:int=None,
+           batch_size:int=1, seed:int=2000, retries:int=3, max_seconds:float=None,
+           screen_fraction:float=1.0, screen_size:int=1000, audit_rate:float=0.05, calibration_size:int=300)->tuple:
+    """
+    Runs the random search on a pool of worker processes, that attach once to the shared compiled lexicon
+    (see init_worker) and then run chunks of chunk_size iterations (see run_chunk).
+    The results of every chunk are merged as soon as it is done, so when a worker crashes only the chunks
+    that were not done yet are lost, and those are run again on a new pool (up to retries times).
+    The search stops after iterations evaluations, or after max_seconds (every running chunk stops at the same
+    deadline, and the chunks that start later do nothing).
+    In the screening mode (screen_fraction less than 1) the main process first picks the subset of the lexicon
+    of the screen from calibration_size fully scored random permutations (see Screen.calibrate), and every chunk then
+    only fully scores the candidates that pass the screen (see run).
+    Returns a four-item tuple with the merged TopK and the updates of every queue, the Budget of the search,
+    with the evaluations it did and the best sum found (see Budget.summary), and the counters of the screening mode
+    (see screening_summary)
 
-    #create a shared list
-    shared_output = manager.list()
+    Parameters
+    ----------
+    shared:dict
+        the spec of the shared compiled lexicon, see CompiledLexicon.share
 
-    #initialize, name and start 5 processes for mono and 5 others for rainbow
-    for i in range(processes):
+    base:list
+        the letters of the random permutations
 
-        #mono process
-        p = multiprocessing.Process(target=run, args=(iterations, shared_output, lock))
-        p.name = str(i)
-        #append to their respective lists and start them
-        processes_list.append(p)
-        p.start()
-        print(p.name,"started...")
+    iterations:int
+        the total number of random permutations
 
+    workers:int
+        optional, the number of worker processes. default value is None, for the number of cores
 
-    #join the processes
-    for p in processes_list:
-        p.join()
-    
+    chunk_size:int
+        optional, the number of iterations of every chunk. default value is None, for about
+        four chunks per worker (at most 5000 iterations), so that every worker stays busy until the end
 
-    #export results
-    for process_name, data_dictionary in shared_output:
+    batch_size:int
+        the batch_size of run
+
+    seed:int
+        the seed of the random number generators of the chunks
+
+    retries:int
+        the number of times the pool is restarted after a worker crashes
+
+    max_seconds:float
+        optional, the wall-clock budget in seconds. default value is None, for no limit
+
+    screen_fraction:float
+        the fraction of every block of candidates that gets a full count, see Screen.select.
+        default value is 1.0, which fully scores every candidate without a screen
+
+    screen_size:int
+        the number of signatures of the lexicon that the screen checks for rainbow words
+
+    audit_rate:float
+        the share of the blocks of candidates that are fully scored anyway, to measure the false rejections of the screen
 
-        for key, value in data_dictionary.items():
-            updates_file = open("output/"+str(key)+"_iterations"+".txt",'a')
+    calibration_size:int
+        the number of random permutations that the screen is calibrated with
+    """
+    workers = workers or os.cpu_count() or 1
+    chunk_size = chunk_size or max(1, min(5000, -(-iterations // (4*workers))))
+
+    #first iteration:size of the chunks that are not done
+    pending = {first: min(chunk_size, iterations-first) for first in range(0, iterations, chunk_size)}
+    chunks = len(pending)
+
+    tops = {key: TopK.from_queue(q) for key, q in best.items()}
+    updates = {key: [] for key in best}
+    budget = Budget(iterations, max_seconds)
+    screening = {'screened':0, 'full':0, 'audited':0, 'false_rejections':0, 'missed_records':0}
+    crashes = 0
+
+    screen_spec = None
+    if screen_fraction < 1:
+        #the calibration sample comes from the root stream of seed, the chunks draw from its substreams
+        sample = PermutationGenerator(judge.compiled.alphabet, base, seed).batch(calibration_size)
+        screen_spec = Screen.calibrate(judge, sample, screen_size).spec()
+
+    while pending:
+        with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(shared, base, screen_spec)) as pool:
+            futures = [pool.submit(run_chunk, first, size, seed, batch_size, budget.deadline, screen_fraction, audit_rate)
+                       for first, size in pending.items()]
+            try:
+                for future in as_completed(futures):
+                    first, (process_name, data_dictionary, chunk_screening), chunk_budget = future.result()
+                    del pending[first]
+                    budget.spend(chunk_budget.evaluations)
+                    if chunk_budget.best is not None:
+                        budget.improve(*chunk_budget.best)
+                    for key, count in chunk_screening.items():
+                        screening[key] += count
+
+                    for key, (chunk_updates, top) in data_dictionary.items():
+                        updates[key] += chunk_updates
+                        tops[key] = TopK.merge([tops[key], top], tops[key].capacity)
+
+                    print('chunk '+str(chunks-len(pending))+'/'+str(chunks)+', '+str(budget.evaluations)+' evaluations, '
+                          +format(budget.evaluations/budget.elapsed(), '.0f')+' evaluations/second, best '
+                          +str(tops['mono_max'].priorities[0])+' mono '+str(tops['rainbow_max'].priorities[0])+' rainbow')
+
+            except BrokenProcessPool:
+                crashes += 1
+                if crashes > retries:
+                    raise
+                print('a worker crashed, '+str(len(pending))+' chunks are run again')
+
+    return tops, updates, budget, screening
+
+
+if __name__ == '__main__':
+    lex = Lexicon()
+    load(lex.compile(), [lex.alphabet[i] for i in lex.calculate_letter_reps(geometry)[1]])
+
+    #the workers read the compiled lexicon from this block, instead of reading the spreadsheet again
+    memory, shared = judge.compiled.share()
+
+    iterations = 1500000 #CHANGE, the evaluation budget
+    max_seconds = None #CHANGE, the wall-clock budget, None for no limit
+    workers = os.cpu_count() #CHANGE
+    chunk_size = None #CHANGE, None for about four chunks per worker
+    screen_fraction = 1.0 #CHANGE, the fraction of the candidates that get a full count, 1.0 to fully score them all
+    audit_rate = 0.05 #CHANGE, the share of the blocks that are fully scored to measure the false rejections of the screen
 
-            #unpacking data: (list, PriorityQueue)
-            updates, q = value
-            updates = ", ".join(updates)
-            updates_file.write("after a batch of "+str(iterations)+" iterations, updates were found in iterations: "+updates+'\n')
-            updates_file.close()
+    tops, updates, budget, screening = search(shared, base_permutation, iterations, workers, chunk_size, max_seconds=max_seconds,
+                                              screen_fraction=screen_fraction, audit_rate=audit_rate)
 
-            while not q.is_empty():
-                p,d = q.get()
-                best[key].put(p, d)
+    memory.close()
+    memory.unlink()
 
-    for name, q in best.items():
+    print(budget.summary('random search with '+str(workers)+' workers'))
+    if screen_fraction < 1:
+        print(screening_summary(screening))
+
+    #export results
+    for key, found in updates.items():
+        updates_file = open("output/"+str(key)+"_iterations"+".txt",'a')
+        found = ", ".join(sorted(found, key=int))
+        updates_file.write("after a batch of "+str(budget.evaluations)+" iterations, updates were found in iterations: "+found+'\n')
+        updates_file.close()
+
+    for name, top in tops.items():
         best_file = open("output/"+str(name)+"_best"+".txt",'w')
-        while not q.is_empty():
-            number, data = q.get()
+        for number, sub, data in top:
             permutation, update = data
             best_file.write(str(number)+','+str(permutation)+','+str(update)+'\n')
         
@@ -177,10 +417,7 @@ if __name__ == '__main__':
 
     #export number of past iterations
     past_iterations_file = open('out/iterations.txt', 'w')
-    past_iterations_file.write(str(past_iterations + iterations))
+    past_iterations_file.write(str(past_iterations + budget.evaluations))
     past_iterations_file.close()
 
     print('Program DONE!')
-
-
-
@@ -0,0 +1,37 @@
+import os
+from ..common.Lexicon import Lexicon
+from . import RandomSearch
+
+#times the process pool of RandomSearch.search, in evaluations per second, with a single chunk run in the
+#main process (no pool, see RandomSearch.run_chunk) and then with pools of 1, 2, 4, ... workers up to the number of cores.
+#The speed-up is against the run without a pool, so it includes the start-up and the merging of the pool
+
+evaluations = 100000 #CHANGE, the evaluation budget of every run
+batch_size = 1 #CHANGE, the batch_size of RandomSearch.run
+seed = 2000
+
+if __name__ == '__main__':
+    lex = Lexicon()
+    RandomSearch.load(lex.compile(), [lex.alphabet[i] for i in lex.calculate_letter_reps(RandomSearch.geometry)[1]])
+    memory, shared = RandomSearch.judge.compiled.share()
+
+    workers = [None]
+    while (workers[-1] or 0) < os.cpu_count():
+        workers.append(2*workers[-1] if workers[-1] else 1)
+
+    try:
+        results = []
+        for count in workers:
+            if count is None:
+                budget = RandomSearch.run_chunk(0, evaluations, seed, batch_size)[2]
+            else:
+                budget = RandomSearch.search(shared, RandomSearch.base_permutation, evaluations, count,
+                                             batch_size=batch_size, seed=seed)[2]
+            results.append((count, budget.evaluations/budget.elapsed()))
+    finally:
+        memory.close()
+        memory.unlink()
+
+    print('workers      evaluations/second   speed-up')
+    for count, rate in results:
+        print(format(str(count or 'none'), '<12'), format(rate, '>18.0f'), format(rate/results[0][1], '>10.2f')+'x')
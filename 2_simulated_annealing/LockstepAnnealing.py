@@ -0,0 +1,254 @@
+import os
+import numpy as np
+from ..common.Lexicon import Lexicon
+from ..common.Judge import Judge
+from ..common.CubeGeometry import CubeGeometry
+from ..common.PermutationGenerator import PermutationGenerator
+from ..common.Budget import Budget
+
+
+class LockstepAnnealing:
+    """
+    Class that runs many independent simulated annealing chains in lockstep, in a single process.
+    The permutations of all the chains are held as a (chains x positions) array of alphabet indices, and at every step
+    every chain proposes a swap of two random positions, all the neighbours are scored with a single batched Judge call
+    (Judge.count_words_many, or Judge.count_mono_many when only the mono words are maximized), and the acceptance test
+    runs in NumPy with the temperature of every chain. So a few hundred chains share one lexicon, and the per-chain
+    best permutations give the distribution of the results of the search, instead of a single run.
+
+    Parameters
+    ----------
+    judge : Judge
+        the compiled mode Judge that scores the neighbours
+
+    base : list
+        the letters of every permutation, i.e. the letter repetitions (see Lexicon.calculate_letter_reps)
+
+    chains : int
+        the number of chains
+
+    measure : str
+        the maximized score, 'mono', 'rainbow' or 'both' (mono + rainbow). default value is 'rainbow'
+
+    temperature : float
+        the starting temperature, the same for every chain or an array with one per chain
+
+    cooling_rate : float
+        the temperature of every chain is multiplied by it after every step, one for every chain or an array with one per chain
+
+    start : list
+        optional, the permutation every chain starts from. default value is None, for a different random permutation per chain
+
+    seed : int
+        the seed of the random starts, of the proposals and of the acceptance tests
+
+    Methods
+    -------
+    count(states:np.ndarray)->tuple
+        Returns the (mono, rainbow) counts of a batch of permutations
+
+    score(mono:np.ndarray, rainbow:np.ndarray)->np.ndarray
+        Returns the maximized score of every permutation
+
+    step()->int
+        Proposes, scores and accepts or rejects one neighbour per chain
+
+    improve(budget:Budget)
+        Records the best permutation of all the chains in a budget
+
+    run(steps:int=None, max_evaluations:int=None, max_seconds:float=None)->Budget
+        Runs the chains for a number of steps, or until the budget is exhausted
+
+    best_permutations()->list
+        Returns the best permutation of every chain, with its counts
+
+    distribution()->dict
+        Returns the distribution of the best scores of the chains
+    """
+
+    def __init__(self,
+                 judge: Judge,
+                 base: list,
+                 chains: int = 256,
+                 measure: str = 'rainbow',
+                 temperature: float = 1000,
+                 cooling_rate: float = 0.9999,
+                 start: list = None,
+                 seed: int = 2000):
+        self.judge = judge
+        self.chains = chains
+        self.measure = measure
+        self.generator = PermutationGenerator(judge.alphabet, base, seed)
+        self.rng = np.random.default_rng(self.generator.seed_sequence.spawn(1)[0])
+
+        self.temperatures = np.broadcast_to(np.asarray(temperature, dtype=np.float64), (chains,)).copy()
+        self.cooling_rates = np.broadcast_to(np.asarray(cooling_rate, dtype=np.float64), (chains,)).copy()
+
+        # (chains x positions) alphabet indices of the current permutation of every chain
+        if start is None:
+            self.states = self.generator.batch(chains)
+        else:
+            self.states = np.tile(self.judge.compiled.permutation_indices(start).astype(np.uint8), (chains, 1))
+        self.rows = np.arange(chains)
+
+        self.mono, self.rainbow = self.count(self.states)
+        self.scores = self.score(self.mono, self.rainbow)
+
+        # the best permutation of every chain, and its counts
+        self.best_states = self.states.copy()
+        self.best_scores = self.scores.copy()
+        self.best_mono = self.mono.copy()
+        self.best_rainbow = self.rainbow.copy()
+
+        self.steps = 0
+        self.accepted = np.zeros(chains, dtype=np.int64)
+
+    def count(self, states: np.ndarray) -> tuple:
+        """
+        Returns the (mono, rainbow) counts of a batch of permutations, the rainbow words are only counted
+        when they are maximized (they are -1 otherwise, see best_permutations)
+        """
+        if self.measure == 'mono':
+            return self.judge.count_mono_many(states.astype(np.intp)), np.full(len(states), -1, dtype=np.int64)
+        return self.judge.count_words_many(states.astype(np.intp))
+
+    def score(self, mono: np.ndarray, rainbow: np.ndarray) -> np.ndarray:
+        """
+        Returns the maximized score of every permutation
+        """
+        if self.measure == 'mono':
+            return mono
+        if self.measure == 'rainbow':
+            return rainbow
+        return mono + rainbow
+
+    def step(self):
+        """
+        Proposes a swap of two different random positions for every chain, scores all the neighbours at once,
+        and accepts every neighbour that is better, or worse with probability exp(delta/temperature), in NumPy.
+        A swap of two equal letters gives the same permutation, so it is accepted without being scored.
+        Returns the number of neighbours scored
+        """
+        n, positions = self.states.shape
+        a = self.rng.integers(0, positions, n)
+        b = (a + self.rng.integers(1, positions, n)) % positions
+        u = self.rng.random(n)
+
+        first, second = self.states[self.rows, a], self.states[self.rows, b]
+        same = first == second
+        changed = np.flatnonzero(~same)
+
+        #the neighbour of a swap of two equal letters is the permutation itself, and is always accepted
+        self.accepted[same] += 1
+
+        neighbours = self.states[changed]
+        neighbours[np.arange(len(changed)), a[changed]] = second[changed]
+        neighbours[np.arange(len(changed)), b[changed]] = first[changed]
+        mono, rainbow = self.count(neighbours)
+        scores = self.score(mono, rainbow)
+
+        delta = (scores - self.scores[changed]).astype(np.float64)
+        with np.errstate(over='ignore'):
+            accept = (delta > 0) | (u[changed] < np.exp(delta / self.temperatures[changed]))
+
+        moved = changed[accept]
+        self.states[moved] = neighbours[accept]
+        self.scores[moved] = scores[accept]
+        self.mono[moved] = mono[accept]
+        self.rainbow[moved] = rainbow[accept]
+        self.accepted[moved] += 1
+
+        improved = moved[self.scores[moved] > self.best_scores[moved]]
+        self.best_states[improved] = self.states[improved]
+        self.best_scores[improved] = self.scores[improved]
+        self.best_mono[improved] = self.mono[improved]
+        self.best_rainbow[improved] = self.rainbow[improved]
+
+        self.temperatures *= self.cooling_rates
+        self.steps += 1
+        return len(changed)
+
+    def run(self, steps: int = None, max_evaluations: int = None, max_seconds: float = None) -> Budget:
+        """
+        Runs the chains for a number of steps, or until the evaluation budget (the neighbours scored by all the chains)
+        or the wall-clock budget is exhausted, and returns the Budget with the summary of the run (see Budget.summary)
+
+        Parameters
+        ----------
+        steps : int
+            optional, the number of steps of every chain. default value is None, for no limit (then a budget must be given)
+
+        max_evaluations : int
+            optional, the evaluation budget. default value is None, for no limit
+
+        max_seconds : float
+            optional, the wall-clock budget in seconds. default value is None, for no limit
+        """
+        budget = Budget(max_evaluations, max_seconds)
+        self.improve(budget)
+        last_step = None if steps is None else self.steps + steps
+        while (last_step is None or self.steps < last_step) and not budget.exhausted():
+            budget.spend(self.step())
+            self.improve(budget)
+        return budget
+
+    def improve(self, budget: Budget):
+        """
+        Records the best permutation of all the chains in the budget, its rainbow words are counted
+        when only the mono words are maximized
+        """
+        i = int(np.argmax(self.best_scores))
+        rainbow = self.best_rainbow[i]
+        if rainbow < 0 and (budget.best is None or self.best_scores[i] > budget.best[0]):
+            rainbow = self.judge.count_words_many(self.best_states[i:i+1].astype(np.intp))[1][0]
+        budget.improve(self.best_scores[i], self.best_mono[i], rainbow)
+
+    def best_permutations(self) -> list:
+        """
+        Returns the best permutation of every chain as a list of (score, mono, rainbow, permutation) tuples,
+        from the best to the worst. When only the mono words are maximized, the rainbow words of the best
+        permutations are counted here
+        """
+        if self.measure == 'mono':
+            self.best_mono, self.best_rainbow = self.judge.count_words_many(self.best_states.astype(np.intp))
+        order = np.argsort(-self.best_scores, kind='stable')
+        permutations = self.generator.strings(self.best_states[order])
+        return [(int(score), int(mono), int(rainbow), permutation) for score, mono, rainbow, permutation
+                in zip(self.best_scores[order], self.best_mono[order], self.best_rainbow[order], permutations)]
+
+    def distribution(self) -> dict:
+        """
+        Returns the distribution of the best scores of the chains: their mean, standard deviation, minimum,
+        5th, 25th, 50th, 75th and 95th percentiles and maximum, and the mean acceptance rate of the chains
+        (the accepted neighbours per step, including the swaps of two equal letters)
+        """
+        scores = self.best_scores.astype(np.float64)
+        percentiles = np.percentile(scores, [5, 25, 50, 75, 95])
+        return {'chains': self.chains, 'steps': self.steps, 'mean': scores.mean(), 'std': scores.std(),
+                'min': scores.min(), 'p5': percentiles[0], 'p25': percentiles[1], 'median': percentiles[2],
+                'p75': percentiles[3], 'p95': percentiles[4], 'max': scores.max(),
+                'acceptance': self.accepted.mean() / max(1, self.steps)}
+
+
+if __name__ == '__main__':
+    geometry = CubeGeometry(cubes=6, faces=6)
+    lex = Lexicon()
+    judge = Judge(lex.alphabet, lex.word_list, compiled=lex.compile(), geometry=geometry)
+
+    annealing = LockstepAnnealing(judge, lex.calculate_letter_reps(geometry)[2], chains=256, measure='rainbow',
+                                  temperature=1000, cooling_rate=0.999)
+    budget = annealing.run(steps=5000)
+    print(budget.summary('lockstep annealing ' + annealing.measure + ' with ' + str(annealing.chains) + ' chains'))
+
+    distribution = annealing.distribution()
+    print(', '.join(key + ' ' + format(value, '.2f' if isinstance(value, float) else 'd') for key, value in distribution.items()))
+
+    # Save the distribution and the best permutation of every chain to a file
+    output_dir = 'output'
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, f'lockstep_{annealing.measure}_max.txt'), 'w') as f:
+        for key, value in distribution.items():
+            f.write(f"{key}: {value}\n")
+        f.write("\n")
+        for score, mono, rainbow, permutation in annealing.best_permutations():
+            f.write(f"Score: {score}, Mono: {mono}, Rainbow: {rainbow}, Permutation: {permutation}\n")
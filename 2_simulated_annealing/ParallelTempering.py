@@ -0,0 +1,325 @@
+import math
+import os
+import random
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from ..common.Lexicon import Lexicon
+from ..common.Judge import Judge
+from ..common.CompiledLexicon import CompiledLexicon
+from ..common.HallOfFame import HallOfFame
+from ..common.PriorityQueue import PriorityQueue
+from ..common.CubeSymmetry import CubeSymmetry
+from ..common.CubeGeometry import CubeGeometry
+from ..common.Budget import Budget
+
+#created by load, from the compiled lexicon shared by the main process
+judge = None
+symmetry = None
+
+
+def load(compiled:CompiledLexicon, geometry:CubeGeometry):
+    """
+    Creates the judge and the symmetry used by anneal, from a compiled lexicon
+    """
+    global judge, symmetry
+    judge = Judge(compiled.alphabet, None, compiled=compiled, geometry=geometry)
+    symmetry = CubeSymmetry(compiled.alphabet, geometry)
+
+
+def init_worker(shared:dict, geometry:CubeGeometry):
+    """
+    Initializer of the pool workers, attaches once to the compiled lexicon shared by the main process
+    (see CompiledLexicon.share)
+    """
+    load(CompiledLexicon.attach(shared), geometry)
+
+
+def measure_score(mono:int, rainbow:int, measure:str)->tuple:
+    """
+    Returns the (priority, sub) of a permutation for the maximized measure, 'mono', 'rainbow' or 'both'
+    """
+    if measure == 'mono':
+        return mono, rainbow
+    if measure == 'rainbow':
+        return rainbow, mono
+    return mono + rainbow, mono
+
+
+def anneal(letters:str, temperature:float, steps:int, measure:str, seed:int, archive_size:int=10,
+           min_distance:int=3, deadline:float=None)->tuple:
+    """
+    Runs a chain of the Metropolis algorithm at a fixed temperature for a number of steps (or until deadline, a time.time() instant),
+    where every step swaps two random letters and is accepted when the score goes up, or with probability
+    exp(delta/temperature) otherwise. A neighbour stops being counted as soon as it can not be accepted (see SwapScorer.count_swap_until).
+    Returns a five-item tuple with the last permutation (as a string), its (mono, rainbow) counts, the HallOfFame of the
+    permutations the chain accepted, the Budget of the chain (with its steps and best score) and the number of accepted steps.
+    The accepted permutations go to a plain PriorityQueue of candidates while the chain runs, and only the best candidates
+    are put in the HallOfFame at the end (its canonical keys and distances cost more than a step)
+
+    Parameters
+    ----------
+    letters:str
+        the permutation that the chain starts from
+
+    temperature:float
+        the temperature of the chain
+
+    steps:int
+        the number of steps
+
+    measure:str
+        the maximized score, 'mono', 'rainbow' or 'both' (mono + rainbow)
+
+    seed:int
+        the seed of the random number generator of the chain
+
+    archive_size:int
+        the capacity of the HallOfFame of the chain
+
+    min_distance:int
+        the min_distance of the HallOfFame of the chain
+
+    deadline:float
+        optional, the time.time() instant when the chain stops. default value is None, for no limit
+    """
+    rng = random.Random(seed)
+    budget = Budget(steps, deadline=deadline)
+    archive = HallOfFame(archive_size, symmetry, min_distance)
+    #several candidates per archive slot, since close and equivalent permutations are rejected by the archive
+    candidates = PriorityQueue(4*archive_size)
+
+    scorer = judge.swap_scorer(letters)
+    mono, rainbow = scorer.count_words()
+    score, sub = measure_score(mono, rainbow, measure)
+    candidates.put(score, sub, (''.join(scorer.letters), mono, rainbow))
+    budget.improve(score, mono, rainbow)
+
+    positions = range(len(scorer.letters))
+    accepted = 0
+    while not budget.exhausted():
+        budget.spend()
+        a, b = rng.sample(positions, 2)
+
+        #a worse neighbour is accepted when u < exp(delta/temperature), i.e. delta > temperature*log(u),
+        #one is taken off the lowest accepted score so that rounding never rejects a neighbour the test would accept
+        u = rng.random()
+        target = min(score + 1, math.floor(score + temperature*math.log(u))) if u > 0 else 0
+
+        #when the count stops early it is an upper bound below the target, so the neighbour is rejected
+        neighbour_mono, neighbour_rainbow, exact = scorer.count_swap_until(a, b, target, measure, stop_above=False)
+        if not exact:
+            continue
+
+        neighbour_score, neighbour_sub = measure_score(neighbour_mono, neighbour_rainbow, measure)
+        delta = neighbour_score - score
+        if delta > 0 or u < math.exp(delta/temperature):
+            mono, rainbow = scorer.apply_swap(a, b)
+            score, sub = neighbour_score, neighbour_sub
+            accepted += 1
+            if not candidates.is_full() or (score, sub) > candidates.peek_last()[:2]:
+                candidates.put(score, sub, (''.join(scorer.letters), mono, rainbow))
+            budget.improve(score, mono, rainbow)
+
+    #from the best candidate to the worst, so the archive rejects the rest with its cheap floor check once it is full
+    while not candidates.is_empty():
+        archive.put(*candidates.get())
+
+    return ''.join(scorer.letters), (mono, rainbow), archive, budget, accepted
+
+
+class ParallelTempering:
+    """
+    Class that implements parallel tempering (replica exchange) for the simulated annealing search.
+    A number of replicas (chains) run at fixed temperatures, from a geometric ladder between t_min and t_max, on a pool of
+    worker processes. After every round of steps, the permutations of adjacent temperatures are swapped with the
+    replica exchange probability min(1, exp((1/T_cold - 1/T_hot)*(score_hot - score_cold))), alternating the even and odd pairs,
+    so good permutations found by the hot replicas move down to the cold ones, and the cold replicas can escape local maxima.
+    The accepted permutations of every replica are merged into a single HallOfFame, the archive.
+
+    Parameters
+    ----------
+    compiled:CompiledLexicon
+        the compiled lexicon, that is shared with the workers (see CompiledLexicon.share)
+
+    geometry:CubeGeometry
+        the number of cubes, and of faces (colors) per cube. default value is None, for 6 cubes with 6 faces
+
+    measure:str
+        the maximized score, 'mono', 'rainbow' or 'both' (mono + rainbow). default value is 'rainbow'
+
+    replicas:int
+        the number of replicas. default value is None, for the number of cores (at least 4)
+
+    t_min:float
+        the temperature of the coldest replica
+
+    t_max:float
+        the temperature of the hottest replica
+
+    steps:int
+        the number of steps of every replica between two exchanges
+
+    workers:int
+        the number of worker processes. default value is None, for the number of cores
+
+    archive_size:int
+        the capacity of the archive
+
+    min_distance:int
+        the min_distance of the archive, see HallOfFame
+
+    seed:int
+        the seed of the chains and of the exchanges
+
+    Methods
+    -------
+    run(start:list, rounds:int=None, max_evaluations:int=None, max_seconds:float=None)->HallOfFame
+        Runs the replicas from a permutation until the rounds or the budget are exhausted, and returns the archive
+
+    exchange(round_number:int)
+        Swaps the permutations of adjacent temperatures
+
+    exchange_rates()->list
+        Returns the share of accepted exchanges of every pair of adjacent temperatures
+    """
+
+    def __init__(self,
+                 compiled: CompiledLexicon,
+                 geometry: CubeGeometry = None,
+                 measure: str = 'rainbow',
+                 replicas: int = None,
+                 t_min: float = 1,
+                 t_max: float = 1000,
+                 steps: int = 500,
+                 workers: int = None,
+                 archive_size: int = 10,
+                 min_distance: int = 3,
+                 seed: int = 2000):
+        self.compiled = compiled
+        self.geometry = geometry if geometry is not None else CubeGeometry()
+        self.measure = measure
+        self.workers = workers or os.cpu_count() or 1
+        self.replicas = replicas or max(4, self.workers)
+        self.steps = steps
+        self.archive_size = archive_size
+        self.min_distance = min_distance
+        self.seed = seed
+
+        # geometric ladder, from the coldest to the hottest replica
+        ratios = np.arange(self.replicas) / max(1, self.replicas - 1)
+        self.temperatures = (t_min * (t_max / t_min) ** ratios).tolist()
+
+        self.symmetry = CubeSymmetry(compiled.alphabet, self.geometry)
+        self.archive = HallOfFame(archive_size, self.symmetry, min_distance)
+        self.rng = random.Random(seed)
+
+        # permutation (as a string) and (mono, rainbow) counts of the replica at every temperature
+        self.states = []
+        # attempted and accepted exchanges of every pair of adjacent temperatures
+        self.attempts = [0] * (self.replicas - 1)
+        self.accepts = [0] * (self.replicas - 1)
+        # steps and accepted steps at every temperature
+        self.proposed = [0] * self.replicas
+        self.accepted = [0] * self.replicas
+
+    def exchange(self, round_number: int):
+        """
+        Swaps the permutations of adjacent temperatures with the replica exchange probability,
+        the even pairs (0-1, 2-3, ...) after the even rounds and the odd pairs (1-2, 3-4, ...) after the odd rounds.
+        """
+        for cold in range(round_number % 2, self.replicas - 1, 2):
+            hot = cold + 1
+            cold_score = measure_score(*self.states[cold][1], self.measure)[0]
+            hot_score = measure_score(*self.states[hot][1], self.measure)[0]
+            exponent = (1 / self.temperatures[cold] - 1 / self.temperatures[hot]) * (hot_score - cold_score)
+
+            self.attempts[cold] += 1
+            if exponent >= 0 or self.rng.random() < math.exp(exponent):
+                self.accepts[cold] += 1
+                self.states[cold], self.states[hot] = self.states[hot], self.states[cold]
+
+    def exchange_rates(self) -> list:
+        """
+        Returns the share of accepted exchanges of every pair of adjacent temperatures, from the coldest pair to the hottest.
+        Rates close to 0 mean that the temperatures are too far apart.
+        """
+        return [accepts / attempts if attempts else 0.0 for accepts, attempts in zip(self.accepts, self.attempts)]
+
+    def run(self, start: list, rounds: int = None, max_evaluations: int = None, max_seconds: float = None) -> HallOfFame:
+        """
+        Runs every replica from the start permutation, for a number of rounds of steps, or until the evaluation budget
+        (the steps of all the replicas) or the wall-clock budget is exhausted, and prints the summary of the run
+        (see Budget.summary), the acceptance rates of the temperatures and the exchange rates. Returns the archive.
+
+        Parameters
+        ----------
+        start : list
+            the permutation, as a list of letters or a string, that every replica starts from
+
+        rounds : int
+            optional, the number of rounds. default value is None, for no limit (then a budget must be given)
+
+        max_evaluations : int
+            optional, the evaluation budget. default value is None, for no limit
+
+        max_seconds : float
+            optional, the wall-clock budget in seconds. default value is None, for no limit
+        """
+        budget = Budget(max_evaluations, max_seconds)
+        counts = Judge(self.compiled.alphabet, None, compiled=self.compiled, geometry=self.geometry).count_words(start)
+        self.states = [(''.join(start), counts) for _ in range(self.replicas)]
+        budget.improve(measure_score(*counts, self.measure)[0], *counts)
+
+        #the workers read the compiled lexicon from this block, instead of compiling it again
+        memory, shared = self.compiled.share()
+        try:
+            with ProcessPoolExecutor(self.workers, initializer=init_worker, initargs=(shared, self.geometry)) as pool:
+                round_number = 0
+                while (rounds is None or round_number < rounds) and not budget.exhausted():
+                    #every replica gets its own stream of the seed, for every round
+                    steps = -(-budget.remaining(self.steps * self.replicas) // self.replicas)
+                    seeds = [int(np.random.SeedSequence(self.seed, spawn_key=(round_number, replica)).generate_state(1)[0])
+                             for replica in range(self.replicas)]
+                    futures = [pool.submit(anneal, letters, temperature, steps, self.measure, seed,
+                                           self.archive_size, self.min_distance, budget.deadline)
+                               for (letters, counts), temperature, seed in zip(self.states, self.temperatures, seeds)]
+
+                    for replica, future in enumerate(futures):
+                        letters, counts, archive, chain_budget, accepted = future.result()
+                        self.states[replica] = (letters, counts)
+                        self.proposed[replica] += chain_budget.evaluations
+                        self.accepted[replica] += accepted
+                        self.archive.merge(archive)
+                        budget.spend(chain_budget.evaluations)
+                        if chain_budget.best is not None:
+                            budget.improve(*chain_budget.best)
+
+                    self.exchange(round_number)
+                    round_number += 1
+        finally:
+            memory.close()
+            memory.unlink()
+
+        print(budget.summary('parallel tempering ' + self.measure + ' with ' + str(self.replicas) + ' replicas'))
+        print('acceptance rates: ' + ', '.join(format(accepted / max(1, proposed), '.2f')
+                                               for accepted, proposed in zip(self.accepted, self.proposed)))
+        print('exchange rates: ' + ', '.join(format(rate, '.2f') for rate in self.exchange_rates()))
+        return self.archive
+
+
+if __name__ == '__main__':
+    geometry = CubeGeometry(cubes=6, faces=6)
+    lex = Lexicon()
+
+    tempering = ParallelTempering(lex.compile(), geometry, measure='rainbow', t_min=1, t_max=1000, steps=500)
+    archive = tempering.run(lex.calculate_letter_reps(geometry)[2], max_evaluations=250000)
+
+    # Save the contents of the archive to a file
+    output_dir = 'output'
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, f'parallel_tempering_{tempering.measure}_max.txt'), 'w') as f:
+        f.write(f"Temperatures: {', '.join(format(t, '.1f') for t in tempering.temperatures)}\n")
+        f.write(f"Steps per exchange: {tempering.steps}\n\n")
+        while not archive.is_empty():
+            score, sub, (permutation, mono, rainbow) = archive.get()
+            f.write(f"Score: {score}, Mono: {mono}, Rainbow: {rainbow}, Permutation: {permutation}\n")
@@ -2,45 +2,85 @@ import math
 import random
 from ..common.Lexicon import Lexicon
 from ..common.Judge import Judge
-from ..common.PriorityQueue import PriorityQueue
+from ..common.HallOfFame import HallOfFame
+from ..common.CubeSymmetry import CubeSymmetry
+from ..common.ScoreCache import ScoreCache
+from ..common.CubeGeometry import CubeGeometry
+from ..common.Budget import Budget
+from ..common.CoolingSchedule import GeometricSchedule, LundyMeesSchedule, AcceptanceSchedule, ReheatSchedule, RestartSchedule
 import os
 
 #set seed
 random.seed(2000)
 
 
+#the number of cubes, and of faces (colors) per cube
+geometry = CubeGeometry(cubes=6, faces=6)
+
 #create objects for Lexicon and Judge
 lex = Lexicon()
-judge = Judge(lex.alphabet,lex.word_list)
+judge = Judge(lex.alphabet,lex.word_list, compiled=lex.compile(), geometry=geometry)
+
+#canonical keys and distances of the permutations, for the cache and the hall of fame
+symmetry = CubeSymmetry(lex.alphabet, geometry)
 
 
 
 def get_neighbour(current):
     """
-    Creates a new permutation by swapping two random elements
+    Picks the two random elements that are swapped to create a neighbour permutation
     """
-    permutation = current.copy()
+    a, b = random.sample(range(len(current)), 2)
 
-    a, b = random.sample(range(len(permutation)), 2)
-    permutation[a], permutation[b] = permutation[b], permutation[a]
+    return a, b
 
-    return permutation
+
+def lowest_accepted(current_wc, temperature, first, second):
+    """
+    Returns a score that every neighbour accepted by the acceptance test below reaches,
+    given the two random numbers of the test
+    """
+    #a worse neighbour is accepted when first < second < exp(delta/temperature), i.e. delta > temperature*log(second)
+    #one is taken off the bound so that rounding never rejects a neighbour the test would accept
+    if first < second and second > 0:
+        return min(current_wc + 1, math.floor(current_wc + temperature*math.log(second)))
+    return current_wc + 1
 
 
 
 #Run the simulated annealing algorithm
 
 maximization_case = 'rainbow' #CHANGE TO 'mono' or 'rainbow' or 'both'
-queue = PriorityQueue(10) #queue just used to keep track of the n best permutations found
+#queue just used to keep track of the n best permutations found,
+#that are at least min_distance letters apart (more than one swap) so they are not n copies of the same one
+queue = HallOfFame(10, symmetry, min_distance=3)
 
 #initialize the simulated annealing parameters
 temperature = 1000
 cooling_rate = 0.9999
-maximum_iterations = 250000 #CHANGE
+maximum_iterations = 250000 #CHANGE, the evaluation budget
+maximum_seconds = None #CHANGE, the wall-clock budget, None for no limit
+use_cache = True #CHANGE, remembers the scores of the permutations that were already visited
+early_abort = True #CHANGE, stops scoring a neighbour once it can not be accepted
+
+#the temperature of every step, CHANGE to LundyMeesSchedule(temperature, 1, maximum_iterations),
+#AcceptanceSchedule(temperature, steps=maximum_iterations), and/or wrap it in ReheatSchedule(...)
+#(reheats on stagnation) or RestartSchedule(...) (restarts from the best permutation of the queue on stagnation)
+schedule = GeometricSchedule(temperature, cooling_rate)
+
 
+current = lex.calculate_letter_reps(geometry)[2]
 
-current = lex.calculate_letter_reps(6)[2]
-current_mono, current_rainbow = judge.count_words(current)
+#the scorer holds the current permutation, and scores neighbours by only re-checking
+#the words that contain the two swapped letters
+scorer = judge.swap_scorer(current)
+current = scorer.letters
+current_mono, current_rainbow = scorer.count_words()
+
+cache = ScoreCache(judge, symmetry=symmetry) if use_cache else None
+
+#every neighbour is one evaluation, the search stops when either budget is exhausted
+budget = Budget(maximum_iterations, maximum_seconds)
 
 #set the priority number and sub (priority) number based on the specified maximization case
 if maximization_case == 'mono':
@@ -50,13 +90,40 @@ elif maximization_case == 'rainbow':
 else:
     current_wc, sub = current_mono + current_rainbow, current_mono
 #P0 means that this is the initial permutation (zero)
-queue.put(current_wc, sub, (''.join(current)+'-P0')) 
-
-
-for iteration in range(maximum_iterations):
-
-    neighbour = get_neighbour(current)
-    neighbour_mono, neighbour_rainbow = judge.count_words(neighbour)
+queue.put(current_wc, sub, (''.join(current)+'-P0'), current) 
+budget.improve(current_wc, current_mono, current_rainbow)
+
+
+while not budget.exhausted():
+    iteration = budget.evaluations
+    budget.spend()
+    temperature = schedule.temperature
+
+    a, b = get_neighbour(current)
+
+    #both random numbers of the acceptance test are drawn before the neighbour is scored,
+    #so the lowest score that can be accepted is known while scoring it
+    first, second = random.random(), random.random()
+
+    counts, exact = None, True
+    if cache is not None:
+        neighbour = current.copy()
+        neighbour[a], neighbour[b] = neighbour[b], neighbour[a]
+        key = cache.key(neighbour)
+        counts = cache.lookup(key)
+
+    if counts is None:
+        if early_abort:
+            #when the count stops early it is an upper bound, low enough to be rejected by the test below
+            target = lowest_accepted(current_wc, temperature, first, second)
+            neighbour_mono, neighbour_rainbow, exact = scorer.count_swap_until(a, b, target, maximization_case, stop_above=False)
+            counts = neighbour_mono, neighbour_rainbow
+        else:
+            delta_mono, delta_rainbow = scorer.score_swap(a, b)
+            counts = current_mono + delta_mono, current_rainbow + delta_rainbow
+        if cache is not None and exact:
+            cache.store(key, counts)
+    neighbour_mono, neighbour_rainbow = counts
 
     #set the neighbour_wc based on the specified maximization case
     if maximization_case == 'mono':
@@ -73,11 +140,14 @@ for iteration in range(maximum_iterations):
     #always accept if the score is better
     #and allow a worse score to be accepted with a probability
     
-    if delta_wc > 0 or random.random() < random.random() < math.exp(delta_wc/temperature):
-        current = neighbour
+    accepted = improved = False
+    if delta_wc > 0 or first < second < math.exp(delta_wc/temperature):
+        accepted = True
+        current_mono, current_rainbow = scorer.apply_swap(a, b)
         current_wc = neighbor_wc
 
         if current_wc > queue.peek()[0]:
+            improved = True
             #set the priority number and sub (priority) number based on the specified maximization case
             if maximization_case == 'mono':
                 priority, sub = neighbour_mono, neighbour_rainbow
@@ -87,11 +157,28 @@ for iteration in range(maximum_iterations):
                 priority, sub = neighbour_mono + neighbour_rainbow, neighbour_mono
 
              
-            queue.put(priority, sub, (''.join(current)+'-P'+str(iteration)))
+            queue.put(priority, sub, (''.join(current)+'-P'+str(iteration)), current)
+            budget.improve(current_wc, neighbour_mono, neighbour_rainbow)
+
+    #cool down the temperature, the delta of a neighbour whose count stopped early is not known
+    schedule.update(delta_wc if exact else None, accepted, improved)
+
+    if schedule.should_restart():
+        #go back to the best permutation found so far
+        scorer = judge.swap_scorer(list(queue.peek()[2].split('-')[0]))
+        current = scorer.letters
+        current_mono, current_rainbow = scorer.count_words()
+        if maximization_case == 'mono':
+            current_wc = current_mono
+        elif maximization_case == 'rainbow':
+            current_wc = current_rainbow
+        else:
+            current_wc = current_mono + current_rainbow
 
-    #cool down the temperature
-    temperature *= cooling_rate
 
+if cache is not None:
+    print(cache.stats())
+print(budget.summary('simulated annealing '+maximization_case))
 
 # Ensure the output directory exists
 output_dir = 'output'
@@ -99,9 +186,9 @@ os.makedirs(output_dir, exist_ok=True)
 # Save the contents of the queue to a file
 output_file = os.path.join(output_dir, f'{maximization_case}_max.txt')
 with open(output_file, 'w') as f:
-    f.write(f"Temperature: {temperature}\n")
-    f.write(f"Cooling Rate: {cooling_rate}\n")
-    f.write(f"Timesteps: {maximum_iterations}\n\n")
+    f.write(f"Schedule: {schedule}\n")
+    f.write(f"Temperature: {schedule.temperature}\n")
+    f.write(f"Timesteps: {budget.evaluations}\n\n")
     while not queue.is_empty():
         item = queue.get()
         f.write(f"Score: {item[0]}, Mono: {item[1]}, Permutation: {item[2]}\n")
@@ -0,0 +1,111 @@
+import math
+import random
+import time
+from ..common.Lexicon import Lexicon
+from ..common.Judge import Judge
+from ..common.CubeGeometry import CubeGeometry
+from ..common.Budget import Budget
+from ..common.CoolingSchedule import CoolingSchedule, GeometricSchedule, LundyMeesSchedule, AcceptanceSchedule, ReheatSchedule, RestartSchedule
+
+#compares the cooling schedules of the simulated annealing search by the best score they reach
+#every 10000 evaluations, with the same starting permutations, the same random numbers and the same budget.
+#The starting temperature of every schedule is the one that accepts the mean worse swap of the starting
+#permutation half of the time (see CoolingSchedule.initial_temperature), and they all end about 1000 times colder
+
+measure = 'rainbow' #CHANGE TO 'mono' or 'rainbow' or 'both'
+evaluations = 30000 #CHANGE, the evaluation budget of every run
+checkpoint = 10000
+seeds = [2000, 2001, 2002] #CHANGE, one run per seed and schedule
+
+geometry = CubeGeometry(cubes=6, faces=6)
+lex = Lexicon()
+judge = Judge(lex.alphabet, lex.word_list, compiled=lex.compile(), geometry=geometry)
+base = lex.calculate_letter_reps(geometry)[2]
+
+
+def measure_score(mono:int, rainbow:int)->int:
+    if measure == 'mono':
+        return mono
+    if measure == 'rainbow':
+        return rainbow
+    return mono + rainbow
+
+
+schedules = {
+    'geometric': lambda t: GeometricSchedule(t, (1/1000) ** (1/evaluations)),
+    'lundy-mees': lambda t: LundyMeesSchedule(t, t/1000, evaluations),
+    'acceptance': lambda t: AcceptanceSchedule(t, steps=evaluations),
+    'geometric+reheat': lambda t: ReheatSchedule(GeometricSchedule(t, (1/1000) ** (1/evaluations)), patience=3000, factor=10),
+    'lundy-mees+restart': lambda t: RestartSchedule(LundyMeesSchedule(t, t/1000, evaluations), patience=3000),
+    'acceptance+restart': lambda t: RestartSchedule(AcceptanceSchedule(t, steps=evaluations), patience=3000),
+}
+
+
+def run(schedule_factory, seed:int)->tuple:
+    """
+    Anneals a random permutation with a schedule, like SimulatedAnnealing.py (with the early abort of the neighbours),
+    restarting from the best permutation when the schedule asks for it.
+    Returns the best score after every checkpoint evaluations, and the Budget of the run
+    """
+    rng = random.Random(seed)
+    letters = base.copy()
+    rng.shuffle(letters)
+    scorer = judge.swap_scorer(letters)
+    mono, rainbow = scorer.count_words()
+    current = measure_score(mono, rainbow)
+
+    #the starting temperature, from the deltas of random swaps of the starting permutation
+    deltas = [measure_score(*scorer.score_swap(*rng.sample(range(len(letters)), 2))) for _ in range(200)]
+    schedule = schedule_factory(CoolingSchedule.initial_temperature(deltas, 0.5))
+
+    budget = Budget(evaluations)
+    budget.improve(current, mono, rainbow)
+    best_letters = list(scorer.letters)
+    bests = []
+    while not budget.exhausted():
+        budget.spend()
+        temperature = schedule.temperature
+        a, b = rng.sample(range(len(letters)), 2)
+        first, second = rng.random(), rng.random()
+
+        #the lowest score the acceptance test can accept, see lowest_accepted of SimulatedAnnealing.py
+        target = current + 1
+        if first < second and second > 0:
+            target = min(target, math.floor(current + temperature*math.log(second)))
+        neighbour_mono, neighbour_rainbow, exact = scorer.count_swap_until(a, b, target, measure, stop_above=False)
+        delta = measure_score(neighbour_mono, neighbour_rainbow) - current
+
+        accepted = improved = False
+        if delta > 0 or first < second < math.exp(delta/temperature):
+            accepted = True
+            mono, rainbow = scorer.apply_swap(a, b)
+            current += delta
+            if budget.improve(current, mono, rainbow):
+                improved = True
+                best_letters = list(scorer.letters)
+        schedule.update(delta if exact else None, accepted, improved)
+
+        if schedule.should_restart():
+            scorer = judge.swap_scorer(best_letters)
+            mono, rainbow = scorer.count_words()
+            current = measure_score(mono, rainbow)
+
+        if budget.evaluations % checkpoint == 0:
+            bests.append(budget.best[0])
+    return bests, budget
+
+
+print('best', measure, 'score every', checkpoint, 'evaluations, mean over', len(seeds), 'seeds')
+print(format('schedule', '<20'), ''.join(format(str((i+1)*checkpoint), '>10') for i in range(evaluations//checkpoint)),
+      format('evals/s', '>10'))
+for name, factory in schedules.items():
+    results = []
+    seconds = evaluations_done = 0
+    for seed in seeds:
+        start = time.perf_counter()
+        bests, budget = run(factory, seed)
+        seconds += time.perf_counter() - start
+        evaluations_done += budget.evaluations
+        results.append(bests)
+    means = [sum(column)/len(column) for column in zip(*results)]
+    print(format(name, '<20'), ''.join(format(mean, '>10.1f') for mean in means), format(evaluations_done/seconds, '>10.0f'))
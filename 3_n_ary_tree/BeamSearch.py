@@ -0,0 +1,243 @@
+import multiprocessing
+import os
+import time
+from ..common.Lexicon import Lexicon
+from ..common.Judge import Judge
+from ..common.CompiledLexicon import CompiledLexicon
+from ..common.PriorityQueue import PriorityQueue
+from ..common.CubeSymmetry import CubeSymmetry
+from ..common.CubeGeometry import CubeGeometry
+from ..common.Budget import Budget
+from ..common.VisitedSet import VisitedSet
+from ..common.PermutationGenerator import PermutationGenerator
+
+#the number of cubes, and of faces (colors) per cube
+geometry = CubeGeometry(cubes=6, faces=6)
+
+#created by load, from the lexicon read by the main process
+judge = None
+symmetry = None
+
+#generates a list of 2-item tuples that contain the pair of indices to be swaps
+#the swaps within cubes go first, and then the swaps within colors (90 + 90 for 6 cubes with 6 faces)
+swaps = geometry.swaps()
+
+
+def load(compiled:CompiledLexicon):
+    """
+    Creates the judge and the symmetry used by run, from a compiled lexicon.
+    Only the main process reads and compiles the lexicon, the workers attach to a shared memory copy
+    of it (see worker), so importing this module in a worker does not read or parse anything
+    """
+    global judge, symmetry
+    judge = Judge(compiled.alphabet, None, compiled=compiled, geometry=geometry)
+
+    #permutations with the cubes reordered or the colors relabelled spell the same words,
+    #so the visited set keeps their canonical keys, and every child that is equivalent to a visited one is skipped
+    symmetry = CubeSymmetry(compiled.alphabet, geometry)
+
+
+def worker(shared:dict, *args):
+    """
+    Entry point of the worker processes, attaches to the compiled lexicon shared by the main process
+    (see CompiledLexicon.share) and runs the search with the rest of the arguments
+    """
+    load(CompiledLexicon.attach(shared))
+    run(*args)
+
+
+#the score that each tree maximizes, as a Judge.count_words_until measure
+measures = {'mono_max':'mono', 'rainbow_max':'rainbow', 'sum_max':'both'}
+
+def run(max_num_permutations:int=None, name:str='', subname:str='', permutation:list=None, beam_width:int=10,
+        batch:bool=False, max_seconds:float=None, max_visited_bytes:int=None):
+    """
+    Beam search from the given permutation: every level expands all the nodes of the beam through the swaps list,
+    and the beam_width best unvisited children become the beam of the next level, until max_num_permutations unique
+    permutations have been evaluated, or max_seconds have gone by (None for no limit), or no child is left.
+    A beam_width of 1 is the greedy search, and a wider beam trades speed for quality.
+    Prints the summary of the run (see Budget.summary) and writes the timing of every level to the levels file.
+    When batch is True, the children of every node are scored with a single judge.count_words_many call, otherwise they
+    are scored from the node with a SwapScorer, stopping early when a child can not enter the next beam
+    """
+
+    print(str(name)+':'+str(subname)+' has started')
+
+    mono, rainbow = judge.count_words(permutation)
+    if subname == 'mono_max':
+        best_wc = mono
+    elif subname == 'rainbow_max':
+        best_wc = rainbow
+    elif subname == 'sum_max':
+        best_wc = mono + rainbow
+
+    #the best permutations of the whole search, for the output file
+    pq = PriorityQueue(10)
+    pq.put(best_wc,mono+rainbow,(''.join(permutation),'root'))
+
+    updates = []
+    levels = []
+    unique_permutations = 0
+    generation = 0
+    visited = VisitedSet(max_visited_bytes, max_num_permutations or 1000000)
+    visited.add(symmetry.key(permutation))
+    budget = Budget(max_num_permutations, max_seconds)
+    budget.improve(best_wc, mono, rainbow)
+
+    beam = [''.join(permutation)]
+
+    while beam and not budget.exhausted():
+        start = time.perf_counter()
+        evaluated = unique_permutations
+
+        #the best children of this level, the lowest ones are dropped once it holds beam_width of them
+        next_beam = PriorityQueue(beam_width)
+
+        for node in beam:
+            parent = list(node)
+
+            #collect the unvisited children nodes using the swaps list
+            children = []
+            for swap in swaps:
+                a,b = swap
+                parent[a],parent[b] = parent[b],parent[a]
+
+                #make record of the current swap
+                if not budget.exhausted() and visited.add(symmetry.key(parent)):
+                    unique_permutations+=1
+                    budget.spend()
+                    children.append((swap, "".join(parent), unique_permutations))
+
+                parent[a],parent[b] = parent[b],parent[a]
+
+            if batch:
+                mono_counts, rainbow_counts = judge.count_words_many([child[1] for child in children])
+                counts = [(int(mono), int(rainbow), True) for mono, rainbow in zip(mono_counts, rainbow_counts)]
+            else:
+                #the scorer holds the node, and scores every child by only re-checking
+                #the words that contain the two swapped letters
+                scorer = judge.swap_scorer(parent)
+                counts = []
+                for swap, string_version, iteration in children:
+                    #lowest score a child needs to enter the next beam or the output queue, that is never above the best so far
+                    target = min(next_beam.peek_last()[0] if next_beam.is_full() else 0,
+                                 pq.peek_last()[0] if pq.is_full() else 0)
+                    counts.append(scorer.count_swap_until(*swap, target, measures[subname], stop_above=False))
+
+            for (swap, string_version, iteration), (mono, rainbow, exact) in zip(children, counts):
+                #an inexact count is below the target, so the child is neither a best nor in the next beam
+                if not exact:
+                    continue
+
+                if subname == 'mono_max':
+                    wc = mono
+                elif subname == 'rainbow_max':
+                    wc = rainbow
+                elif subname == 'sum_max':
+                    wc = mono + rainbow
+
+                if wc > best_wc:
+                    best_wc = wc
+                    updates.append(iteration)
+                    budget.improve(wc, mono, rainbow)
+
+                update = "gen"+str(generation)+"-iter"+str(iteration)
+                next_beam.put(wc, mono+rainbow, string_version)
+                pq.put(wc, mono+rainbow, (string_version, update))
+
+        beam = []
+        while not next_beam.is_empty():
+            beam.append(next_beam.get()[2])
+
+        levels.append((generation, unique_permutations - evaluated, time.perf_counter() - start, best_wc))
+        generation += 1
+
+    #export the results
+    best_file = open('output/'+name+'/'+subname+'_best.txt', 'w')
+    updates_file = open('output/'+name+'/'+subname+'_updates.txt', 'w')
+    iteration_file = open('output/'+name+'/'+subname+'_iterations.txt', 'w')
+    levels_file = open('output/'+name+'/'+subname+'_levels.txt', 'w')
+
+    while not pq.is_empty():
+        wc, sub, data = pq.get()
+        permutation, updt = data
+        best_file.write(str(wc)+','+str(permutation)+','+str(updt)+'\n')
+    best_file.close()
+
+    for item in updates:
+        updates_file.write(str(item)+'\n')
+    updates_file.close()
+
+    iteration_file.write(str(unique_permutations)+'\n')
+    iteration_file.close()
+
+    #level, children evaluated, seconds, best score so far
+    for level, children, seconds, wc in levels:
+        levels_file.write(str(level)+','+str(children)+','+format(seconds, '.3f')+','+str(wc)+'\n')
+    levels_file.close()
+
+    seconds = sum(level[2] for level in levels)
+    print(str(name)+':'+str(subname)+': beam width '+str(beam_width)+', '+str(len(levels))+' levels, '
+          +format(seconds/max(1, len(levels)), '.2f')+' seconds per level')
+    print(visited.stats())
+    print(budget.summary(str(name)+':'+str(subname)))
+
+def random_permutation(alphabet:list, base:list, seed:int=2000)->list:
+    """
+    Creates a uniformly random permutation of the base letters, drawn from the stream of seed
+    (see PermutationGenerator)
+    """
+    return PermutationGenerator(alphabet, base, seed).permutation()
+
+
+if __name__ == '__main__':
+    lex = Lexicon()
+    load(lex.compile())
+    base = [lex.alphabet[i] for i in lex.calculate_letter_reps(geometry)[1]]
+
+    #the workers read the compiled lexicon from this block, instead of reading the spreadsheet again
+    memory, shared = judge.compiled.share()
+
+    max_iter = 150000 #CHANGE, the evaluation budget of every tree
+    max_seconds = None #CHANGE, the wall-clock budget of every tree, None for no limit
+    max_visited_bytes = None #CHANGE, the memory of a Bloom filter of the visited permutations of every tree, None for an exact set
+    beam_width = 10 #CHANGE, the nodes kept at every level, 1 is the greedy search, wider is slower but searches more
+    batch = False #CHANGE, scores the children of every node with a single batched call instead of swap by swap
+
+    #the roots for the different trees
+    starting_point ={
+
+        'base': [base]*3,
+        'random_search_best':[
+            list('ovrsmgbijtefnruektsezlxiwoyahadcqpln'), list('esvrlgoraxbwycutsiinomehjtklqepdafnz'), list('tpndaqaeiiuocrxleyltvhoebzrfkmjwgssn')
+        ],
+        'random':[random_permutation(lex.alphabet, base)]*3
+    }
+
+    processes_list = []
+
+    #start each tree as a separate process
+    for name, data in starting_point.items():
+        # Ensure the output directory exists
+        os.makedirs(f'output/{name}', exist_ok=True)
+
+        best = {'mono_max': data[0],
+        'rainbow_max': data[1],
+        'sum_max': data[2]}
+
+        for subname, permutation in best.items():
+
+            p = multiprocessing.Process(target=worker, args=(shared, max_iter, name, subname, permutation, beam_width,
+                                                             batch, max_seconds, max_visited_bytes))
+            p.name = str(str(name)+"-"+str(subname))
+            processes_list.append(p)
+            p.start()
+
+    #wait for all processes to finish
+    for p in processes_list:
+        p.join()
+
+    memory.close()
+    memory.unlink()
+
+    print("DONE")
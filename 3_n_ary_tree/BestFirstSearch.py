@@ -1,38 +1,146 @@
 import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
 from ..common.Lexicon import Lexicon
 from ..common.Judge import Judge
+from ..common.CompiledLexicon import CompiledLexicon
 from datetime import datetime
 from ..common.PriorityQueue import PriorityQueue
+from ..common.CubeSymmetry import CubeSymmetry
+from ..common.CubeGeometry import CubeGeometry
+from ..common.Budget import Budget
+from ..common.VisitedSet import VisitedSet
 import random
 
-lex = Lexicon()
-judge = Judge(lex.alphabet,lex.word_list)
+#the number of cubes, and of faces (colors) per cube
+geometry = CubeGeometry(cubes=6, faces=6)
+
 random.seed(2000)
 
-num_cubes = 6
+#created by load, from the lexicon read by the main process
+judge = None
+symmetry = None
 
 
 #generates a list of 2-item tuples that contain the pair of indices to be swaps
-#the first 90 items will be for all the swaps within cubes
-#the other half will be for swaps within colors
-swaps = [None]*180
-count = 0
-for i in range(num_cubes):
-    for j in range(num_cubes-1):
-        for k in range(j+1,num_cubes):
-            #for swaps within a cube
-            a,b = (6*i+j),(6*i+k)
+#the swaps within cubes go first, and then the swaps within colors (90 + 90 for 6 cubes with 6 faces)
+swaps = geometry.swaps()
+
+
+def load(compiled:CompiledLexicon):
+    """
+    Creates the judge and the symmetry used by run, from a compiled lexicon.
+    Only the main process reads and compiles the lexicon, the workers attach to a shared memory copy
+    of it (see worker), so importing this module in a worker does not read or parse anything
+    """
+    global judge, symmetry
+    judge = Judge(compiled.alphabet, None, compiled=compiled, geometry=geometry)
+
+    #permutations with the cubes reordered or the colors relabelled spell the same words,
+    #so the visited set keeps their canonical keys, and every child that is equivalent to a visited one is skipped
+    symmetry = CubeSymmetry(compiled.alphabet, geometry)
+
+
+def worker(shared:dict, *args):
+    """
+    Entry point of the worker processes, attaches to the compiled lexicon shared by the main process
+    (see CompiledLexicon.share) and runs the search with the rest of the arguments
+    """
+    load(CompiledLexicon.attach(shared))
+    run(*args)
+
+
+def init_worker(shared:dict):
+    """
+    Initializer of the pool workers of the parallel mode of run, attaches once to the compiled lexicon
+    shared by the main process (see CompiledLexicon.share)
+    """
+    load(CompiledLexicon.attach(shared))
+
+
+#the score that each tree maximizes, as a Judge.count_words_until measure
+measures = {'mono_max':'mono', 'rainbow_max':'rainbow', 'sum_max':'both'}
+
+def child_keys(parent:str)->list:
+    """
+    Returns the canonical keys of the children of a parent, one per swap in the order of the swaps list,
+    so the visited ones can be skipped before they are scored (the first phase of an expansion)
+
+    Parameters
+    ----------
+    parent:str
+        the permutation that is expanded
+    """
+    parent = list(parent)
+    keys = []
+    for a, b in swaps:
+        parent[a],parent[b] = parent[b],parent[a]
+        keys.append(symmetry.key(parent))
+        parent[a],parent[b] = parent[b],parent[a]
+    return keys
 
-            #for swaps within colors
-            x,y = (6*j+i),(6*k+i)
 
-            swaps[count],swaps[count+90] = (a,b),(x,y)
-            count +=1
+def score_children(parent:str, indices:list, floor:int, measure:str, batch:bool=False)->list:
+    """
+    Returns the (mono, rainbow, exact) counts of the children of a parent by the swaps at the given indices of the
+    swaps list (the second phase of an expansion). A child is only counted until it can not reach floor,
+    the lowest score of the frontier (see SwapScorer.count_swap_until), and then exact is False.
+    With batch the children are counted with a single judge.count_words_many call, and every count is exact
+
+    Parameters
+    ----------
+    parent:str
+        the permutation that is expanded
+
+    indices:list
+        the indices in the swaps list of the children that are scored, i.e. the unvisited ones
 
+    floor:int
+        the score a child needs to enter the frontier, 0 to count every child exactly
 
-base = [lex.alphabet[i] for i in lex.calculate_letter_reps(6)[1]]
+    measure:str
+        the score that is compared against floor, 'mono', 'rainbow' or 'both' (mono + rainbow)
 
-def run(max_num_permutations:int=0, name:str='', subname:str='', permutation:list=None ):
+    batch:bool
+        True to score the children with a single judge.count_words_many call, False to score them from the parent with a SwapScorer
+    """
+    parent = list(parent)
+    if batch:
+        children = []
+        for i in indices:
+            a, b = swaps[i]
+            child = parent.copy()
+            child[a],child[b] = child[b],child[a]
+            children.append(child)
+        mono_counts, rainbow_counts = judge.count_words_many(children)
+        return [(mono, rainbow, True) for mono, rainbow in zip(mono_counts.tolist(), rainbow_counts.tolist())]
+
+    #the scorer holds the parent, and scores every child by only re-checking
+    #the words that contain the two swapped letters
+    scorer = judge.swap_scorer(parent)
+    return [scorer.count_swap_until(*swaps[i], floor, measure, stop_above=False) for i in indices]
+
+
+def run(max_num_permutations:int=None, name:str='', subname:str='', permutation:list=None, batch:bool=False,
+        max_seconds:float=None, max_visited_bytes:int=None, workers:int=None, expansions:int=None,
+        shared:dict=None):
+    """
+    Best first search from the given permutation, expanding the node with the highest word count
+    through the swaps list until max_num_permutations unique permutations have been evaluated,
+    or max_seconds have gone by (None for no limit), prints the summary of the run and returns its Budget.
+    The visited permutations are kept in a VisitedSet, a Bloom filter of max_visited_bytes bytes when it is given.
+    When batch is True, the children of every expansion are scored with a single judge.count_words_many call,
+    otherwise they are scored incrementally from the parent with a SwapScorer, and a child stops being counted
+    as soon as it can not enter the frontier (it is only counted in full when the frontier has room for it).
+
+    When workers is given, the tree is expanded by a pool of workers processes: the expansions best nodes
+    (workers by default) are taken from the frontier at once, the workers compute the canonical keys of their children
+    (see child_keys), the main process skips the visited ones, and the workers score the rest (see score_children).
+    The main process keeps the one visited set and the one frontier, adding the children in the order of their parents,
+    so the tree only depends on expansions, not on the number of workers.
+    The workers attach to the compiled lexicon shared by the main process (shared, see CompiledLexicon.share),
+    which is shared for the run when it is None
+    """
 
     print(str(name)+':'+str(subname)+' has started')
     
@@ -42,7 +150,8 @@ def run(max_num_permutations:int=0, name:str='', subname:str='', permutation:lis
     updates= []
     unique_permutations = 0  
     generation = 0  
-    visited = []
+    visited = VisitedSet(max_visited_bytes, max_num_permutations or 1000000)
+    budget = Budget(max_num_permutations, max_seconds)
 
     best = {'target':0, 'sub':0, 'permutation': ''.join(permutation), 'update':'root'}
     
@@ -58,53 +167,96 @@ def run(max_num_permutations:int=0, name:str='', subname:str='', permutation:lis
     best['sub'] = mono + rainbow
 
     pq.put(best['target'],best['sub'],(''.join(permutation),'root'))
-    visited.append(''.join(permutation))
+    visited.add(symmetry.key(permutation))
+    budget.improve(best['target'], mono, rainbow)
 
     
-    while unique_permutations < max_num_permutations:
-
-        data = pq.get()[1]
-        parent = data[0]
-        parent = list(parent)
-        
-        #check the children nodes using the swaps list
-        for swap in swaps:
-
-            a,b = swap
-            #swap items at indices a and b in parent
-            parent[a],parent[b] = parent[b],parent[a]
-            
-            string_version = "".join(parent)
-
-            if string_version not in visited:
-
-                #make record of the current swap
-                visited.append(string_version)
-   
-                unique_permutations+=1
-
-                #count how many words can be spelled with this changes
-                mono,rainbow = judge.count_words(parent)
-                sum = mono+rainbow
-
-                if subname == 'mono_max':
-                    wc = mono
-                elif subname == 'rainbow_max':
-                    wc = rainbow
-                elif subname == 'sum_max':
-                    wc = sum
-                
-
-                if wc > best['target']:
-                    best = {'target':wc, 'sub': sum,  'permutation': string_version, 'update': "gen"+str(generation)+"-iter"+str(unique_permutations)}    
-                    updates.append(unique_permutations)
-
-                #add to queue
-                pq.put(wc, sum, (string_version, "gen"+str(generation)+"-iter"+str(unique_permutations)))
-
-            #un-do swap from before
-            parent[a],parent[b] = parent[b],parent[a]
-        generation += 1
+    #the pool of the parallel mode, its workers attach to a shared memory copy of the compiled lexicon
+    pool = memory = None
+    if workers is not None:
+        if shared is None:
+            memory, shared = judge.compiled.share()
+        pool = ProcessPoolExecutor(workers, initializer=init_worker, initargs=(shared,))
+        expansions = expansions or workers
+    else:
+        expansions = 1
+    spread = pool.map if pool is not None else map
+
+    try:
+        while not budget.exhausted() and not pq.is_empty():
+
+            #take the best nodes of the frontier, one at a time, or expansions of them for the pool
+            parents = [pq.get()[2][0] for _ in range(min(expansions, pq.length))]
+
+            #a child below the lowest score of the frontier is dropped, unless the frontier has room left for it
+            floor = 0 if pq.is_empty() else pq.peek_last()[0]
+            room = pq.capacity - pq.length
+
+            #collect the unvisited children nodes using the swaps list
+            children = []
+            for parent, keys in zip(parents, spread(child_keys, parents)):
+                indices = []
+                for i, key in enumerate(keys):
+                    #make record of the current swap
+                    if not budget.exhausted() and visited.add(key):
+                        unique_permutations+=1
+                        budget.spend()
+                        indices.append((i, unique_permutations))
+                children.append(indices)
+
+            #count how many words can be spelled by every child
+            counts = list(spread(score_children, parents, [[i for i, iteration in indices] for indices in children],
+                                 [floor]*len(parents), [measures[subname]]*len(parents), [batch]*len(parents)))
+
+            #a child that stopped early is below the floor, so it only matters when the children above the floor
+            #do not fill the room left in the frontier, and then it is counted in full
+            above = 0
+            for parent_counts in counts:
+                for mono, rainbow, exact in parent_counts:
+                    if exact and {'mono_max':mono, 'rainbow_max':rainbow, 'sum_max':mono+rainbow}[subname] >= floor:
+                        above += 1
+            if above < room:
+                for parent, indices, parent_counts in zip(parents, children, counts):
+                    inexact = [k for k, count in enumerate(parent_counts) if not count[2]]
+                    for k, count in zip(inexact, score_children(parent, [indices[k][0] for k in inexact], 0, measures[subname])):
+                        parent_counts[k] = count
+
+            for parent, indices, parent_counts in zip(parents, children, counts):
+                parent = list(parent)
+                for (i, iteration), (mono, rainbow, exact) in zip(indices, parent_counts):
+                    if not exact:
+                        continue
+
+                    a,b = swaps[i]
+                    parent[a],parent[b] = parent[b],parent[a]
+                    string_version = "".join(parent)
+                    parent[a],parent[b] = parent[b],parent[a]
+
+                    sum = mono+rainbow
+
+                    if subname == 'mono_max':
+                        wc = mono
+                    elif subname == 'rainbow_max':
+                        wc = rainbow
+                    elif subname == 'sum_max':
+                        wc = sum
+
+
+                    if wc > best['target']:
+                        best = {'target':wc, 'sub': sum,  'permutation': string_version, 'update': "gen"+str(generation)+"-iter"+str(iteration)}    
+                        updates.append(iteration)
+                        budget.improve(wc, mono, rainbow)
+
+                    #add to queue
+                    pq.put(wc, sum, (string_version, "gen"+str(generation)+"-iter"+str(iteration)))
+
+            generation += 1
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if memory is not None:
+            memory.close()
+            memory.unlink()
 
     #add the best found, to the priority queue, so that it is included in the output file
     pq.put(best['target'], best['sub'], (best['permutation'], best['update']))
@@ -117,7 +269,7 @@ def run(max_num_permutations:int=0, name:str='', subname:str='', permutation:lis
     
     #best
     while not pq.is_empty():
-        wc, data = pq.get()
+        wc, sub, data = pq.get()
         permutation, updt = data
         best_file.write(str(wc)+','+str(permutation)+','+str(updt)+'\n')
     best_file.close()
@@ -131,6 +283,10 @@ def run(max_num_permutations:int=0, name:str='', subname:str='', permutation:lis
     iteration_file.write(str(unique_permutations)+'\n')
     iteration_file.close()
 
+    print(visited.stats())
+    print(budget.summary(str(name)+':'+str(subname)))
+    return budget
+
 def random_permutation():
     """
     Creates a random permutation from reps_lits_indices
@@ -146,8 +302,17 @@ def random_permutation():
 
 
 if __name__ == '__main__':
+    lex = Lexicon()
+    load(lex.compile())
+    base = [lex.alphabet[i] for i in lex.calculate_letter_reps(geometry)[1]]
+
+    #the workers read the compiled lexicon from this block, instead of reading the spreadsheet again
+    memory, shared = judge.compiled.share()
 
-    max_iter = 150000
+    max_iter = 150000 #CHANGE, the evaluation budget of every tree
+    max_seconds = None #CHANGE, the wall-clock budget of every tree, None for no limit
+    max_visited_bytes = None #CHANGE, the memory of a Bloom filter of the visited permutations of every tree, None for an exact set
+    tree_workers = None #CHANGE, None runs every tree in its own process, os.cpu_count() runs one tree at a time with every core
     #root elements
     starting_point ={
         'base': [base]*3,
@@ -160,20 +325,29 @@ if __name__ == '__main__':
     processes_list = []
 
     for name, data in starting_point.items():
+        os.makedirs('output/'+name, exist_ok=True)
         
         best = {'mono_max': data[0],
         'rainbow_max': data[1],
         'sum_max': data[2]}
 
         for subname, permutation in best.items():
+            if tree_workers is not None:
+                #a single tree at a time, its frontier is expanded by a pool of tree_workers processes
+                run(max_iter, name, subname, permutation, False, max_seconds, max_visited_bytes, tree_workers, None, shared)
+                continue
+
             #creating the processes
-            p = multiprocessing.Process(target=run, args=(max_iter, name,subname, permutation))
+            p = multiprocessing.Process(target=worker, args=(shared, max_iter, name,subname, permutation, False, max_seconds, max_visited_bytes))
             p.name = str(name)+"-"+str(subname)
             processes_list.append(p)
             p.start()
 
     for p in processes_list:
         p.join()
+
+    memory.close()
+    memory.unlink()
     
     print("DONE")
 
@@ -2,35 +2,61 @@ import multiprocessing
 import os
 from ..common.Lexicon import Lexicon
 from ..common.Judge import Judge
+from ..common.CompiledLexicon import CompiledLexicon
 from ..common.PriorityQueue import PriorityQueue
+from ..common.CubeSymmetry import CubeSymmetry
+from ..common.CubeGeometry import CubeGeometry
+from ..common.Budget import Budget
+from ..common.VisitedSet import VisitedSet
 import random
 
-lex = Lexicon()
-judge = Judge(lex.alphabet,lex.word_list)
+#the number of cubes, and of faces (colors) per cube
+geometry = CubeGeometry(cubes=6, faces=6)
+
 random.seed(2000)
 
-num_cubes = 6
+#created by load, from the lexicon read by the main process
+judge = None
+symmetry = None
+
 #generates a list of 2-item tuples that contain the pair of indices to be swaps
-#the first 90 items will be for all the swaps within cubes
-#the other half will be for swaps within colors
-swaps = [None]*180
-count = 0
-for i in range(num_cubes):
-    for j in range(num_cubes-1):
-        for k in range(j+1,num_cubes):
-            #for swaps within a cube
-            a,b = (6*i+j),(6*i+k)
+#the swaps within cubes go first, and then the swaps within colors (90 + 90 for 6 cubes with 6 faces)
+swaps = geometry.swaps()
+
+
+def load(compiled:CompiledLexicon):
+    """
+    Creates the judge and the symmetry used by run, from a compiled lexicon.
+    Only the main process reads and compiles the lexicon, the workers attach to a shared memory copy
+    of it (see worker), so importing this module in a worker does not read or parse anything
+    """
+    global judge, symmetry
+    judge = Judge(compiled.alphabet, None, compiled=compiled, geometry=geometry)
 
-            #for swaps within colors
-            x,y = (6*j+i),(6*k+i)
+    #permutations with the cubes reordered or the colors relabelled spell the same words,
+    #so the visited set keeps their canonical keys, and every child that is equivalent to a visited one is skipped
+    symmetry = CubeSymmetry(compiled.alphabet, geometry)
 
-            swaps[count],swaps[count+90] = (a,b),(x,y)
-            count +=1
 
+def worker(shared:dict, *args):
+    """
+    Entry point of the worker processes, attaches to the compiled lexicon shared by the main process
+    (see CompiledLexicon.share) and runs the search with the rest of the arguments
+    """
+    load(CompiledLexicon.attach(shared))
+    run(*args)
 
-base = [lex.alphabet[i] for i in lex.calculate_letter_reps(6)[1]]
 
-def run(max_num_permutations:int=0, name:str='', subname:str='', permutation:list=None ):
+#the score that each tree maximizes, as a Judge.count_words_until measure
+measures = {'mono_max':'mono', 'rainbow_max':'rainbow', 'sum_max':'both'}
+
+def run(max_num_permutations:int=None, name:str='', subname:str='', permutation:list=None, max_seconds:float=None,
+        max_visited_bytes:int=None):
+    """
+    Greedy search from the given permutation, until max_num_permutations unique permutations have been evaluated,
+    or max_seconds have gone by (None for no limit), and prints the summary of the run (see Budget.summary).
+    The visited permutations are kept in a VisitedSet, a Bloom filter of max_visited_bytes bytes when it is given
+    """
 
     print(str(name)+':'+str(subname)+' has started')
     
@@ -49,17 +75,23 @@ def run(max_num_permutations:int=0, name:str='', subname:str='', permutation:lis
     elif subname == 'sum_max':
         best_wc = best_mono + best_rainbow
 
-    pq.put(best_wc,(''.join(permutation),'root'))
+    pq.put(best_wc,best_mono+best_rainbow,(''.join(permutation),'root'))
 
     unique_permutations = 0  
     generation = 0  
-    visited = []
+    visited = VisitedSet(max_visited_bytes, max_num_permutations or 1000000)
+    budget = Budget(max_num_permutations, max_seconds)
+    budget.improve(best_wc, best_mono, best_rainbow)
     
-    while unique_permutations < max_num_permutations:
+    while not budget.exhausted():
 
         generation_best = {'permutation':None, 'wc': 0}
 
         
+        #the scorer holds the parent, and scores every child by only re-checking
+        #the words that contain the two swapped letters
+        scorer = judge.swap_scorer(parent)
+        
         #check the children nodes using the swaps list
         for swap in swaps:
 
@@ -69,34 +101,43 @@ def run(max_num_permutations:int=0, name:str='', subname:str='', permutation:lis
             
             string_version = "".join(parent)
 
-            if string_version not in visited:
-
-                #make record of the current swap
-                visited.append(string_version)
+            key = symmetry.key(parent)
 
+            #make record of the current swap
+            if not budget.exhausted() and visited.add(key):
                 unique_permutations+=1
+                budget.spend()
 
-                #count how many words can be spelled with this changes
+                #lowest score a child needs to matter: entering the queue, every child does while it has room,
+                #and beating the best child of this generation always does
+                target = 0
+                if pq.is_full():
+                    target = min(generation_best['wc'] + 1, pq.peek_last()[0])
+
+                #count how many words can be spelled with this changes, stopping early if the child can not reach the target
                 #NOTE: I unpacked the judge return for possible changes in maximization logic
-                mono,rainbow = judge.count_words(parent)
-
-                if subname == 'mono_max':
-                    wc = mono
-                elif subname == 'rainbow_max':
-                    wc = rainbow
-                elif subname == 'sum_max':
-                    wc = mono + rainbow
+                mono,rainbow,exact = scorer.count_swap_until(a,b,target,measures[subname],stop_above=False)
+
+                #an inexact count is below the target, so the child is neither a best nor in the queue
+                if exact:
+                    if subname == 'mono_max':
+                        wc = mono
+                    elif subname == 'rainbow_max':
+                        wc = rainbow
+                    elif subname == 'sum_max':
+                        wc = mono + rainbow
                 
-                #check if the current permutation is the best so far
-                if wc > best_wc:
-                    best_wc = wc
-                    updates.append(unique_permutations)
+                    #check if the current permutation is the best so far
+                    if wc > best_wc:
+                        best_wc = wc
+                        updates.append(unique_permutations)
+                        budget.improve(wc, mono, rainbow)
                 
-                if wc > generation_best['wc']:
-                    generation_best.update({'permutation': parent.copy(), 'wc': wc})
+                    if wc > generation_best['wc']:
+                        generation_best.update({'permutation': parent.copy(), 'wc': wc})
                 
-                #add to queue anyways
-                pq.put(wc,(string_version,"gen"+str(generation)+"-iter"+str(unique_permutations)))
+                    #add to queue anyways
+                    pq.put(wc,mono+rainbow,(string_version,"gen"+str(generation)+"-iter"+str(unique_permutations)))
 
             #un-do swap from before
             parent[a],parent[b] = parent[b],parent[a]
@@ -111,7 +152,7 @@ def run(max_num_permutations:int=0, name:str='', subname:str='', permutation:lis
     iteration_file = open('output/'+name+'/'+subname+'_iterations.txt', 'w')
 
     while not pq.is_empty():
-        wc, data = pq.get()
+        wc, sub, data = pq.get()
         permutation, updt = data
         best_file.write(str(wc)+','+str(permutation)+','+str(updt)+'\n')
     best_file.close()
@@ -123,6 +164,9 @@ def run(max_num_permutations:int=0, name:str='', subname:str='', permutation:lis
     iteration_file.write(str(unique_permutations)+'\n')
     iteration_file.close()
 
+    print(visited.stats())
+    print(budget.summary(str(name)+':'+str(subname)))
+
 def random_permutation():
     """
     Creates a random permutation from reps_lits_indices
@@ -138,6 +182,17 @@ def random_permutation():
 
 
 if __name__ == '__main__':
+    lex = Lexicon()
+    load(lex.compile())
+    base = [lex.alphabet[i] for i in lex.calculate_letter_reps(geometry)[1]]
+
+    #the workers read the compiled lexicon from this block, instead of reading the spreadsheet again
+    memory, shared = judge.compiled.share()
+
+    max_iter = 130000 #CHANGE, the evaluation budget of every tree
+    max_seconds = None #CHANGE, the wall-clock budget of every tree, None for no limit
+    max_visited_bytes = None #CHANGE, the memory of a Bloom filter of the visited permutations of every tree, None for an exact set
+
     #the roots for the different trees
     starting_point ={
 
@@ -163,7 +218,7 @@ if __name__ == '__main__':
 
         for subname, permutation in best.items():
             
-            p = multiprocessing.Process(target=run, args=(130000, name,subname, permutation))
+            p = multiprocessing.Process(target=worker, args=(shared, max_iter, name,subname, permutation, max_seconds, max_visited_bytes))
             p.name = str(str(name)+"-"+str(subname))
             processes_list.append(p)
             p.start()
@@ -171,6 +226,9 @@ if __name__ == '__main__':
     #wait for all processes to finish
     for p in processes_list:
         p.join()
+
+    memory.close()
+    memory.unlink()
     
     print("DONE")
 
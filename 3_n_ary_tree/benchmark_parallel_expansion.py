@@ -0,0 +1,35 @@
+import os
+from ..common.Lexicon import Lexicon
+from . import BestFirstSearch
+
+#times the parallel mode of BestFirstSearch.run on a single tree, in evaluated children per second,
+#with one process (workers=None) and then with pools of 1, 2, 4, ... workers up to the number of cores.
+#Every parallel run expands the same number of nodes at once, so they all grow the same tree
+
+evaluations = 20000 #CHANGE, the evaluation budget of every run
+expansions = os.cpu_count() #CHANGE, the nodes expanded at once by the pools
+root = list('ovrsmgbijtefnruektsezlxiwoyahadcqpln')
+
+if __name__ == '__main__':
+    lex = Lexicon()
+    BestFirstSearch.load(lex.compile())
+    memory, shared = BestFirstSearch.judge.compiled.share()
+    os.makedirs('output/benchmark', exist_ok=True)
+
+    workers = [None]
+    while (workers[-1] or 0) < os.cpu_count():
+        workers.append(2*workers[-1] if workers[-1] else 1)
+
+    try:
+        results = []
+        for count in workers:
+            budget = BestFirstSearch.run(evaluations, 'benchmark', 'rainbow_max', root.copy(), False, None, None,
+                                         count, expansions if count else None, shared)
+            results.append((count, budget.evaluations/budget.elapsed(), budget.best[0]))
+    finally:
+        memory.close()
+        memory.unlink()
+
+    print('workers      children/second   speed-up   best')
+    for count, rate, best in results:
+        print(format(str(count or 'none'), '<12'), format(rate, '>15.0f'), format(rate/results[0][1], '>10.2f')+'x', format(best, '>6'))
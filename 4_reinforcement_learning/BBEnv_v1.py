@@ -5,6 +5,7 @@ from stable_baselines3 import PPO
 
 from ..common.Judge import Judge
 from ..common.Lexicon import Lexicon
+from ..common.CubeGeometry import CubeGeometry
 
 from stable_baselines3.common.env_checker import check_env
 from random import randint
@@ -15,9 +16,11 @@ class BBEnv(gym.Env):
     Attributes:
     ----------
     base : str
-        A hardcoded base permutation string, which is currently set to work for 6 cubes.
+        The base permutation string, the letters every permutation is made of.
     cubes : int
         The number of cubes in the environment.
+    geometry : CubeGeometry
+        The number of cubes and of faces (colors) per cube.
     judge : Judge
         An instance of the Judge class used to evaluate word counts.
     words_list : list
@@ -27,7 +30,7 @@ class BBEnv(gym.Env):
     observation_space : gym.spaces.MultiDiscrete
         The observation space representing the 26 options of letters per cube side.
     action_space : gym.spaces.Discrete
-        The action space representing 180 possible swap actions.
+        The action space representing the possible swap actions (180 for 6 cubes with 6 faces).
     reward_range : tuple
         The range of possible rewards, set to (-1, 1).
     max_episode_steps : int
@@ -36,7 +39,7 @@ class BBEnv(gym.Env):
         A list of 2-item tuples containing pairs of indices to be swapped.
     Methods:
     -------
-    __init__(self, cubes:int, words_list:list, alphabet:list, max_epidose_steps=500):
+    __init__(self, cubes:int, words_list:list, alphabet:list, max_epidose_steps=500, faces:int=6, base:str=None):
         Initializes the BBEnv environment with the given parameters.
     random_permutation(self):
         Creates a random permutation from the base permutation string.
@@ -48,17 +51,20 @@ class BBEnv(gym.Env):
         Executes one step in the environment by performing the given action.
     """
     
-    def __init__(self, cubes:int, words_list:list, alphabet:list, max_epidose_steps=500):
+    def __init__(self, cubes:int, words_list:list, alphabet:list, max_epidose_steps=500, faces:int=6, base:str=None):
         super().__init__()
-        # Base permutation as a string
-        # This is hardcoded and will only work for 6 cubes
-        self.base = 'eeeaarroottiissllnnudcpmhygbfwkvzxjq'
-
-        # Number of cubes
+        # Number of cubes, and of faces per cube
         self.cubes = cubes
+        self.geometry = CubeGeometry(cubes, faces)
+
+        # Base permutation as a string
+        # The default one is for 6 cubes with 6 faces, other sizes need their own (see Lexicon.calculate_letter_reps)
+        self.base = base if base is not None else 'eeeaarroottiissllnnudcpmhygbfwkvzxjq'
+        if len(self.base) != self.geometry.size:
+            raise ValueError(f"the base permutation has {len(self.base)} letters, {self.geometry} needs {self.geometry.size}")
 
         # A Judge object
-        self.judge = Judge(alphabet, words_list)
+        self.judge = Judge(alphabet, words_list, compiled=True, geometry=self.geometry)
 
         # A list with all the words
         self.words_list = words_list
@@ -67,10 +73,7 @@ class BBEnv(gym.Env):
         self.alphabet = alphabet
 
         # Observation space is [26, 26, 26, ..., 26] representing the 26 options of letters per cube side
-        self.observation_space = spaces.MultiDiscrete(np.array([26 for _ in range(cubes * 6)]))
-
-        # Action space is 180 options
-        self.action_space = spaces.Discrete(180)
+        self.observation_space = spaces.MultiDiscrete(np.array([26 for _ in range(self.geometry.size)]))
 
         # Specifying the range for the reward
         self.reward_range = (-1, 1)
@@ -79,6 +82,9 @@ class BBEnv(gym.Env):
 
         self.create_swaps_list()
 
+        # Action space is one option per swap (180 for 6 cubes with 6 faces)
+        self.action_space = spaces.Discrete(len(self.swaps))
+
     def random_permutation(self):
         """
         Creates a random permutation from the base permutation string.
@@ -98,22 +104,10 @@ class BBEnv(gym.Env):
     def create_swaps_list(self):
         """
         Generates a list of 2-item tuples that contain the pairs of indices to be swapped.
-        The first 90 items will be for all the swaps within cubes.
-        The other half will be for swaps within colors.
+        The first items will be for all the swaps within cubes (90 for 6 cubes with 6 faces).
+        The rest will be for swaps within colors.
         """
-        self.swaps = [None] * 180
-        count = 0
-        for i in range(self.cubes):
-            for j in range(self.cubes - 1):
-                for k in range(j + 1, self.cubes):
-                    # For swaps within a cube
-                    a, b = (6 * i + j), (6 * i + k)
-
-                    # For swaps within colors
-                    x, y = (6 * j + i), (6 * k + i)
-
-                    self.swaps[count], self.swaps[count + 90] = (a, b), (x, y)
-                    count += 1
+        self.swaps = self.geometry.swaps()
 
     def reset(self, seed=None):
         """
@@ -126,9 +120,11 @@ class BBEnv(gym.Env):
             - info (dict): A dictionary containing additional information about the initial state, 
               including the 'permutation' key which holds the initial permutation as a string.
         """
-        self.permutation = self.random_permutation()
+        # The scorer keeps the word states, so every step only re-checks the words with the swapped letters
+        self.scorer = self.judge.swap_scorer(self.random_permutation())
+        self.permutation = self.scorer.letters
         self.visited = []
-        mono, rainbow = self.judge.count_words(self.permutation)
+        mono, rainbow = self.scorer.count_words()
         self.base_wc = mono + rainbow
         self.current_step = 0
 
@@ -154,10 +150,8 @@ class BBEnv(gym.Env):
 
         a, b = self.swaps[action]
         
-        # Swap
-        self.permutation[a], self.permutation[b] = self.permutation[b], self.permutation[a]
-
-        mono, rainbow = self.judge.count_words(self.permutation)
+        # Swap (the scorer swaps self.permutation as well)
+        mono, rainbow = self.scorer.apply_swap(a, b)
 
         current_permutation = ''.join(self.permutation)
         wc = mono + rainbow
@@ -5,6 +5,7 @@ from stable_baselines3 import PPO
 
 from ..common.Judge import Judge
 from ..common.Lexicon import Lexicon
+from ..common.CubeGeometry import CubeGeometry
 
 from stable_baselines3.common.env_checker import check_env
 from random import randint
@@ -16,7 +17,7 @@ class BBEnv(gym.Env):
     The environment rewards the agent based on the number of valid words formed by the letters on the cubes.
     """
 
-    def __init__(self, cubes: int, words_list: list, alphabet: list, max_episode_steps=500):
+    def __init__(self, cubes: int, words_list: list, alphabet: list, max_episode_steps=500, faces: int = 6, base: str = None):
         """
         Initialize the environment.
 
@@ -25,17 +26,23 @@ class BBEnv(gym.Env):
             words_list (list): List of valid words.
             alphabet (list): List of letters in the alphabet.
             max_episode_steps (int): Maximum number of steps per episode.
+            faces (int): Number of faces (colors) per cube.
+            base (str, optional): Base permutation, the letters every permutation is made of.
+                Defaults to the one for 6 cubes with 6 faces (see Lexicon.calculate_letter_reps for other sizes).
         """
         super().__init__()
 
-        # Base permutation as a string (hardcoded for 6 cubes)
-        self.base = 'eeeaarroottiissllnnudcpmhygbfwkvzxjq'
-
-        # Number of cubes
+        # Number of cubes, and of faces per cube
         self.cubes = cubes
+        self.geometry = CubeGeometry(cubes, faces)
+
+        # Base permutation as a string
+        self.base = base if base is not None else 'eeeaarroottiissllnnudcpmhygbfwkvzxjq'
+        if len(self.base) != self.geometry.size:
+            raise ValueError(f"the base permutation has {len(self.base)} letters, {self.geometry} needs {self.geometry.size}")
 
         # Judge object to count valid words
-        self.judge = Judge(alphabet, words_list)
+        self.judge = Judge(alphabet, words_list, compiled=True, geometry=self.geometry)
 
         # List of all valid words
         self.words_list = words_list
@@ -44,10 +51,7 @@ class BBEnv(gym.Env):
         self.alphabet = alphabet
 
         # Observation space: 26 options per cube side
-        self.observation_space = spaces.MultiDiscrete(np.array([26 for _ in range(cubes * 6)]))
-
-        # Action space: 180 possible swaps
-        self.action_space = spaces.Discrete(180)
+        self.observation_space = spaces.MultiDiscrete(np.array([26 for _ in range(self.geometry.size)]))
 
         # Reward range
         self.reward_range = (-1, 1)
@@ -58,6 +62,9 @@ class BBEnv(gym.Env):
         # Create the list of possible swaps
         self.create_swaps_list()
 
+        # Action space: one option per swap (180 for 6 cubes with 6 faces)
+        self.action_space = spaces.Discrete(len(self.swaps))
+
     def random_permutation(self):
         """
         Creates a random permutation of the base string.
@@ -74,21 +81,9 @@ class BBEnv(gym.Env):
     def create_swaps_list(self):
         """
         Generates a list of 2-item tuples containing pairs of indices to be swapped.
-        The first 90 items are for swaps within cubes, and the other 90 are for swaps within colors.
+        The swaps within cubes come first, and then the swaps within colors (90 + 90 for 6 cubes with 6 faces).
         """
-        self.swaps = [None] * 180
-        count = 0
-        for i in range(self.cubes):
-            for j in range(self.cubes - 1):
-                for k in range(j + 1, self.cubes):
-                    # Swaps within a cube
-                    a, b = (6 * i + j), (6 * i + k)
-
-                    # Swaps within colors
-                    x, y = (6 * j + i), (6 * k + i)
-
-                    self.swaps[count], self.swaps[count + 90] = (a, b), (x, y)
-                    count += 1
+        self.swaps = self.geometry.swaps()
 
     def reset(self, seed=None):
         """
@@ -100,9 +95,11 @@ class BBEnv(gym.Env):
         Returns:
             tuple: Initial observation and info dictionary.
         """
-        self.permutation = self.random_permutation()
+        # The scorer keeps the word states, so every step only re-checks the words with the swapped letters
+        self.scorer = self.judge.swap_scorer(self.random_permutation())
+        self.permutation = self.scorer.letters
         self.visited = []
-        mono, rainbow = self.judge.count_words(self.permutation)
+        mono, rainbow = self.scorer.count_words()
         self.base_wc = mono + rainbow
         self.current_step = 0
 
@@ -125,10 +122,8 @@ class BBEnv(gym.Env):
 
         a, b = self.swaps[action]
 
-        # Swap the letters at indices a and b
-        self.permutation[a], self.permutation[b] = self.permutation[b], self.permutation[a]
-
-        mono, rainbow = self.judge.count_words(self.permutation)
+        # Swap the letters at indices a and b (the scorer swaps self.permutation as well)
+        mono, rainbow = self.scorer.apply_swap(a, b)
         wc = mono + rainbow
 
         observation = np.array([self.alphabet.index(letter) for letter in self.permutation])
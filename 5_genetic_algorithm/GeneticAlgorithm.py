@@ -2,6 +2,10 @@ from random import shuffle
 from ..common.Lexicon import Lexicon
 from ..common.Judge import Judge
 from ..common.PriorityQueue import PriorityQueue
+from ..common.ScoreCache import ScoreCache
+from ..common.CubeGeometry import CubeGeometry
+from ..common.PermutationGenerator import PermutationGenerator
+from ..common.Budget import Budget
 import numpy as np
 import pandas as pd
 
@@ -15,6 +19,8 @@ class GeneticAlgorithm:
         A Lexicon object that contains the alphabet and the word list.
     cubes : int
         The number of cubes in the Building Blocks.
+    faces : int
+        The number of faces (colors) of every cube.
     population_size : int
         The size of the population.
     generations : int
@@ -27,11 +33,24 @@ class GeneticAlgorithm:
         The number of mutated offsprings that will be created for the next generation.
     random_size : int
         The number of random offsprings that will be created for the next generation.
+    batch : bool
+        If True, every generation is scored with a single Judge.count_words_many call,
+        instead of one Judge.count_words call per individual.
+    cache_bytes : int
+        If greater than 0, the judge is wrapped in a ScoreCache of this many bytes, so that individuals
+        that were already scored (or are equivalent to one that was) are not counted again.
+    max_evaluations : int
+        The evaluation budget, i.e. the number of individuals scored, None for no limit.
+        It is checked between generations, so the last generation can go over it.
+    max_seconds : float
+        The wall-clock budget in seconds, None for no limit. It is checked between generations as well.
 
     Methods
     -------
     random_permutation()
         Creates a random permutation of the elements in the base list.
+    random_permutations(n)
+        Creates n random permutations of the elements in the base list at once.
     cross_child_of(parent1, parent2)
         Creates a crossed offspring from two parent individuals.
     v2_cross_child_of(parent1, parent2)
@@ -42,15 +61,20 @@ class GeneticAlgorithm:
         Makes the specified number of crossed offsprings from the elite individuals.
     mutate(population)
         Makes the given number of mutated offsprings from a list of elite individuals.
+    score(permutations)
+        Counts the mono and rainbow words of a list of permutations.
     run(additional_individuals=None)
         Creates a random population of the specified size and runs the genetic algorithm for the specified number of generations,
         creating the next generation based on the specified attributes.
+    keep_best()
+        Records the best individual of the population in the budget.
     """
 
     def __init__(self, 
                  name: str,
                  lexicon: Lexicon,
                  cubes: int = 6,
+                 faces: int = 6,
                  population_size: int = 100, 
                  generations: int = 1000, 
                  elite_size: int = 20, 
@@ -58,10 +82,15 @@ class GeneticAlgorithm:
                  crossed_type2_size: int = 60, 
                  mutated_size: int = 10, 
                  random_size: int = 10,
-                 seed: int = 202505):
+                 seed: int = 202505,
+                 batch: bool = False,
+                 cache_bytes: int = 0,
+                 max_evaluations: int = None,
+                 max_seconds: float = None):
         self.name = name
         self.lex = lexicon
         self.cubes = cubes
+        self.geometry = CubeGeometry(cubes, faces)
         self.population_size = population_size
         self.generations = generations
         self.elite_size = elite_size
@@ -69,12 +98,21 @@ class GeneticAlgorithm:
         self.crossed_type2_size = crossed_type2_size
         self.mutated_size = mutated_size
         self.random_size = random_size
+        self.batch = batch
+        self.max_evaluations = max_evaluations
+        self.max_seconds = max_seconds
+        # created by run, counts the individuals scored and keeps the best one (see Budget)
+        self.budget = None
 
         np.random.seed(seed)  # set up the seed
 
         self.population = PriorityQueue(population_size)
-        self.judge = Judge(self.lex.alphabet, self.lex.word_list)
-        self.letter_rep, self.indices, self.base = self.lex.calculate_letter_reps(cubes)
+        self.judge = Judge(self.lex.alphabet, self.lex.word_list, compiled=self.lex.compile(), geometry=self.geometry)
+        if cache_bytes > 0:
+            self.judge = ScoreCache(self.judge, max_bytes=cache_bytes)
+        self.letter_rep, self.indices, self.base = self.lex.calculate_letter_reps(self.geometry)
+        # the random individuals are drawn in bulk from their own stream of the seed
+        self.generator = PermutationGenerator(self.lex.alphabet, self.base, seed)
 
         # create a dataframe to store the data of the population
         columns = [f'i{i}' for i in range(self.population_size)]
@@ -89,16 +127,18 @@ class GeneticAlgorithm:
         list
             A randomly permuted list.
         """
-        permutation = self.base.copy()
+        return self.generator.permutation()
 
-        for a in range(len(permutation)):
-            # get a random index from the permutation list
-            b = np.random.randint(0, len(permutation) - 1)
-            if a != b:
-                # swap the item at index a with the item at index b
-                permutation[a], permutation[b] = permutation[b], permutation[a]
+    def random_permutations(self, n: int):
+        """
+        Creates n random permutations of the elements in the base list, with a single PermutationGenerator batch.
 
-        return permutation
+        Returns
+        -------
+        list
+            A list of n randomly permuted lists.
+        """
+        return self.generator.letters(self.generator.batch(n))
 
     def cross_child_of(self, parent1: tuple, parent2: tuple):
         """
@@ -116,7 +156,7 @@ class GeneticAlgorithm:
         list
             List representing the crossed offspring.
 
-        Based on the fact that every individual is a list of letters and every 6 elements represent a cube,
+        Based on the fact that every individual is a list of letters and every self.geometry.faces elements represent a cube,
         a crossed offspring is created by appending the i-th cube from either parent1 or parent2.
         The choice is made randomly for each cube.
 
@@ -138,9 +178,9 @@ class GeneticAlgorithm:
         parent1_permutation = parent1[2][0]
         parent2_permutation = parent2[2][0]
 
-        for i in range(self.cubes):
-            start = self.cubes * i
-            end = start + self.cubes
+        for i in range(self.geometry.cubes):
+            start = self.geometry.position(i, 0)
+            end = start + self.geometry.faces
             decision = np.random.randint(2)
             if decision == 0:
                 child += parent1_permutation[start:end]
@@ -274,10 +314,38 @@ class GeneticAlgorithm:
         
         return mutated_offsprings
 
+    def score(self, permutations: list):
+        """
+        Counts the mono and rainbow words of a list of permutations.
+
+        Parameters
+        ----------
+        permutations : list
+            List of permutations, where every permutation is a list of letters.
+
+        Returns
+        -------
+        list
+            List of (mono, rainbow) tuples, aligned with permutations.
+        """
+        if self.budget is not None:
+            self.budget.spend(len(permutations))
+
+        if not self.batch:
+            return [self.judge.count_words(permutation) for permutation in permutations]
+
+        if not permutations:
+            return []
+
+        mono, rainbow = self.judge.count_words_many(permutations)
+        return [(int(m), int(r)) for m, r in zip(mono, rainbow)]
+
     def run(self, additional_individuals: list = None):
         """
         Creates a random population of the specified size and runs the genetic algorithm for the specified number of generations,
         creating the next generation based on the specified parameters.
+        It stops early when the evaluation budget or the wall-clock budget is exhausted, and prints the summary of the run
+        (see Budget.summary).
 
         Parameters
         ----------
@@ -286,6 +354,8 @@ class GeneticAlgorithm:
 
         Saves the information of the population to a CSV file and the final population to a text file.
         """
+        self.budget = Budget(self.max_evaluations, self.max_seconds)
+
         # Check if there are arbitrary individuals to add to the initial population
         initial_population_size = self.population_size
 
@@ -297,22 +367,25 @@ class GeneticAlgorithm:
                 info = permutation[1]
 
                 mono, rainbow = self.judge.count_words(permutation)
+                self.budget.spend()
                 priority = mono + rainbow
                 sub = mono
                 data_tuple = (permutation, f"g{0}{info}")
                 self.population.put(priority, sub, data_tuple)
 
         # add random individuals to the initial population
-        for _ in range(initial_population_size):
-            permutation = self.random_permutation()
-            mono, rainbow = self.judge.count_words(permutation)
+        random_individuals = self.random_permutations(initial_population_size)
+        for permutation, (mono, rainbow) in zip(random_individuals, self.score(random_individuals)):
             priority = mono + rainbow
             sub = mono
             data_tuple = (permutation, f"g{0}")
             self.population.put(priority, sub, data_tuple)
+        self.keep_best()
 
-        # Run the genetic algorithm for the specified number of generations
+        # Run the genetic algorithm for the specified number of generations, or until the budget is exhausted
         for generation in range(self.generations):
+            if self.budget.exhausted():
+                break
             population_list = []
 
             # traverse the population and save data to a dataframe
@@ -337,20 +410,21 @@ class GeneticAlgorithm:
             new_individuals['m'] = self.mutate(population_list)
             
             # Create random offspring
-            new_individuals['r'] = [self.random_permutation() for _ in range(self.random_size)]
+            new_individuals['r'] = self.random_permutations(self.random_size)
             
             # Re-add the elite individuals to the population
             for permutation in elite_individuals:
                 self.population.put(permutation[0], permutation[1], permutation[2])
 
             # add new individuals to the population
-            for key, list in new_individuals.items():
-                for permutation in list:
-                    mono, rainbow = self.judge.count_words(permutation)
-                    priority = mono + rainbow
-                    sub = mono
-                    data_tuple = (permutation, f"g{generation}{key}")
-                    self.population.put(priority, sub, data_tuple)
+            offsprings = [(key, permutation) for key, list in new_individuals.items() for permutation in list]
+            scores = self.score([permutation for key, permutation in offsprings])
+            for (key, permutation), (mono, rainbow) in zip(offsprings, scores):
+                priority = mono + rainbow
+                sub = mono
+                data_tuple = (permutation, f"g{generation}{key}")
+                self.population.put(priority, sub, data_tuple)
+            self.keep_best()
             
             print(f'gen{generation} done')
         
@@ -367,6 +441,17 @@ class GeneticAlgorithm:
         # save the data to a csv file
         self.data_frame.to_csv(f'output/{self.name}.csv', index=False)
 
+        if isinstance(self.judge, ScoreCache):
+            print(self.judge.stats())
+        print(self.budget.summary(self.name))
+
+    def keep_best(self):
+        """
+        Records the best individual of the population in the budget, with the time and the evaluations it took.
+        """
+        priority, mono, data = self.population.peek()
+        self.budget.improve(priority, mono, priority - mono)
+
 
 def random_different_pairs(target: int):
     """
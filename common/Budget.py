@@ -0,0 +1,137 @@
+import time
+
+class Budget:
+    """
+    The evaluation budget and/or wall-clock budget of a search driver, and the summary of its run.
+    A driver spends one evaluation per permutation it scores and stops as soon as the budget is exhausted,
+    i.e. when it has spent max_evaluations or max_seconds have gone by, whichever comes first.
+    The budget also keeps the best permutation score found, when it was found and after how many evaluations,
+    so every driver reports the same summary and runs can be compared on the same hardware.
+
+    The deadline is a time.time() instant, so it is the same in every process: the chunks of a parallel run
+    get their own budget with the deadline of the main one (see the deadline parameter).
+
+    Attributes
+    ----------
+    max_evaluations:int
+        the largest number of evaluations, None for no limit
+
+    max_seconds:float
+        the largest number of seconds, None for no limit
+
+    deadline:float
+        the time.time() instant when the budget is exhausted, None for no limit
+
+    evaluations:int
+        the number of evaluations spent so far
+
+    best:tuple
+        (score, mono, rainbow) of the best permutation found, None until one is found
+
+    best_seconds:float
+        the seconds from the start to the best permutation
+
+    best_evaluations:int
+        the evaluations spent when the best permutation was found
+
+    Methods
+    -------
+    spend(evaluations:int=1)
+        Counts evaluations as spent
+
+    exhausted()->bool
+        Returns True when the evaluations or the time are exhausted, False otherwise
+
+    remaining(evaluations:int)->int
+        Returns how many of evaluations fit in the budget
+
+    improve(score:int, mono:int, rainbow:int)->bool
+        Records a permutation if it is the best one so far. Returns True if it was
+
+    elapsed()->float
+        Returns the seconds since the start
+
+    summary(name:str='')->str
+        Returns a line with the evaluations, evaluations/second, time to best and best (mono, rainbow)
+    """
+
+    def __init__(self, max_evaluations:int=None, max_seconds:float=None, deadline:float=None):
+        """
+        Constructor that starts the clock.
+        deadline is optional, a time.time() instant that is used instead of max_seconds (i.e. the one of another budget)
+        """
+        self.max_evaluations = max_evaluations
+        self.max_seconds = max_seconds
+        if deadline is None and max_seconds is not None:
+            deadline = time.time() + max_seconds
+        self.deadline = deadline
+        self.evaluations = 0
+        self.start = time.perf_counter()
+        self.best = None
+        self.best_seconds = None
+        self.best_evaluations = None
+
+    def spend(self, evaluations:int=1):
+        self.evaluations += evaluations
+
+    def exhausted(self)->bool:
+        if self.max_evaluations is not None and self.evaluations >= self.max_evaluations:
+            return True
+        return self.deadline is not None and time.time() >= self.deadline
+
+    def remaining(self, evaluations:int)->int:
+        """
+        Returns how many of evaluations fit in the budget, i.e. the size of the next batch
+
+        Parameters
+        ----------
+        evaluations:int
+            the number of evaluations that would be spent without a budget
+        """
+        if self.max_evaluations is None:
+            return evaluations
+        return max(0, min(evaluations, self.max_evaluations - self.evaluations))
+
+    def improve(self, score:int, mono:int, rainbow:int)->bool:
+        """
+        Records a permutation, with the time and the evaluations it took, if its score is higher than the best one so far.
+        Returns True if it was recorded
+
+        Parameters
+        ----------
+        score:int
+            the score that the driver maximizes, i.e. mono, rainbow or their sum
+
+        mono:int
+            the number of mono words
+
+        rainbow:int
+            the number of rainbow words
+        """
+        if self.best is not None and score <= self.best[0]:
+            return False
+        self.best = (int(score), int(mono), int(rainbow))
+        self.best_seconds = self.elapsed()
+        self.best_evaluations = self.evaluations
+        return True
+
+    def elapsed(self)->float:
+        return time.perf_counter() - self.start
+
+    def summary(self, name:str='')->str:
+        """
+        Returns a line with the total evaluations, the evaluations/second, the time to best and the best (mono, rainbow)
+
+        Parameters
+        ----------
+        name:str
+            optional, the name of the run that starts the line
+        """
+        seconds = self.elapsed()
+        line = (str(name)+': ' if name else '')+str(self.evaluations)+' evaluations in '+format(seconds, '.1f')+' seconds ('
+        line += format(self.evaluations/seconds if seconds > 0 else 0, '.0f')+' evaluations/second)'
+        if self.best is None:
+            return line+', nothing found'
+        score, mono, rainbow = self.best
+        return (line+', best '+str(score)+' (mono '+str(mono)+', rainbow '+str(rainbow)+') after '
+                +format(self.best_seconds, '.1f')+' seconds and '+str(self.best_evaluations)+' evaluations')
@@ -0,0 +1,417 @@
+import json
+import os
+import numpy as np
+from array import array
+from multiprocessing import shared_memory
+
+class CompiledLexicon:
+    """
+    Class that converts a list of words, once, into NumPy arrays so that a Judge can score a
+    whole permutation with a handful of array operations instead of a Python loop per word.
+
+    Whether a word can be spelled only depends on its letters and not on their order, so words that are
+    anagrams of each other ('stop', 'pots', 'tops', 'post', 'spot') share one signature (their sorted letters).
+    Every signature is compiled and checked once, and counts for as many words as it represents (its weight).
+
+    Attributes
+    ----------
+    alphabet:list
+        a list containing the character letters in the alphabet
+
+    words:list
+        the list of words that was compiled (in the order they were given).
+        For a lexicon attached to shared memory (see attach) it is a read-only array of strings
+
+    letter_index:dict
+        a dictionary of letter:index pairs, where index is the position of the letter in the alphabet
+
+    signatures:list
+        the unique signatures (sorted letters) of the words, in order of first appearance.
+        The rows of all the matrices below are signatures.
+        For a lexicon attached to shared memory (see attach) it is a read-only array of strings
+
+    weights:np.ndarray
+        weights[s] is how many words have the s-th signature
+
+    word_signature:np.ndarray
+        word_signature[w] is the id of the signature of the w-th word
+
+    counts:np.ndarray
+        a (signatures x 26) uint8 matrix, where counts[s,l] is how many times the l-th letter of
+        the alphabet appears in the s-th signature
+
+    letters:np.ndarray
+        a (max_length x signatures) int8 matrix, where letters[k,s] is the alphabet index of the k-th letter
+        of the s-th signature, padded with -1 after the end of the signature.
+        It is stored by letter position so that gathering the k-th letter of many signatures is contiguous
+
+    needs:np.ndarray
+        a (max_length x signatures) uint8 matrix, where needs[k,s] is how many times the k-th letter of
+        the s-th signature appears in it (0 after the end of the signature)
+
+    lengths:np.ndarray
+        the number of letters in every signature
+
+    spellable:np.ndarray
+        a boolean mask that is False for the signatures that contain characters outside of the alphabet
+        (i.e. trailing spaces), since those can never be spelled
+
+    words_with:list
+        inverted index, words_with[l] is an array with the ids of the signatures that contain the l-th letter
+        of the alphabet
+
+    shared_memory:SharedMemory
+        the shared memory block that holds the arrays of a lexicon created with attach, None otherwise
+
+    Methods
+    -------
+    count(mask:np.ndarray, signature_ids:np.ndarray=None)->int
+        Returns how many words are represented by the signatures selected in a boolean mask
+
+    dedup_report()->str
+        Returns a short description of how much work the anagram signatures removed
+
+    words_with_any(letter_ids:list)->np.ndarray
+        Returns the sorted ids of the signatures that contain at least one of the given letters
+
+    permutation_indices(letters:list)->np.ndarray
+        Converts a permutation of letters into an array of alphabet indices
+
+    permutations_indices(permutations:list)->np.ndarray
+        Converts a batch of permutations into a 2-D array of alphabet indices
+
+    arrays()->dict
+        Returns every array needed to rebuild the compiled lexicon, by name
+
+    from_arrays(alphabet:list, arrays:dict)->CompiledLexicon
+        Class method. Rebuilds a compiled lexicon from the arrays of another one, without copying them
+
+    share()->tuple
+        Copies the arrays into a new shared memory block, and returns the block and a small picklable spec of it
+
+    attach(spec:dict)->CompiledLexicon
+        Class method. Rebuilds a compiled lexicon from a shared memory block, reading the arrays in place
+
+    save(path:str, metadata:dict)
+        Writes the arrays and some metadata to a binary file that load can memory-map
+
+    load(path:str)->tuple
+        Class method. Rebuilds a compiled lexicon from a file written by save, by memory-mapping it
+    """
+    #the arrays in a shared memory block or in a file start at multiples of this many bytes
+    alignment = 64
+
+    #first bytes of the files written by save, followed by the length of the json header
+    file_magic = b'BBSLEX1\n'
+
+    def __init__(self, alphabet:list, words):
+        """
+        Constructor that groups the words by signature and compiles the signatures into the count and
+        letter matrices.
+        words can be any iterable, i.e. a generator that reads a large file line by line, and it is only
+        iterated once: every word is grouped as it arrives, and the matrices only hold the unique signatures
+        """
+        self.alphabet = alphabet
+        self.letter_index = {letter:i for i,letter in enumerate(alphabet)}
+
+        #group the anagrams under the same signature
+        self.words = []
+        signature_ids = {}
+        word_signature = array('q')
+        for word in words:
+            self.words.append(word)
+            word_signature.append(signature_ids.setdefault(''.join(sorted(word)), len(signature_ids)))
+        self.word_signature = np.frombuffer(word_signature, dtype=np.int64).astype(np.intp)
+
+        self.signatures = list(signature_ids)
+        self.weights = np.bincount(self.word_signature, minlength=len(self.signatures)).astype(np.int64)
+
+        max_length = max((len(signature) for signature in self.signatures), default=0)
+
+        self.counts = np.zeros((len(self.signatures), len(alphabet)), dtype=np.uint8)
+        letters = np.full((len(self.signatures), max_length), -1, dtype=np.int8)
+        self.lengths = np.zeros(len(self.signatures), dtype=np.int8)
+        self.spellable = np.ones(len(self.signatures), dtype=bool)
+
+        for s, signature in enumerate(self.signatures):
+            self.lengths[s] = len(signature)
+            for k, letter in enumerate(signature):
+                l = self.letter_index.get(letter)
+
+                #a character that is not in the alphabet can never be spelled
+                if l is None:
+                    self.spellable[s] = False
+                    continue
+
+                self.counts[s,l] += 1
+                letters[s,k] = l
+
+        #the padding (-1) of letters points to the last letter of the alphabet, but with a need of 0
+        needs = np.take_along_axis(self.counts, letters.astype(np.intp) % len(alphabet), axis=1)
+        needs[letters < 0] = 0
+
+        self.letters = np.ascontiguousarray(letters.T)
+        self.needs = np.ascontiguousarray(needs.T)
+
+        self.words_with = [np.flatnonzero(self.counts[:,l]) for l in range(len(alphabet))]
+        self.shared_memory = None
+
+    def __len__(self)->int:
+        """
+        Number of signatures, which is the number of rows that are checked for every permutation
+        """
+        return len(self.signatures)
+
+    def count(self, mask:np.ndarray, signature_ids:np.ndarray=None)->int:
+        """
+        Returns how many words are represented by the signatures selected in a boolean mask.
+
+        Parameters
+        ----------
+        mask:np.ndarray
+            a boolean mask of the signatures, or of the rows in signature_ids
+
+        signature_ids:np.ndarray
+            optional, the ids of the signatures the mask is aligned with.
+            default value is None, for a mask of all the signatures
+        """
+        weights = self.weights if signature_ids is None else self.weights[signature_ids]
+        return int(weights[mask].sum())
+
+    def dedup_report(self)->str:
+        """
+        Returns a short description of how much work the anagram signatures removed
+
+        Example
+        -------
+        >> dedup_report()
+        >> '9624 words compiled into 8490 signatures, 1134 checks (11.8%) removed per permutation'
+        """
+        removed = len(self.words) - len(self.signatures)
+        share = 100*removed/len(self.words) if len(self.words) else 0
+        return (str(len(self.words))+' words compiled into '+str(len(self.signatures))+' signatures, '
+                +str(removed)+' checks ('+format(share, '.1f')+'%) removed per permutation')
+
+    def words_with_any(self, letter_ids:list)->np.ndarray:
+        """
+        Returns the sorted ids of the signatures that contain at least one of the given letters.
+
+        Parameters
+        ----------
+        letter_ids:list
+            alphabet indices of the letters
+        """
+        if len(letter_ids) == 1:
+            return self.words_with[letter_ids[0]]
+
+        selected = np.zeros(len(self.signatures), dtype=bool)
+        for l in letter_ids:
+            selected[self.words_with[l]] = True
+        return np.flatnonzero(selected)
+
+    def permutation_indices(self, letters:list)->np.ndarray:
+        """
+        Converts a permutation of letters into an array of alphabet indices.
+
+        Parameters
+        ----------
+        letters:list
+            a list of characters (or a string) where each item is a letter of the alphabet
+        """
+        return np.fromiter((self.letter_index[letter] for letter in letters), dtype=np.intp, count=len(letters))
+
+    def permutations_indices(self, permutations)->np.ndarray:
+        """
+        Converts a batch of permutations into a (permutations x positions) array of alphabet indices.
+
+        Parameters
+        ----------
+        permutations:list
+            a 2-D array, or a list of permutations, where every permutation is a list of letters (or a string),
+            or an array of alphabet indices
+        """
+        if isinstance(permutations, np.ndarray) and permutations.dtype.kind in 'iu':
+            return permutations.astype(np.intp, copy=False)
+        return np.array([self.permutation_indices(letters) for letters in permutations], dtype=np.intp)
+
+    def arrays(self)->dict:
+        """
+        Returns every array needed to rebuild the compiled lexicon, by name (see from_arrays).
+        The words and the signatures are converted to arrays of strings, and the inverted index
+        is flattened into the ids of all the letters one after the other, plus where each letter starts
+        """
+        return {
+            'words': np.array(self.words, dtype=str).reshape(-1),
+            'signatures': np.array(self.signatures, dtype=str).reshape(-1),
+            'word_signature': self.word_signature,
+            'weights': self.weights,
+            'counts': self.counts,
+            'letters': self.letters,
+            'needs': self.needs,
+            'lengths': self.lengths,
+            'spellable': self.spellable,
+            'words_with': np.concatenate(self.words_with).astype(np.intp) if self.words_with else np.zeros(0, dtype=np.intp),
+            'words_with_starts': np.cumsum([0] + [len(ids) for ids in self.words_with]).astype(np.intp)
+        }
+
+    @classmethod
+    def from_arrays(cls, alphabet:list, arrays:dict)->'CompiledLexicon':
+        """
+        Rebuilds a compiled lexicon from the arrays returned by arrays(), without copying or checking them,
+        so it is instant and the arrays can live in shared memory or in a memory-mapped file.
+
+        Parameters
+        ----------
+        alphabet:list
+            a list containing the character letters in the alphabet, the same that compiled the arrays
+
+        arrays:dict
+            name:array pairs, as returned by arrays()
+        """
+        compiled = cls.__new__(cls)
+        compiled.alphabet = list(alphabet)
+        compiled.letter_index = {letter:i for i,letter in enumerate(compiled.alphabet)}
+        compiled.shared_memory = None
+
+        for name in ('words', 'signatures', 'word_signature', 'weights', 'counts', 'letters', 'needs', 'lengths', 'spellable'):
+            setattr(compiled, name, arrays[name])
+
+        starts = arrays['words_with_starts']
+        compiled.words_with = [arrays['words_with'][starts[l]:starts[l+1]] for l in range(len(compiled.alphabet))]
+        return compiled
+
+    def share(self)->tuple:
+        """
+        Copies the arrays of the compiled lexicon into a new shared memory block, so that other processes
+        can attach to it (see attach) instead of reading and compiling the lexicon themselves.
+        Returns a two-item tuple with the SharedMemory, which the caller must close and unlink once
+        the other processes are done, and a small picklable spec with its name and the layout of the arrays
+
+        Example
+        -------
+        >> memory, spec = judge.compiled.share()
+        >> multiprocessing.Process(target=worker, args=(spec,)).start()
+        """
+        arrays = self.arrays()
+        layout, size = self.layout(arrays)
+
+        memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for name, array in arrays.items():
+            offset, dtype, shape = layout[name]
+            np.ndarray(shape, dtype=dtype, buffer=memory.buf, offset=offset)[...] = array
+
+        return memory, {'name': memory.name, 'alphabet': list(self.alphabet), 'layout': layout}
+
+    @classmethod
+    def attach(cls, spec:dict)->'CompiledLexicon':
+        """
+        Rebuilds a compiled lexicon from the shared memory block created by share, in another process.
+        The arrays are read-only views of the block, so nothing is parsed or copied, and the memory
+        of the lexicon is shared by all the processes that attach to it
+
+        Parameters
+        ----------
+        spec:dict
+            the spec returned by share
+        """
+        memory = shared_memory.SharedMemory(name=spec['name'])
+        compiled = cls.from_arrays(spec['alphabet'], cls.arrays_in(memory.buf, spec['layout']))
+        #the views are only valid while the block is open
+        compiled.shared_memory = memory
+        return compiled
+
+    @classmethod
+    def layout(cls, arrays:dict)->tuple:
+        """
+        Places the arrays one after the other, every one starting at a multiple of the alignment.
+        Returns a two-item tuple with a name:(offset, dtype, shape) dictionary and the total size in bytes
+
+        Parameters
+        ----------
+        arrays:dict
+            name:array pairs, as returned by arrays()
+        """
+        layout = {}
+        size = 0
+        for name, array in arrays.items():
+            size = -(-size // cls.alignment) * cls.alignment
+            layout[name] = (size, array.dtype.str, tuple(array.shape))
+            size += array.nbytes
+        return layout, size
+
+    @staticmethod
+    def arrays_in(buffer, layout:dict)->dict:
+        """
+        Returns read-only views of the arrays placed in a buffer (see layout), by name.
+
+        Parameters
+        ----------
+        buffer:
+            any object with the buffer protocol, i.e. the buf of a SharedMemory or a np.memmap
+
+        layout:dict
+            name:(offset, dtype, shape) pairs, as returned by layout
+        """
+        arrays = {}
+        for name, (offset, dtype, shape) in layout.items():
+            array = np.ndarray(tuple(shape), dtype=dtype, buffer=buffer, offset=offset)
+            array.flags.writeable = False
+            arrays[name] = array
+        return arrays
+
+    def save(self, path:str, metadata:dict=None):
+        """
+        Writes the arrays of the compiled lexicon to a binary file that load can memory-map:
+        the file_magic, the length of a json header (8 bytes), the header with the alphabet, the layout
+        of the arrays and the metadata, and then the arrays themselves.
+        The file is written next to path and then renamed, so a reader never sees a partial file.
+
+        Parameters
+        ----------
+        path:str
+            the file to write
+
+        metadata:dict
+            optional, json serializable data stored with the arrays and returned by load
+        """
+        arrays = self.arrays()
+        layout, size = self.layout(arrays)
+        header = json.dumps({'alphabet': list(self.alphabet), 'layout': layout, 'metadata': metadata or {}}).encode()
+
+        #the arrays start after the header, at a multiple of the alignment
+        start = -(-(len(self.file_magic) + 8 + len(header)) // self.alignment) * self.alignment
+
+        temporary = path+'.'+str(os.getpid())+'.tmp'
+        with open(temporary, 'wb') as file:
+            file.write(self.file_magic)
+            file.write(len(header).to_bytes(8, 'little'))
+            file.write(header)
+            for name, array in arrays.items():
+                file.seek(start + layout[name][0])
+                file.write(np.ascontiguousarray(array).tobytes())
+            file.truncate(start + size)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path:str)->tuple:
+        """
+        Rebuilds a compiled lexicon from a file written by save, with a single memory map of the file,
+        so the arrays are only read from disk when they are used.
+        Returns a two-item tuple with the compiled lexicon and the metadata that was saved with it.
+        Raises ValueError when the file was not written by save
+
+        Parameters
+        ----------
+        path:str
+            the file to read
+        """
+        with open(path, 'rb') as file:
+            if file.read(len(cls.file_magic)) != cls.file_magic:
+                raise ValueError(str(path)+" is not a compiled lexicon file")
+            header_length = int.from_bytes(file.read(8), 'little')
+            header = json.loads(file.read(header_length))
+
+        start = -(-(len(cls.file_magic) + 8 + header_length) // cls.alignment) * cls.alignment
+        data = np.memmap(path, dtype=np.uint8, mode='r', offset=start) if os.path.getsize(path) > start else np.zeros(0, dtype=np.uint8)
+
+        return cls.from_arrays(header['alphabet'], cls.arrays_in(data, header['layout'])), header['metadata']
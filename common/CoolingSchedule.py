@@ -0,0 +1,216 @@
+import math
+
+class CoolingSchedule:
+    """
+    Base class of the temperature schedules of the simulated annealing search.
+    The annealer reads temperature before every step, and calls update after it with what happened,
+    so a schedule can adapt to the observed acceptance rate and score deltas.
+    A schedule can also ask the annealer to restart from the best permutation of its archive (see should_restart).
+
+    Attributes
+    ----------
+    temperature:float
+        the temperature of the next step
+
+    steps:int
+        the number of steps so far
+
+    Methods
+    -------
+    update(delta:float, accepted:bool, improved:bool)
+        Moves the schedule one step forward, given the result of the last step
+
+    should_restart()->bool
+        Returns True when the annealer should restart from the best permutation of its archive
+
+    initial_temperature(deltas:list, acceptance:float=0.5)->float
+        Static method. Returns the temperature that accepts a worse neighbour with the given probability, on average
+    """
+
+    def __init__(self, temperature:float):
+        self.temperature = temperature
+        self.steps = 0
+
+    def update(self, delta:float, accepted:bool, improved:bool):
+        """
+        Moves the schedule one step forward.
+
+        Parameters
+        ----------
+        delta:float
+            the score of the neighbour minus the score of the current permutation,
+            None when it is not known (i.e. the count of the neighbour stopped early, see SwapScorer.count_swap_until)
+
+        accepted:bool
+            True if the neighbour was accepted
+
+        improved:bool
+            True if the neighbour is the best permutation found so far
+        """
+        self.steps += 1
+
+    def should_restart(self)->bool:
+        return False
+
+    @staticmethod
+    def initial_temperature(deltas:list, acceptance:float=0.5)->float:
+        """
+        Returns the temperature where a worse neighbour with the mean of the worse deltas is accepted with probability
+        acceptance, i.e. -mean/log(acceptance), from a sample of deltas (e.g. random swaps of the starting permutation)
+
+        Parameters
+        ----------
+        deltas:list
+            a sample of score deltas, only the negative ones are used
+
+        acceptance:float
+            the probability of accepting the mean worse neighbour at that temperature
+        """
+        worse = [-delta for delta in deltas if delta < 0]
+        if not worse:
+            return 1.0
+        return max(1e-9, (sum(worse) / len(worse)) / -math.log(acceptance))
+
+    def __str__(self)->str:
+        return type(self).__name__
+
+
+class GeometricSchedule(CoolingSchedule):
+    """
+    The temperature is multiplied by cooling_rate after every step, the schedule of SimulatedAnnealing.py
+    """
+
+    def __init__(self, temperature:float=1000, cooling_rate:float=0.9999):
+        super().__init__(temperature)
+        self.cooling_rate = cooling_rate
+
+    def update(self, delta:float, accepted:bool, improved:bool):
+        self.steps += 1
+        self.temperature *= self.cooling_rate
+
+
+class LundyMeesSchedule(CoolingSchedule):
+    """
+    The Lundy-Mees schedule, T = T / (1 + beta*T) after every step, that cools slowly at low temperatures.
+    beta is picked so that the temperature goes from temperature to final_temperature in steps steps
+    """
+
+    def __init__(self, temperature:float=1000, final_temperature:float=1, steps:int=250000):
+        super().__init__(temperature)
+        self.beta = (temperature - final_temperature) / (steps * temperature * final_temperature)
+
+    def update(self, delta:float, accepted:bool, improved:bool):
+        self.steps += 1
+        self.temperature /= 1 + self.beta * self.temperature
+
+
+class AcceptanceSchedule(CoolingSchedule):
+    """
+    The temperature follows a target acceptance rate, that decays geometrically from start_rate to end_rate in steps steps.
+    After every window of steps the observed acceptance rate is compared with the target, and the temperature is
+    multiplied by (target/observed)**gain (between 1/2 and 2), so the search never spends long stretches where nearly
+    every neighbour, or nearly none, is accepted
+    """
+
+    def __init__(self, temperature:float=1000, start_rate:float=0.5, end_rate:float=0.005, steps:int=250000,
+                 window:int=200, gain:float=0.5):
+        super().__init__(temperature)
+        self.start_rate = start_rate
+        self.end_rate = end_rate
+        self.total_steps = steps
+        self.window = window
+        self.gain = gain
+        self.window_accepted = 0
+
+    def target_rate(self)->float:
+        progress = min(1.0, self.steps / self.total_steps)
+        return self.start_rate * (self.end_rate / self.start_rate) ** progress
+
+    def update(self, delta:float, accepted:bool, improved:bool):
+        self.steps += 1
+        self.window_accepted += accepted
+        if self.steps % self.window == 0:
+            observed = max(self.window_accepted, 0.5) / self.window
+            self.temperature *= min(2.0, max(0.5, (self.target_rate() / observed) ** self.gain))
+            self.window_accepted = 0
+
+
+class ReheatSchedule(CoolingSchedule):
+    """
+    Wraps another schedule, and multiplies its temperature by factor when no better permutation was found
+    for patience steps (stagnation), so the search can leave the local maximum it is stuck in.
+    A reheat never goes above the starting temperature of the schedule
+    """
+
+    def __init__(self, schedule:CoolingSchedule, patience:int=5000, factor:float=10.0):
+        self.schedule = schedule
+        self.max_temperature = schedule.temperature
+        self.patience = patience
+        self.factor = factor
+        self.stagnant = 0
+        self.reheats = 0
+
+    @property
+    def temperature(self)->float:
+        return self.schedule.temperature
+
+    @property
+    def steps(self)->int:
+        return self.schedule.steps
+
+    def update(self, delta:float, accepted:bool, improved:bool):
+        self.schedule.update(delta, accepted, improved)
+        self.stagnant = 0 if improved else self.stagnant + 1
+        if self.stagnant >= self.patience:
+            self.schedule.temperature = min(self.max_temperature, self.schedule.temperature * self.factor)
+            self.stagnant = 0
+            self.reheats += 1
+
+    def should_restart(self)->bool:
+        return self.schedule.should_restart()
+
+    def __str__(self)->str:
+        return 'Reheat(' + str(self.schedule) + ')'
+
+
+class RestartSchedule(CoolingSchedule):
+    """
+    Wraps another schedule, and asks the annealer to restart from the best permutation of its archive when no better
+    permutation was found for patience steps (stagnation). The temperature is multiplied by factor on every restart
+    (1 keeps it as it is)
+    """
+
+    def __init__(self, schedule:CoolingSchedule, patience:int=10000, factor:float=1.0):
+        self.schedule = schedule
+        self.patience = patience
+        self.factor = factor
+        self.stagnant = 0
+        self.restarts = 0
+        self.restart = False
+
+    @property
+    def temperature(self)->float:
+        return self.schedule.temperature
+
+    @property
+    def steps(self)->int:
+        return self.schedule.steps
+
+    def update(self, delta:float, accepted:bool, improved:bool):
+        self.schedule.update(delta, accepted, improved)
+        self.stagnant = 0 if improved else self.stagnant + 1
+        if self.stagnant >= self.patience:
+            self.schedule.temperature *= self.factor
+            self.stagnant = 0
+            self.restarts += 1
+            self.restart = True
+
+    def should_restart(self)->bool:
+        """
+        Returns True once after every stagnation
+        """
+        restart, self.restart = self.restart, False
+        return restart or self.schedule.should_restart()
+
+    def __str__(self)->str:
+        return 'Restart(' + str(self.schedule) + ')'
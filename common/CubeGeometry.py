@@ -0,0 +1,110 @@
+import numpy as np
+
+class CubeGeometry:
+    """
+    Class that describes the layout of a set of cubes (or dice) with the same number of faces,
+    so that the Judge, the Lexicon and the searches do not assume 6 cubes with 6 faces.
+
+    A permutation is a flat list of cubes x faces letters, where index i is the face i%faces of the cube i//faces.
+    Every face position is also a color, so the face f of every cube has the same color.
+
+    Attributes
+    ----------
+    cubes:int
+        the number of cubes
+
+    faces:int
+        the number of faces (colors) of every cube
+
+    size:int
+        the number of letters in a permutation (cubes x faces)
+
+    cube_of:np.ndarray
+        cube_of[i] is the cube of the i-th position
+
+    face_of:np.ndarray
+        face_of[i] is the face (color) of the i-th position
+
+    Methods
+    -------
+    position(cube:int, face:int)->int
+        Returns the index of a face of a cube in a permutation
+
+    rainbow_length()->int
+        Returns the length of the longest word that can be a rainbow word
+
+    cube_swaps()->list
+        Returns the pairs of indices of all the swaps within a cube
+
+    face_swaps()->list
+        Returns the pairs of indices of all the swaps within a face (color)
+
+    swaps()->list
+        Returns the swaps within a cube followed by the swaps within a face
+    """
+    def __init__(self, cubes:int=6, faces:int=6):
+        """
+        Constructor that checks the dimensions and precomputes the cube and face of every position
+        """
+        if cubes < 1 or faces < 1:
+            raise ValueError("a geometry needs at least one cube and one face, got "+str(cubes)+" cubes and "+str(faces)+" faces")
+
+        self.cubes = cubes
+        self.faces = faces
+        self.size = cubes*faces
+
+        positions = np.arange(self.size)
+        self.cube_of = positions // faces
+        self.face_of = positions % faces
+
+    def __repr__(self)->str:
+        return 'CubeGeometry(cubes='+str(self.cubes)+', faces='+str(self.faces)+')'
+
+    def position(self, cube:int, face:int)->int:
+        """
+        Returns the index of a face of a cube in a permutation.
+
+        Parameters
+        ----------
+        cube:int
+            the cube, from 0 to cubes-1
+
+        face:int
+            the face (color), from 0 to faces-1
+        """
+        return cube*self.faces + face
+
+    def rainbow_length(self)->int:
+        """
+        Returns the length of the longest word that can be a rainbow word,
+        since every letter of a rainbow word takes a different cube and a different color
+        """
+        return min(self.cubes, self.faces)
+
+    def cube_swaps(self)->list:
+        """
+        Returns a list of 2-item tuples with the pairs of indices of all the swaps within a cube,
+        cube by cube (cubes x faces*(faces-1)/2 swaps)
+        """
+        return [(self.position(cube, j), self.position(cube, k))
+                for cube in range(self.cubes) for j in range(self.faces-1) for k in range(j+1, self.faces)]
+
+    def face_swaps(self)->list:
+        """
+        Returns a list of 2-item tuples with the pairs of indices of all the swaps within a face (color),
+        face by face (faces x cubes*(cubes-1)/2 swaps)
+        """
+        return [(self.position(j, face), self.position(k, face))
+                for face in range(self.faces) for j in range(self.cubes-1) for k in range(j+1, self.cubes)]
+
+    def swaps(self)->list:
+        """
+        Returns a list of 2-item tuples with the pairs of indices to be swapped, the swaps within a cube first
+        and then the swaps within a face. For 6 cubes with 6 faces these are the 90 + 90 swaps of the searches.
+
+        Example
+        -------
+        >> CubeGeometry(6, 6).swaps()
+        >> [(0, 1), (0, 2), ..., (29, 35)]
+        """
+        return self.cube_swaps() + self.face_swaps()
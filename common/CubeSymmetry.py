@@ -0,0 +1,205 @@
+import itertools
+import math
+import numpy as np
+from CubeGeometry import CubeGeometry
+
+class CubeSymmetry:
+    """
+    Class to canonicalize letter permutations, so that equivalent permutations are treated as one.
+
+    A permutation is a grid of cubes x colors (index i is the cube i//faces and the color i%faces, see CubeGeometry).
+    Reordering the cubes, or consistently relabelling the colors, gives a permutation that spells
+    exactly the same mono and rainbow words, so there are up to cubes! x colors! equivalent layouts of every permutation.
+    The canonical form is the layout that comes first in alphabetical order among all of them.
+
+    The relabellings of the colors are enumerated, so with more than max_relabellings of them (more than 7 colors)
+    only the cubes are reordered. The key then still never mixes up permutations that are not equivalent,
+    but equivalent permutations with relabelled colors can have different keys.
+
+    The canonical key is a compact int representation of the canonical form: every letter takes 5 bits
+    (its alphabet index) and the first letter is the most significant one, so two permutations are
+    equivalent if and only if they have the same key.
+
+    Attributes
+    ----------
+    alphabet:list
+        a list containing the character letters in the alphabet
+
+    geometry:CubeGeometry
+        the number of cubes (rows of the grid) and colors (columns of the grid)
+
+    cubes:int
+        the number of cubes (rows of the grid)
+
+    colors:int
+        the number of colors (columns of the grid)
+
+    column_orders:np.ndarray
+        (colors! x colors) array with every possible relabelling of the colors,
+        or only the identity when there are more than max_relabellings
+
+    Methods
+    -------
+    canonical(letters:list)->list
+        Returns the canonical form of a permutation, as a list of letters
+
+    key(letters:list)->int
+        Returns the canonical key of a permutation
+
+    from_key(key:int)->list
+        Returns the canonical form, as a list of letters, that a canonical key represents
+
+    distances(letters:list, others:np.ndarray)->np.ndarray
+        Returns the smallest number of letters that differ between a permutation and each of others,
+        over all their equivalent layouts
+    """
+    #bits used by every letter in a key
+    letter_bits = 5
+
+    #largest number of color relabellings that are enumerated (7!)
+    max_relabellings = 5040
+
+    #number of other permutations compared at once by distances, which bounds its memory
+    distance_chunk = 16
+
+    def __init__(self, alphabet:list, geometry:CubeGeometry=None):
+        """
+        Constructor that precomputes all the relabellings of the colors.
+        The default geometry is 6 cubes with 6 faces
+        """
+        self.alphabet = alphabet
+        self.geometry = geometry if geometry is not None else CubeGeometry()
+        self.cubes = self.geometry.cubes
+        self.colors = colors = self.geometry.faces
+        self.letter_index = {letter:i for i,letter in enumerate(alphabet)}
+
+        if math.factorial(colors) <= self.max_relabellings:
+            self.column_orders = np.array(list(itertools.permutations(range(colors))), dtype=np.intp)
+        else:
+            self.column_orders = np.arange(colors, dtype=np.intp)[None,:]
+
+        #value of every column in a row key, the first column is the most significant
+        #None when a whole row does not fit in an int64
+        self.column_weights = None
+        if self.letter_bits*colors <= 63:
+            self.column_weights = np.array([1 << (self.letter_bits*(colors-1-c)) for c in range(colors)], dtype=np.int64)
+
+    def canonical_grid(self, letters:list)->np.ndarray:
+        """
+        Returns the canonical form of a permutation as a (cubes x colors) array of alphabet indices.
+
+        For a fixed relabelling of the colors the first layout in alphabetical order is the one with the
+        cubes sorted, so the rows are sorted for each of the colors! relabellings and the smallest one is kept.
+
+        Parameters
+        ----------
+        letters:list
+            a list of characters (or a string) where each item is a letter of the alphabet
+        """
+        grid = np.array([self.letter_index[letter] for letter in letters], dtype=np.int64).reshape(self.cubes, self.colors)
+
+        #rows that are too long for an int64 key are only found with more colors than max_relabellings,
+        #so there is just the identity relabelling and the rows are sorted column by column
+        if self.column_weights is None:
+            return grid[np.lexsort(grid.T[::-1])]
+
+        #(relabellings x cubes x colors), every row is turned into a single number that keeps the alphabetical order
+        images = grid[:, self.column_orders].transpose(1, 0, 2)
+        row_keys = images @ self.column_weights
+
+        #sort the cubes of every relabelling, and keep the relabelling that comes first
+        row_order = np.argsort(row_keys, axis=1, kind='stable')
+        sorted_keys = np.take_along_axis(row_keys, row_order, axis=1)
+        best = np.lexsort(sorted_keys.T[::-1])[0]
+
+        return images[best][row_order[best]]
+
+    def canonical(self, letters:list)->list:
+        """
+        Returns the canonical form of a permutation, as a list of letters.
+
+        Parameters
+        ----------
+        letters:list
+            a list of characters (or a string) where each item is a letter of the alphabet
+
+        Example
+        -------
+        >> canonical('eeeaarroottiissllnnudcpmhygbfwkvzxjq')
+        >> ['a', 'a', 'e', 'e', 'e', 'r', ...]
+        """
+        return [self.alphabet[i] for i in self.canonical_grid(letters).ravel()]
+
+    def key(self, letters:list)->int:
+        """
+        Returns the canonical key of a permutation, equivalent permutations have the same key.
+
+        Parameters
+        ----------
+        letters:list
+            a list of characters (or a string) where each item is a letter of the alphabet
+        """
+        key = 0
+        for letter in self.canonical_grid(letters).ravel().tolist():
+            key = (key << self.letter_bits) | letter
+        return key
+
+    def from_key(self, key:int)->list:
+        """
+        Returns the canonical form, as a list of letters, that a canonical key represents.
+
+        Parameters
+        ----------
+        key:int
+            a key returned by the key method
+        """
+        mask = (1 << self.letter_bits) - 1
+        size = self.cubes*self.colors
+        return [self.alphabet[(key >> (self.letter_bits*(size-1-i))) & mask] for i in range(size)]
+
+    def distances(self, letters:list, others:np.ndarray)->np.ndarray:
+        """
+        Returns the symmetry-aware Hamming distance between a permutation and each of others:
+        the smallest number of letters that differ, over every reordering of the cubes and every relabelling
+        of the colors (see column_orders) of the permutation. Equivalent permutations are at distance 0,
+        and two permutations one swap apart are at distance 2 at most.
+
+        For every relabelling, cost[i,j] is the number of letters that differ between the i-th cube and
+        the j-th cube of the other permutation, and the best matching of the cubes is found one cube at a time
+        over the subsets of cubes that are already matched (2**cubes states).
+
+        Parameters
+        ----------
+        letters:list
+            a list of characters (or a string) where each item is a letter of the alphabet
+
+        others:np.ndarray
+            a (permutations x positions) array of alphabet indices
+        """
+        cubes, colors = self.cubes, self.colors
+        grid = np.array([self.letter_index[letter] for letter in letters], dtype=np.int64).reshape(cubes, colors)
+        images = grid[:, self.column_orders].transpose(1, 0, 2)
+        others = np.asarray(others, dtype=np.int64).reshape(-1, cubes, colors)
+
+        subsets = 1 << cubes
+        sizes = np.array([bin(subset).count('1') for subset in range(subsets)])
+
+        distances = np.zeros(len(others), dtype=np.int64)
+        for start in range(0, len(others), self.distance_chunk):
+            chunk = others[start:start+self.distance_chunk]
+
+            #(cubes x cubes x others*relabellings)
+            cost = (images[None,:,:,None,:] != chunk[:,None,None,:,:]).sum(axis=-1, dtype=np.int16)
+            cost = cost.reshape(-1, cubes, cubes).transpose(1, 2, 0).copy()
+
+            #best[subset] is the fewest differences when the first cubes are matched to the cubes in subset
+            best = np.full((subsets, cost.shape[2]), cubes*colors+1, dtype=np.int16)
+            best[0] = 0
+            for i in range(cubes):
+                matched = np.flatnonzero(sizes == i)
+                for j in range(cubes):
+                    free = matched[(matched >> j) & 1 == 0]
+                    best[free | (1 << j)] = np.minimum(best[free | (1 << j)], best[free] + cost[i, j])
+
+            distances[start:start+len(chunk)] = best[-1].reshape(len(chunk), -1).min(axis=1)
+        return distances
@@ -0,0 +1,211 @@
+from bisect import bisect_left
+import numpy as np
+from CubeSymmetry import CubeSymmetry
+
+class HallOfFame:
+    """
+    A bounded archive of the best permutations found, that only keeps permutations that are different enough.
+    It has the same methods as PriorityQueue (and the same (priority, sub) order), so it can be used wherever
+    a PriorityQueue keeps track of the best permutations found.
+
+    A permutation that is equivalent to one in the archive (same canonical key, see CubeSymmetry) is found
+    with a single dictionary lookup, and only replaces it when it has a higher (priority, sub).
+    Otherwise, the permutations of the archive that are closer than min_distance to it (see CubeSymmetry.distances)
+    are its neighbours: it is rejected when one of them is at least as good, and it replaces all of them otherwise.
+    So the archive never holds two permutations closer than min_distance, i.e. two permutations one swap apart
+    with min_distance=3.
+
+    Parameters
+    ----------
+    capacity:int
+        The maximum number of permutations that the archive can hold.
+
+    symmetry:CubeSymmetry
+        the object that computes the canonical keys and the distances
+
+    min_distance:int
+        the smallest symmetry-aware distance between two permutations of the archive.
+        default value is 3 (more than one swap apart), 1 only rejects the equivalent permutations
+
+    Methods
+    -------
+    put(priority:int,sub:int,data:any,letters:list=None,key:int=None)->int
+        Adds a permutation to the archive. Returns 1 if it was added, 0 if it was not.
+
+    remove(i:int)
+        Removes the i-th permutation, from the lowest to the highest
+
+    merge(other:HallOfFame)->int
+        Puts every permutation of another archive (i.e. from another process) in this one
+
+    get()->tuple
+        Removes and returns the permutation with the highest priority.
+
+    peek()->tuple
+        Returns the permutation with the highest priority without removing it.
+
+    peek_last()->tuple
+        Returns the permutation with the lowest priority without removing it.
+
+    is_full()->bool
+        Returns True if the archive holds as many permutations as its capacity, False otherwise
+
+    empty()
+        Removes all permutations from the archive
+
+    is_empty()->bool
+        Returns True if the archive is empty, False otherwise
+
+    __str__()->str
+        Returns a string representation of the archive in the format (priority,data)->(priority,data)->...->(priority,data)
+    """
+    __slots__ = ('capacity', 'symmetry', 'min_distance', 'keys', 'nodes', 'letters', 'canonical_keys', 'canonical', 'order')
+
+    def __init__(self, capacity:int, symmetry:CubeSymmetry, min_distance:int=3):
+        self.capacity:int = capacity
+        self.symmetry:CubeSymmetry = symmetry
+        self.min_distance:int = min_distance
+        #(priority, sub, order) of every permutation, from the lowest to the highest, same as PriorityQueue
+        self.keys:list = []
+        #(priority, sub, data) of every permutation, aligned with keys
+        self.nodes:list = []
+        #the permutation of every node as alphabet indices, and its canonical key, aligned with keys
+        self.letters:list = []
+        self.canonical_keys:list = []
+        #canonical key:(priority, sub) of every permutation in the archive
+        self.canonical:dict = {}
+        #number of permutations added so far, used to order the ties
+        self.order:int = 0
+
+    @property
+    def length(self)->int:
+        return len(self.nodes)
+
+    def __str__(self) -> str:
+        return "->".join("("+str(priority)+","+str(data)+")" for priority, sub, data in reversed(self.nodes))
+
+    def is_empty(self)->bool:
+        return not self.nodes
+
+    def put(self, priority:int, sub:int, data:any, letters:list=None, key:int=None)->int:
+        """
+        Adds a permutation to the archive, unless it is full and the permutation is not better than the lowest one,
+        or there is an equivalent or close permutation that is at least as good.
+        Returns 1 if it was added, 0 if it was not.
+        The cheap check against the lowest permutation comes first, so the canonical key and the distances
+        are only computed for a permutation that can enter the archive.
+
+        Parameters
+        ----------
+        priority:int
+            the score of the permutation
+
+        sub:int
+            the score that breaks the ties of priority
+
+        data:any
+            what is returned by get, the permutation as a string or a tuple that starts with it
+            (i.e. (permutation, update)) unless letters is given
+
+        letters:list
+            optional, the permutation as a list of letters (or a string).
+            default value is None, to take it from data
+
+        key:int
+            optional, the canonical key of the permutation when it is already known (i.e. from another archive).
+            default value is None, to compute it
+        """
+        if letters is None:
+            letters = data if isinstance(data, str) else data[0]
+
+        keys = self.keys
+
+        #if the archive is full and the new permutation is smaller than (or equal to) the rear one
+        if len(keys) >= self.capacity and keys and (priority, sub) <= keys[0][:2]:
+            return 0
+
+        #an equivalent permutation is one lookup away
+        if key is None:
+            key = self.symmetry.key(letters)
+        if key in self.canonical:
+            if self.canonical[key] >= (priority, sub):
+                return 0
+            self.remove(self.canonical_keys.index(key))
+
+        #the close permutations are replaced when they are all worse
+        if self.min_distance > 1 and self.letters:
+            distances = self.symmetry.distances(letters, np.array(self.letters))
+            close = np.flatnonzero(distances < self.min_distance).tolist()
+            if any(self.nodes[i][:2] >= (priority, sub) for i in close):
+                return 0
+            for i in reversed(close):
+                self.remove(i)
+
+        self.order += 1
+        if keys and (priority, sub) <= keys[0][:2]:
+            #it goes after the rear permutation, even when they are equal
+            i = 0
+            keys.insert(0, (priority, sub, -self.order))
+        else:
+            #it goes before the permutations that are equal to it
+            i = bisect_left(keys, (priority, sub, self.order))
+            keys.insert(i, (priority, sub, self.order))
+        self.nodes.insert(i, (priority, sub, data))
+        self.letters.insert(i, np.array([self.symmetry.letter_index[letter] for letter in letters], dtype=np.uint8))
+        self.canonical_keys.insert(i, key)
+        self.canonical[key] = (priority, sub)
+
+        #make sure that the length stays within capacity
+        if len(keys) > self.capacity:
+            self.remove(0)
+        return 1
+
+    def remove(self, i:int):
+        """
+        Removes the i-th permutation, from the lowest to the highest
+        """
+        del self.keys[i]
+        del self.nodes[i]
+        del self.letters[i]
+        del self.canonical[self.canonical_keys.pop(i)]
+
+    def merge(self, other:'HallOfFame')->int:
+        """
+        Puts every permutation of another archive in this one, i.e. the archive of another process
+        (an archive can be pickled), from the best to the worst, reusing their canonical keys. Returns how many were added.
+
+        Parameters
+        ----------
+        other:HallOfFame
+            the archive to merge, it is not changed
+        """
+        added = 0
+        for (priority, sub, data), letters, key in zip(reversed(other.nodes), reversed(other.letters), reversed(other.canonical_keys)):
+            #the cheap check against the lowest permutation, before the letters are rebuilt
+            if self.is_full() and (priority, sub) <= self.keys[0][:2]:
+                continue
+            added += self.put(priority, sub, data, [self.symmetry.alphabet[l] for l in letters], key)
+        return added
+
+    def get(self)->tuple:
+        if not self.nodes:
+            return None
+        node = self.nodes[-1]
+        self.remove(len(self.nodes)-1)
+        return node
+
+    def peek(self)->tuple:
+        return self.nodes[-1]
+
+    def peek_last(self)->tuple:
+        return self.nodes[0]
+
+    def is_full(self)->bool:
+        return len(self.nodes) >= self.capacity
+
+    def empty(self):
+        self.keys.clear()
+        self.nodes.clear()
+        self.letters.clear()
+        self.canonical_keys.clear()
+        self.canonical.clear()
@@ -1,3 +1,8 @@
+import numpy as np
+from CompiledLexicon import CompiledLexicon
+from SwapScorer import SwapScorer
+from CubeGeometry import CubeGeometry
+
 class Judge:
     """
     Intended use: Three search
@@ -10,6 +15,18 @@ class Judge:
         
     words:list
         a list of strings, where each item is a word of up to 6 characters.
+        
+    compiled:CompiledLexicon
+        the NumPy representation of words, used by count_words when the Judge is created with compiled=True
+        (or with an already compiled lexicon). None otherwise
+        
+    rainbow_engine:str
+        the rainbow checker used by count_words when the Judge is not compiled.
+        'matching' (default) for is_rainbow_matching, or 'recursive' for is_rainbow
+        
+    geometry:CubeGeometry
+        the number of faces (colors) of the cubes. Index i of a permutation is the face i%faces of the cube i//faces,
+        and the number of cubes is taken from the length of the permutation
     
     Methods
     -------
@@ -17,6 +34,13 @@ class Judge:
         Checks recursively if a given word is a rainbow word based on a letter permutation
         and returns True or False
         
+    rainbow_masks(letters:list)->tuple
+        Precomputes the per-letter position bitmasks of a permutation, used by is_rainbow_matching
+        
+    is_rainbow_matching(word:str, letter_masks:dict, conflicts:list)->bool
+        Checks if a given word is a rainbow word by matching its letters to positions with different
+        cubes and colors, using bit operations. Same result as is_rainbow
+        
     is_mono(word:list, letters:list)->int
         Checks if a given string is a mono word given a color-combination. returns
         the applicable color, or None if it's not possible.
@@ -31,14 +55,73 @@ class Judge:
     analyze_rainbow(letters:list)->list
         only counts how many rainbow words can be spelled given a permutation, and returns the total
         
+    count_words(letters:list)->tuple
+        Counts how many mono and rainbow words can be spelled given a permutation
+        
+    count_words_many(permutations:list)->tuple
+        Counts how many mono and rainbow words can be spelled by every permutation in a batch,
+        and returns two arrays
+        
+    count_mono_many(indices:np.ndarray)->np.ndarray
+        Compiled mode. Counts how many mono words can be spelled by every permutation in a batch
+        
+    count_words_until(letters:list, target:int, measure:str='both', stop_above:bool=True)->tuple
+        Compiled mode. Same as count_words, but stops as soon as the score is known to reach the target
+        or known to stay below it
+        
+    rainbow_target(mono:int, target:int, measure:str)->int
+        Returns how many rainbow words are needed to reach a target score, given the number of mono words
+        
+    rainbow_until(indices:np.ndarray, target:int)->tuple
+        Compiled mode. Runs the rainbow search one letter at a time, and stops once the count reaches the target
+        or can no longer reach it
+        
+    color_fits(indices:np.ndarray)->np.ndarray
+        Compiled mode. Returns a (faces x signatures) boolean matrix of the colors that can spell every signature
+        
+    color_fits_many(indices:np.ndarray)->np.ndarray
+        Compiled mode. Same as color_fits, for a (permutations x positions) array
+        
+    mono_mask(indices:np.ndarray)->np.ndarray
+        Compiled mode. Returns a boolean mask of the signatures that are mono words
+        
+    rainbow_mask(indices:np.ndarray)->np.ndarray
+        Compiled mode. Returns a boolean mask of the signatures that are rainbow words
+        
+    rainbow_mask_many(indices:np.ndarray)->np.ndarray
+        Compiled mode. Same as rainbow_mask, for a (permutations x positions) array
+        
+    rainbow_search(indices:np.ndarray)->generator
+        Compiled mode. Searches the rainbow words one letter at a time, yielding the words found and
+        the words still being searched after every letter
+        
+    swap_scorer(letters:list)->SwapScorer
+        Compiled mode. Returns a SwapScorer that scores swaps incrementally from the given permutation
     
     """
-    def __init__(self, alphabet:list, words:list):
+    def __init__(self, alphabet:list, words:list, compiled:bool=False, rainbow_engine:str='matching', geometry:CubeGeometry=None):
         """
-        Contructor that initializes the alphabet, words and best attributes
+        Contructor that initializes the alphabet, words and best attributes.
+        When compiled is True the words are converted once into NumPy matrices, and count_words
+        scores the whole lexicon with array operations (same results, much faster).
+        compiled can also be a CompiledLexicon, i.e. one attached to shared memory by a worker process,
+        which is used as is, and words can then be None to take them from it.
+        The default geometry is 6 cubes with 6 faces
         """
+        if rainbow_engine not in ('matching', 'recursive'):
+            raise ValueError("rainbow_engine must be 'matching' or 'recursive', got "+str(rainbow_engine))
+        
         self.alphabet = alphabet
-        self.words = words
+        #not an isinstance check, since a driver imported as a package (..common.CompiledLexicon) and this module
+        #(CompiledLexicon) load the class twice, and the instances of one are not instances of the other
+        if hasattr(compiled, 'weights'):
+            self.words = words if words is not None else compiled.words
+            self.compiled = compiled
+        else:
+            self.words = words
+            self.compiled = CompiledLexicon(alphabet, words) if compiled else None
+        self.rainbow_engine = rainbow_engine
+        self.geometry = geometry if geometry is not None else CubeGeometry()
         #We could add something like best_mono, best_rainbow.
         #which can be useful if we want to use multi threading
     
@@ -61,25 +144,26 @@ class Judge:
             it should be an empty list, that will keep track of what cubes were the chosen colors taken from
             
         color:int
-            represent which out of the six colors are we considering at a given level of recursion
+            represent which out of the colors (faces) are we considering at a given level of recursion
             default value is zero
         """
+        faces = self.geometry.faces
         
-        #base case is True when level=6
-        #we only care about levels 0 through 5
-        if(color == 6):
+        #base case is True when level=faces
+        #we only care about levels 0 through faces-1
+        if(color == faces):
             #since only the unspellable words make it here
             #we must return false.
             return False
         else:
             #loop trhough all of the indices that are attached to the current color.
-            for i in range(color,len(letters),6):
+            for i in range(color,len(letters),faces):
 
                 #get the letter stored at the current index in the letters list
                 letter = letters[i]
                 
                 #calculate to which cube does the letter belong to
-                cube = i//6
+                cube = i//faces
 
                 if letter in word and cube not in cube_record:
                     word.remove(letter)
@@ -107,6 +191,83 @@ class Judge:
             return self.is_rainbow(word,letters,cube_record,color+1)
 
     
+    def rainbow_masks(self, letters:list)->tuple:
+        """
+        Precomputes the bitmasks used by is_rainbow_matching for a letter permutation.
+        Bit i of a mask represents the position i of the permutation.
+        Returns a two-item tuple, where the first one is a dictionary of letter:mask pairs with the positions
+        of every letter, and the second is a list where conflicts[i] is the mask of all the positions that share
+        a cube or a color with position i (including i itself)
+        
+        Parameters
+        ----------
+        letters:list
+            a list containing letters, where every letter in the alphabet appears at least once
+        """
+        letter_masks = {}
+        for i, letter in enumerate(letters):
+            letter_masks[letter] = letter_masks.get(letter, 0) | (1 << i)
+        
+        #masks of the positions on every cube and on every color
+        faces = self.geometry.faces
+        cube_masks = [0]*(len(letters)//faces)
+        color_masks = [0]*faces
+        for i in range(len(letters)):
+            cube_masks[i//faces] |= 1 << i
+            color_masks[i%faces] |= 1 << i
+        
+        conflicts = [cube_masks[i//faces] | color_masks[i%faces] for i in range(len(letters))]
+        
+        return letter_masks, conflicts
+    
+    def is_rainbow_matching(self, word:str, letter_masks:dict, conflicts:list)->bool:
+        """
+        Checks if a given word is a rainbow word, and returns True or False respectively.
+        It gives the same result as is_rainbow.
+        
+        Every letter of the word has to be matched to a position that holds that letter, and no two letters
+        may share a cube or a color. The search keeps a set of masks with the positions that are still available,
+        and places the letters one at a time, starting with the letters that have the fewest positions.
+        Placing a letter on position i removes conflicts[i] from the available positions. Since a letter only
+        appears in a few positions and equal masks are merged, every word is decided with a bounded number of
+        bit operations.
+        
+        Parameters
+        ----------
+        word:str
+            the word to check, as a string or a list of letters
+            
+        letter_masks:dict
+            letter:mask pairs with the positions of every letter, see rainbow_masks
+            
+        conflicts:list
+            the mask of the positions that share a cube or a color with every position, see rainbow_masks
+        """
+        #a letter that is not in the permutation can never be placed
+        for letter in word:
+            if letter not in letter_masks:
+                return False
+        
+        #start with the most constrained letters
+        word = sorted(word, key=lambda letter: bin(letter_masks[letter]).count('1'))
+        
+        available = {(1 << len(conflicts)) - 1}
+        for letter in word:
+            placed = set()
+            for mask in available:
+                options = letter_masks[letter] & mask
+                while options:
+                    lowest = options & -options
+                    placed.add(mask & ~conflicts[lowest.bit_length()-1])
+                    options ^= lowest
+            
+            #there is no way of placing the current letter
+            if not placed:
+                return False
+            available = placed
+        
+        return True
+    
     def is_mono(self,word:list, letters:list)->int:
         """
         Checks if a given string is a mono word given a letter permutation. returns
@@ -124,13 +285,14 @@ class Judge:
         """
         #TODO: think about he possibility of a word being able to be spelled within two different colors and how that can           affect the reward
         
-        #iterate through the six colors
-        for color in range(6):
+        #iterate through the colors
+        faces = self.geometry.faces
+        for color in range(faces):
             #make a copy of the word since we don't want to modify the word
             word_copy = word.copy()
             
             #loop through all the letters mapped to the current color
-            for i in range(color,len(letters),6):
+            for i in range(color,len(letters),faces):
                 
                 #get the letter stored at the current index in the letters list
                 letter = letters[i]
@@ -172,16 +334,28 @@ class Judge:
         
         """
         
+        #compiled mode, the whole lexicon is scored with array operations
+        if self.compiled is not None:
+            indices = self.compiled.permutation_indices(letters)
+            return self.compiled.count(self.mono_mask(indices)), self.compiled.count(self.rainbow_mask(indices))
+        
         #initializing the count for the total of both mono and rainbow  
         mono = 0
         rainbow =0
         
+        #the position masks only depend on the permutation, so they are computed once
+        if self.rainbow_engine == 'matching':
+            letter_masks, conflicts = self.rainbow_masks(letters)
+        
         #iterate through the words in the self.words list 
         #and increment the value of rainbow and mono_color
         for word in self.words:
             
             mono_result = self.is_mono(list(word),letters)
-            rainbow_result = self.is_rainbow(list(word),letters,[])
+            if self.rainbow_engine == 'matching':
+                rainbow_result = self.is_rainbow_matching(word, letter_masks, conflicts)
+            else:
+                rainbow_result = self.is_rainbow(list(word),letters,[])
             
             if isinstance(mono_result, int): 
                 mono+=1
@@ -189,4 +363,443 @@ class Judge:
             if rainbow_result: 
                 rainbow+=1
         
-        return mono, rainbow
\ No newline at end of file
+        return mono, rainbow
+    
+    def count_words_many(self, permutations)->tuple:
+        """
+        Counts how many mono and rainbow words can be spelled by every permutation in a batch.
+        Returns a two-item tuple of integer arrays (mono, rainbow), aligned with the permutations.
+        
+        In compiled mode the mono words of a chunk of permutations are found with a single pass through the
+        lexicon (see color_fits_many) instead of one pass per permutation.
+        Otherwise the permutations are scored one by one with count_words.
+        
+        Parameters
+        ----------
+        permutations:list
+            a 2-D array, or a list of permutations, where every permutation is a list of letters
+            (or a string), or an array of alphabet indices
+            
+        Example
+        --------
+        Input
+            >>count_words_many([base, random_permutation()])
+        Returns
+            >>array([72, 46]), array([898, 1347])
+        """
+        if self.compiled is None:
+            counts = [self.count_words(letters) for letters in permutations]
+            mono = np.array([count[0] for count in counts], dtype=np.int64)
+            rainbow = np.array([count[1] for count in counts], dtype=np.int64)
+            return mono, rainbow
+        
+        indices = self.compiled.permutations_indices(permutations)
+        mono = self.count_mono_many(indices)
+        rainbow = np.zeros(len(indices), dtype=np.int64)
+        
+        #the rainbow search does not get faster with bigger batches, since its work is per branch
+        #and a bigger set of branches no longer fits in the cpu cache, so it goes one permutation at a time
+        for p in range(len(indices)):
+            rainbow[p] = self.compiled.count(self.rainbow_mask(indices[p]))
+        
+        return mono, rainbow
+    
+    def count_mono_many(self, indices:np.ndarray)->np.ndarray:
+        """
+        Compiled mode. Counts how many mono words can be spelled by every permutation in a batch, with a single pass
+        through the lexicon per chunk of permutations (see color_fits_many). Returns an integer array aligned with indices.
+        The mono words are much cheaper than the rainbow words, so they can be counted for a whole batch of candidates
+        before deciding which ones are worth a full count (see Screen).
+        
+        Parameters
+        ----------
+        indices:np.ndarray
+            (permutations x positions) array of alphabet indices, see CompiledLexicon.permutations_indices
+        """
+        mono = np.zeros(len(indices), dtype=np.int64)
+        
+        #bounds the size of the (permutations x faces x max_length x words) comparison of color_fits_many
+        chunk = max(1, (1 << 22) // max(1, self.compiled.letters.size * self.geometry.faces))
+        
+        for start in range(0, len(indices), chunk):
+            block = indices[start:start+chunk]
+            spellable = self.compiled.spellable[None,:]
+            mono[start:start+chunk] = (self.color_fits_many(block).any(axis=1) & spellable) @ self.compiled.weights
+        
+        return mono
+    
+    def count_words_until(self, letters:list, target:int, measure:str='both', stop_above:bool=True)->tuple:
+        """
+        Compiled mode. Counts the mono and rainbow words of a permutation like count_words, for a caller that only
+        needs to know if its score reaches a target (e.g. a child that has to beat the best permutation so far).
+        The mono words are cheap and always counted exactly. The rainbow search runs one letter at a time (see rainbow_until),
+        and stops as soon as the score reaches the target, or can not reach it even if every
+        word still being searched was a rainbow word.
+        
+        Returns a three-item tuple (mono, rainbow, exact). When exact is False the count was stopped early,
+        and the counts are lower bounds if the score reaches the target, or upper bounds if it does not,
+        so comparing the score against the target always gives the right answer.
+        
+        Parameters
+        ----------
+        letters:list
+            a list containing letters, where every letter in the alphabet appears at least once
+            
+        target:int
+            the score to reach
+            
+        measure:str
+            the score that is compared against the target, 'mono', 'rainbow' or 'both' (mono + rainbow).
+            default value is 'both'
+            
+        stop_above:bool
+            optional, when False the count only stops early when the target can not be reached,
+            so every permutation that reaches it gets an exact count. default value is True
+            
+        Example
+        --------
+        Input
+            >>count_words_until(base, 1200)
+        Returns
+            >>72, 1090, False
+        """
+        indices = self.compiled.permutation_indices(letters)
+        mono = self.compiled.count(self.mono_mask(indices))
+        
+        rainbow_target = self.rainbow_target(mono, target, measure)
+        rainbow_mask, low, high = self.rainbow_until(indices, rainbow_target, stop_above=stop_above)
+        
+        return mono, (low if low >= rainbow_target else high), low == high
+    
+    def rainbow_target(self, mono:int, target:int, measure:str)->int:
+        """
+        Returns how many rainbow words a permutation with the given number of mono words needs to reach a target score.
+        When the measure is 'mono' the rainbow words do not matter, so it is 0 if the target is already reached,
+        and a number that can never be reached otherwise.
+        
+        Parameters
+        ----------
+        mono:int
+            the number of mono words of the permutation
+            
+        target:int
+            the score to reach
+            
+        measure:str
+            the score that is compared against the target, 'mono', 'rainbow' or 'both' (mono + rainbow)
+        """
+        if measure == 'rainbow':
+            return target
+        elif measure == 'both':
+            return target - mono
+        elif measure == 'mono':
+            return 0 if mono >= target else len(self.words)+1
+        raise ValueError("measure must be 'mono', 'rainbow' or 'both', got "+str(measure))
+    
+    def rainbow_until(self, indices:np.ndarray, target:int, signature_ids:np.ndarray=None, stop_above:bool=True)->tuple:
+        """
+        Compiled mode. Runs the rainbow search of a permutation (see rainbow_search) one letter at a time, and stops as soon as
+        the words found reach the target (low >= target), or the words found plus the words still being searched can no longer
+        reach it (high < target).
+        
+        Returns a three-item tuple (rainbow, low, high): the boolean mask of the rainbow signatures found so far
+        (aligned with signature_ids), and the lower and upper bounds of the number of rainbow words.
+        When the search finished the mask is complete and low == high.
+        
+        Parameters
+        ----------
+        indices:np.ndarray
+            the permutation as alphabet indices, see CompiledLexicon.permutation_indices
+            
+        target:int
+            the number of rainbow words to reach
+            
+        signature_ids:np.ndarray
+            optional, the ids of the signatures to check. default value is None, which checks every signature
+            
+        stop_above:bool
+            optional, when False it only stops early when the target can not be reached. default value is True
+        """
+        weights = self.compiled.weights if signature_ids is None else self.compiled.weights[signature_ids]
+        
+        #nothing has to be searched when the answer is already known
+        total = int(weights.sum())
+        if target > total or (stop_above and target <= 0):
+            return np.zeros(len(weights), dtype=bool), 0, total
+        
+        for rainbow, perms, rows in self.rainbow_search(indices[None,:], signature_ids):
+            low = int(weights[rainbow[0]].sum())
+            
+            #the branches are sorted by word, so every word still being searched is counted once
+            searched = rows[np.concatenate(([True], rows[1:] != rows[:-1]))] if rows.size else rows
+            high = low + int(weights[searched].sum())
+            
+            if high < target or (stop_above and low >= target):
+                break
+        
+        return rainbow[0], low, high
+    
+    def color_fits(self, indices:np.ndarray, signature_ids:np.ndarray=None, colors:list=None)->np.ndarray:
+        """
+        Compiled mode. Returns a (colors x signatures) boolean matrix, where the item [c,s] is True when every letter
+        of the s-th signature of the compiled lexicon can be spelled with the letters mapped to the c-th color.
+        See color_fits_many.
+        
+        Parameters
+        ----------
+        indices:np.ndarray
+            the permutation as alphabet indices, see CompiledLexicon.permutation_indices
+            
+        signature_ids:np.ndarray
+            optional, the ids of the signatures to check. default value is None, which checks every signature
+            
+        colors:list
+            optional, the colors to check. default value is None, which checks every color
+        """
+        return self.color_fits_many(indices[None,:], signature_ids, colors)[0]
+    
+    def color_fits_many(self, indices:np.ndarray, signature_ids:np.ndarray=None, colors:list=None)->np.ndarray:
+        """
+        Compiled mode. Returns a (permutations x colors x signatures) boolean matrix, where the item [p,c,s] is True
+        when every letter of the s-th signature can be spelled with the letters mapped to the c-th color of the p-th
+        permutation.
+        
+        The letter counts of the colors (permutations x faces x 26) are gathered at the letters of every word, and
+        compared in one broadcast against how many copies of each of those letters the word needs, so only
+        the (up to 6) letters of the word are compared instead of the 26 letters of the alphabet.
+        
+        Parameters
+        ----------
+        indices:np.ndarray
+            (permutations x positions) array of alphabet indices, see CompiledLexicon.permutations_indices
+            
+        signature_ids:np.ndarray
+            optional, the ids of the signatures to check. default value is None, which checks every signature
+            
+        colors:list
+            optional, the colors to check. default value is None, which checks every color
+        """
+        letters, needs = self.compiled.letters, self.compiled.needs
+        if signature_ids is not None:
+            letters, needs = letters[:,signature_ids], needs[:,signature_ids]
+        
+        #(permutations x faces x 26) matrix with how many times every letter is mapped to every color
+        faces = self.geometry.faces
+        num_permutations, num_positions = indices.shape
+        color_ids = np.arange(num_permutations)[:,None]*faces + np.arange(num_positions)[None,:] % faces
+        color_counts = np.bincount((color_ids*len(self.alphabet) + indices).ravel(), minlength=num_permutations*faces*len(self.alphabet))
+        color_counts = color_counts.reshape(num_permutations, faces, len(self.alphabet)).astype(np.uint8)
+        if colors is not None:
+            color_counts = color_counts[:,colors]
+        
+        #(permutations x colors x max_length x words), the padding has a need of 0
+        available = color_counts[:,:,letters]
+        return (available >= needs[None,None,:,:]).all(axis=2)
+    
+    def mono_mask(self, indices:np.ndarray, signature_ids:np.ndarray=None)->np.ndarray:
+        """
+        Compiled mode. Returns a boolean mask of the signatures of the compiled lexicon that are mono words
+        given a permutation (see CompiledLexicon.count to turn it into a number of words).
+        
+        A word is a mono word when, for at least one color, its letter counts are less than or equal
+        to the letter counts of that color (see color_fits).
+        
+        Parameters
+        ----------
+        indices:np.ndarray
+            the permutation as alphabet indices, see CompiledLexicon.permutation_indices
+            
+        signature_ids:np.ndarray
+            optional, the ids of the signatures to check. The returned mask is aligned with signature_ids.
+            default value is None, which checks every signature
+        """
+        spellable = self.compiled.spellable
+        if signature_ids is not None:
+            spellable = spellable[signature_ids]
+        
+        return self.color_fits(indices, signature_ids).any(axis=0) & spellable
+    
+    def rainbow_mask(self, indices:np.ndarray, signature_ids:np.ndarray=None)->np.ndarray:
+        """
+        Compiled mode. Returns a boolean mask of the signatures of the compiled lexicon that are rainbow words
+        given a permutation (see CompiledLexicon.count to turn it into a number of words). See rainbow_mask_many.
+        
+        Parameters
+        ----------
+        indices:np.ndarray
+            the permutation as alphabet indices, see CompiledLexicon.permutation_indices
+            
+        signature_ids:np.ndarray
+            optional, the ids of the signatures to check. The returned mask is aligned with signature_ids.
+            default value is None, which checks every signature
+        """
+        return self.rainbow_mask_many(indices[None,:], signature_ids)[0]
+    
+    def rainbow_candidates_many(self, indices:np.ndarray, signature_ids:np.ndarray=None)->np.ndarray:
+        """
+        Compiled mode. Returns a (permutations x signatures) boolean matrix with the signatures that pass two quick checks
+        every rainbow word passes, so the words that fail them can be skipped by the rainbow search (and do not count
+        towards the upper bound of rainbow_until):
+        - the permutation has at least as many copies of each letter as the word
+        - every two letters of the word are placed somewhere on different cubes and different colors
+        
+        Parameters
+        ----------
+        indices:np.ndarray
+            (permutations x positions) array of alphabet indices, see CompiledLexicon.permutations_indices
+            
+        signature_ids:np.ndarray
+            optional, the ids of the signatures to check. The returned matrix is aligned with signature_ids.
+            default value is None, which checks every signature
+        """
+        lex = self.compiled
+        letters, needs, spellable = lex.letters, lex.needs, lex.spellable
+        if signature_ids is not None:
+            letters, needs, spellable = letters[:,signature_ids], needs[:,signature_ids], spellable[signature_ids]
+        
+        num_permutations, num_positions = indices.shape
+        alphabet_size = len(self.alphabet)
+        perm_offsets = np.arange(num_permutations)[:,None]
+        reps = np.bincount((perm_offsets*alphabet_size + indices).ravel(), minlength=num_permutations*alphabet_size)
+        reps = reps.reshape(num_permutations, alphabet_size)
+        
+        candidates = spellable[None,:] & (reps[:,letters] >= needs[None,:,:]).all(axis=1)
+        
+        #(permutations x 26*26) matrix, True when two different positions of the two letters have different cubes and colors
+        positions = np.arange(num_positions)
+        cubes, colors = positions // self.geometry.faces, positions % self.geometry.faces
+        apart = (cubes[:,None] != cubes[None,:]) & (colors[:,None] != colors[None,:])
+        placed = np.zeros((num_permutations, alphabet_size, num_positions), dtype=np.float32)
+        placed[perm_offsets, indices, positions[None,:]] = 1
+        pairs = ((placed @ apart.astype(np.float32) @ placed.transpose(0, 2, 1)) > 0).ravel()
+        
+        #only the words left are checked, the letters are sorted so the padding (-1) is always at the end
+        perms, rows = np.nonzero(candidates)
+        word_letters = letters[:, rows].astype(np.intp)
+        offsets = perms*alphabet_size*alphabet_size
+        keep = np.ones(len(rows), dtype=bool)
+        for b in range(1, letters.shape[0]):
+            second = word_letters[b] + offsets
+            has_letter = word_letters[b] >= 0
+            for a in range(b):
+                keep &= ~has_letter | pairs[word_letters[a]*alphabet_size + second]
+        candidates[perms[~keep], rows[~keep]] = False
+        
+        return candidates
+    
+    def rainbow_mask_many(self, indices:np.ndarray, signature_ids:np.ndarray=None)->np.ndarray:
+        """
+        Compiled mode. Returns a (permutations x signatures) boolean matrix, where the item [p,s] is True when
+        the s-th signature is a rainbow word given the p-th permutation.
+        
+        All the words of all the permutations are searched at the same time, one letter at a time.
+        Every branch of the search is a (permutation, word, state) triple, where state is a bitmask of the
+        cubes and colors already taken. Every letter expands each branch into the free positions where that
+        letter is placed, and branches that reach the same state for the same word are merged, so the search
+        stays small even with repeated letters. It gives the same result as is_rainbow.
+        
+        Parameters
+        ----------
+        indices:np.ndarray
+            (permutations x positions) array of alphabet indices, see CompiledLexicon.permutations_indices
+            
+        signature_ids:np.ndarray
+            optional, the ids of the signatures to check. The returned matrix is aligned with signature_ids.
+            default value is None, which checks every signature
+        """
+        for rainbow, perms, rows in self.rainbow_search(indices, signature_ids):
+            pass
+        return rainbow
+    
+    def rainbow_search(self, indices:np.ndarray, signature_ids:np.ndarray=None):
+        """
+        Compiled mode. Generator that runs the rainbow search of rainbow_mask_many one letter at a time.
+        Before every letter it yields a three-item tuple (rainbow, perms, rows): the (permutations x signatures)
+        boolean matrix of the rainbow words found so far, and the permutation and word (row) of every branch
+        still being searched, sorted by permutation and word. The last item has no branches left, and its
+        matrix is the result of rainbow_mask_many.
+        
+        Parameters
+        ----------
+        indices:np.ndarray
+            (permutations x positions) array of alphabet indices, see CompiledLexicon.permutations_indices
+            
+        signature_ids:np.ndarray
+            optional, the ids of the signatures to check. The yielded matrix is aligned with signature_ids.
+            default value is None, which checks every signature
+        """
+        lex = self.compiled
+        letters, needs, lengths, spellable = lex.letters, lex.needs, lex.lengths, lex.spellable
+        if signature_ids is not None:
+            letters, needs, lengths, spellable = letters[:,signature_ids], needs[:,signature_ids], lengths[signature_ids], spellable[signature_ids]
+        
+        num_permutations, num_positions = indices.shape
+        faces = self.geometry.faces
+        num_cubes = num_positions//faces
+        state_bits = num_cubes + faces
+        word_bits = max(1, len(lengths)).bit_length()
+        
+        #bit of the cube and bit of the color of every position
+        positions = np.arange(num_positions)
+        blocks = (np.uint64(1) << (positions//faces).astype(np.uint64)) | (np.uint64(1) << (num_cubes + positions%faces).astype(np.uint64))
+        
+        #(permutations x 26 x max_reps) matrix with the positions of every letter, padded with -1
+        perm_offsets = np.arange(num_permutations)[:,None]
+        reps = np.bincount((perm_offsets*len(self.alphabet) + indices).ravel(), minlength=num_permutations*len(self.alphabet))
+        reps = reps.reshape(num_permutations, len(self.alphabet))
+        order = np.argsort(indices, axis=1, kind='stable')
+        sorted_letters = np.take_along_axis(indices, order, axis=1)
+        starts = np.cumsum(reps, axis=1) - reps
+        rank = positions[None,:] - np.take_along_axis(starts, sorted_letters, axis=1)
+        letter_positions = np.full((num_permutations, len(self.alphabet), reps.max()), -1, dtype=np.intp)
+        letter_positions[perm_offsets, sorted_letters, rank] = order
+        letter_positions = letter_positions.reshape(num_permutations*len(self.alphabet), -1)
+        
+        candidates = self.rainbow_candidates_many(indices, signature_ids)
+        
+        rainbow = np.zeros((num_permutations, len(lengths)), dtype=bool)
+        perms, rows = np.nonzero(candidates)
+        states = np.zeros(len(rows), dtype=np.uint64)
+        
+        for k in range(letters.shape[0]+1):
+            #every letter of the word found a cube and a color
+            finished = lengths[rows] == k
+            rainbow[perms[finished], rows[finished]] = True
+            perms, rows, states = perms[~finished], rows[~finished], states[~finished]
+            
+            yield rainbow, perms, rows
+            
+            if rows.size == 0:
+                break
+            
+            #expand each branch into the free positions of its k-th letter
+            options = letter_positions[perms*len(self.alphabet) + letters[k, rows]]
+            option_blocks = blocks[options]
+            free = (options >= 0) & ((states[:,None] & option_blocks) == 0)
+            branches, cols = np.nonzero(free)
+            perms, rows = perms[branches], rows[branches]
+            states = states[branches] | option_blocks[branches, cols]
+            
+            #when no branch had more than one free position there is nothing worth merging
+            if not (branches[1:] == branches[:-1]).any():
+                continue
+            
+            #merge the branches of a word that took the same cubes and colors
+            keys = (perms.astype(np.uint64) << np.uint64(word_bits+state_bits)) | (rows.astype(np.uint64) << np.uint64(state_bits)) | states
+            keys = np.sort(keys)
+            keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+            perms = (keys >> np.uint64(word_bits+state_bits)).astype(np.intp)
+            rows = ((keys >> np.uint64(state_bits)) & np.uint64((1 << word_bits) - 1)).astype(np.intp)
+            states = keys & np.uint64((1 << state_bits) - 1)
+    
+    def swap_scorer(self, letters:list)->SwapScorer:
+        """
+        Compiled mode. Returns a SwapScorer that holds the given permutation and scores swaps
+        by only re-checking the words that contain the swapped letters.
+        
+        Parameters
+        ----------
+        letters:list
+            a list containing letters, where every letter in the alphabet appears at least once
+        """
+        return SwapScorer(self, letters)
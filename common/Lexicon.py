@@ -1,5 +1,11 @@
-import pandas as pd
+import csv
+import hashlib
+import itertools
+import json
+import os
 import re
+from CubeGeometry import CubeGeometry
+from CompiledLexicon import CompiledLexicon
 
 class Lexicon:
     """
@@ -13,50 +19,191 @@ class Lexicon:
         a list containing all the valid words
     letter_freq:dict
         a dictionary of letter:frquency pairs, sorted by highest frequency
+    source:str
+        the file the words are read from, the AoA master file (.xlsx) by default,
+        or a plain text or CSV file with one word per line (see read_words)
+    cache_dir:str
+        the folder of the compiled cache of the lexicon (see load_cache), or None to always read the source
+    compiled:CompiledLexicon
+        the compiled form of word_list, shared with the cache. None when the cache is not used
     
     Methods
     -------
     generate_word_list()
         initializes the word_list attribute
         
+    read_words()->generator
+        Reads a plain text or CSV source line by line, and yields the unique words that pass the filters
+        
+    cache_key()->str
+        Returns a hash of the source file and of the word filters, which identifies a cache file
+        
+    load_cache()->bool
+        Initializes word_list, letter_freq and compiled from the cache file, if there is a valid one
+        
+    save_cache()
+        Compiles word_list and writes it to the cache file, with letter_freq
+        
+    compile()->CompiledLexicon
+        Returns the compiled form of word_list, for a Judge
+        
     calculate_letter_freq()
         initializes the letter_freq attribute
         
     calculate _letter_rep(num_cubes)
-        Calculates how many times a letter will be repeated, given a number of cubes.
+        Calculates how many times a letter will be repeated, given a number of cubes (or a CubeGeometry).
         it returns a list and dictionary representation of this letter repetition
     """
     
+ 
+    #words are kept if their length is between min_length and max_length, and they match the pattern
+    min_length = 2
+    max_length = 6
+    pattern = "^[a-z]+$"
+    
     #constructor
-    def __init__(self):
+    def __init__(self, source:str="src/Master_file_AoAmeasures.xlsx", cache_dir:str="src/cache"):
         """
-        Constructor           
+        Constructor.
+        The first time, the source file is read and filtered, and the result is compiled and written to
+        the cache folder. The next times (until the source file or the filters change) everything is
+        loaded from the cache with a single memory map, without reading the source file
         """
         self.alphabet = list(map(chr, range(97, 123))) #alphabet
+        self.source = source
+        self.cache_dir = cache_dir
+        self.compiled = None
+        
+        if cache_dir is not None and self.load_cache():
+            return
         
         #method calls
         self.generate_word_list()
         self.calculate_letter_freq()
         
+        if cache_dir is not None:
+            self.save_cache()
+        
         
     def generate_word_list(self):
         """
-        Imports the AOA master_file, filters words, and returns a list of the valid words
+        Imports the AOA master_file, filters words, and returns a list of the valid words.
+        A source that is not an excel file is streamed through read_words straight into the compiled lexicon,
+        without an intermediate DataFrame
         """
+        if not self.source.lower().endswith(('.xlsx', '.xls')):
+            self.compiled = CompiledLexicon(self.alphabet, self.read_words())
+            self.word_list = self.compiled.words
+            return
+        
+        #pandas is only needed to read the source, and not when the lexicon is loaded from the cache
+        import pandas as pd
+        
         #created a dataframe from the excel file
-        df = pd.read_excel("src/Master_file_AoAmeasures.xlsx")
+        df = pd.read_excel(self.source)
         
         #Get rid of the rows that containwhose length is less than 1 and greater than 6 character
         #targeting
-        df = df[df['WORD'].str.len() > 1 ]
-        df = df[df['WORD'].str.len() <= 6]
+        df = df[df['WORD'].str.len() >= self.min_length]
+        df = df[df['WORD'].str.len() <= self.max_length]
         
         #Filter out words that have special characters, spaces and 
-        pattern = re.compile("^[a-z]+$")
+        pattern = re.compile(self.pattern)
         df = df[df['WORD'].apply(lambda word: bool(pattern.match( word.strip() )))]
         df=df.drop_duplicates(subset=["WORD"])
         self.word_list = df["WORD"].to_list()
     
+    def read_words(self):
+        """
+        Reads a plain text or CSV source line by line, and yields every word that passes the length and
+        pattern filters the first time it appears, so only the unique words are kept in memory.
+        A plain text line can hold more than the word (i.e. 'word 23135851162' in a frequency list),
+        and only its first field is used. In a CSV file the column is the one named 'word' in the
+        header (any case), or the first one when there is no such header
+        """
+        pattern = re.compile(self.pattern)
+        seen = set()
+        
+        with open(self.source, 'r', encoding='utf-8', errors='replace', newline='') as source:
+            if self.source.lower().endswith('.csv'):
+                rows = csv.reader(source)
+                header = next(rows, [])
+                names = [name.strip().lower() for name in header]
+                if 'word' in names:
+                    column = names.index('word')
+                else:
+                    #without a 'word' column the first row is already a word
+                    column = 0
+                    rows = itertools.chain([header], rows)
+                fields = (row[column] if len(row) > column else '' for row in rows)
+            else:
+                fields = ((line.split() or [''])[0] for line in source)
+            
+            for word in fields:
+                word = word.strip()
+                if self.min_length <= len(word) <= self.max_length and pattern.match(word) and word not in seen:
+                    seen.add(word)
+                    yield word
+    
+    def cache_key(self)->str:
+        """
+        Returns a hash of the contents of the source file and of the word filters,
+        so that a cache file is not used anymore once the spreadsheet or the filters change
+        """
+        key = hashlib.sha256()
+        with open(self.source, 'rb') as source:
+            for block in iter(lambda: source.read(2**20), b''):
+                key.update(block)
+        key.update(json.dumps([self.alphabet, self.min_length, self.max_length, self.pattern]).encode())
+        return key.hexdigest()
+    
+    def cache_path(self, key:str)->str:
+        """
+        Returns the path of the cache file of a cache key
+        """
+        return os.path.join(self.cache_dir, 'lexicon_'+key[:32]+'.bin')
+    
+    def load_cache(self)->bool:
+        """
+        Initializes word_list, letter_freq and compiled from the cache file of the current cache key.
+        Returns False, without changing anything, when there is no cache file or it cannot be read
+        """
+        key = self.cache_key()
+        try:
+            compiled, metadata = CompiledLexicon.load(self.cache_path(key))
+        except (OSError, ValueError, KeyError):
+            return False
+        
+        if metadata.get('key') != key or compiled.alphabet != self.alphabet:
+            return False
+        
+        self.compiled = compiled
+        self.word_list = compiled.words.tolist()
+        self.letter_freq = dict(metadata['letter_freq'])
+        return True
+    
+    def save_cache(self):
+        """
+        Compiles word_list and writes it to the cache file of the current cache key, together with letter_freq.
+        Failing to write the cache (i.e. a read-only folder) is not an error, the lexicon just is not cached
+        """
+        key = self.cache_key()
+        self.compile()
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self.compiled.save(self.cache_path(key), {'key': key, 'letter_freq': list(self.letter_freq.items())})
+        except OSError:
+            pass
+    
+    def compile(self)->CompiledLexicon:
+        """
+        Returns the compiled form of word_list, the one in the cache when there is one,
+        so that a Judge does not compile the words again (see Judge, compiled parameter)
+        """
+        if self.compiled is None:
+            self.compiled = CompiledLexicon(self.alphabet, self.word_list)
+        return self.compiled
+    
     def calculate_letter_freq(self):
         """
         Calculates the frequency of the letters in percentages
@@ -81,7 +228,7 @@ class Lexicon:
         #converts the letter:count pairs to letter:percentage and assign the dictionary to self.letter_freq
         self.letter_freq = {letter:count/total_chars for letter,count in letter_freq.items()}
         
-    def calculate_letter_reps(self, num_cubes:int)->tuple:
+    def calculate_letter_reps(self, num_cubes)->tuple:
         """
         Creates a dictionary where the keys are the letters of the alphabet and the values 
         are integers representing how many times a letter should repeat.
@@ -95,7 +242,9 @@ class Lexicon:
         num_cubes:int
             The total number of cubes. Must be >= 5
             since 5 cubes is the least number of cubes that allows for every letter
-            to appear at least once
+            to appear at least once.
+            It can also be a CubeGeometry, for cubes (or dice) with a number of faces other than 6,
+            as long as they have at least 26 faces in total
         
         Example
         ------
@@ -108,9 +257,14 @@ class Lexicon:
         #this ensures that every letter repeats at least once
         reps = {letter:1 for letter in self.letter_freq.keys()}
         
+        #not an isinstance check, the drivers pass the CubeGeometry of the package (..common.CubeGeometry)
+        geometry = num_cubes if hasattr(num_cubes, 'faces') else CubeGeometry(num_cubes, 6)
+        if geometry.size < len(self.alphabet):
+            raise ValueError(str(geometry)+" has "+str(geometry.size)+" faces, every letter of the alphabet needs at least one")
+        
         #represents the total number of repetitions left, after the previous step
         #where we ensured that each letter repeats at least once
-        remaining_reps = (6*num_cubes)-26
+        remaining_reps = geometry.size-26
         
         #flag for the while loop
         flag = True 
@@ -0,0 +1,120 @@
+import numpy as np
+
+class PermutationGenerator:
+    """
+    Generates uniformly random permutations of the base letters (the letter repetitions, see Lexicon.calculate_letter_reps)
+    in batches: a batch of n permutations is an (n x positions) array of alphabet indices, shuffled row by row
+    with a single numpy call, instead of one Python-level shuffle per permutation.
+
+    The random numbers come from a numpy.random.Generator seeded with a numpy.random.SeedSequence,
+    so a generator is reproducible from its seed, and the generators of the parallel workers (see spawn and substream)
+    draw from independent streams that do not depend on which worker runs first.
+
+    Attributes
+    ----------
+    alphabet:list
+        a list containing the character letters in the alphabet
+
+    base:np.ndarray
+        the base letters as an array of alphabet indices (uint8), every permutation is a reordering of it
+
+    seed_sequence:np.random.SeedSequence
+        the seed of the generator, it is also used to spawn the independent generators of the workers
+
+    rng:np.random.Generator
+        the random number generator
+
+    Methods
+    -------
+    batch(n:int)->np.ndarray
+        Returns n random permutations as an (n x positions) uint8 array of alphabet indices
+
+    letters(indices:np.ndarray)->list
+        Returns permutations of alphabet indices as lists of letters
+
+    strings(indices:np.ndarray)->list
+        Returns permutations of alphabet indices as strings
+
+    permutation()->list
+        Returns a single random permutation as a list of letters
+
+    spawn(n:int)->list
+        Returns n generators with independent streams, i.e. one per worker process
+
+    substream(key:int)->PermutationGenerator
+        Returns the generator of the stream with the given key, i.e. one per chunk of iterations
+    """
+
+    def __init__(self, alphabet:list, base:list, seed=None):
+        """
+        Constructor from the alphabet and the base letters (a list of letters, or a string).
+        seed is an int, a numpy.random.SeedSequence, or None for a seed taken from the operating system
+        """
+        self.alphabet = alphabet
+        letter_index = {letter:i for i,letter in enumerate(alphabet)}
+        self.base = np.array([letter_index[letter] for letter in base], dtype=np.uint8)
+        self.seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.rng = np.random.default_rng(self.seed_sequence)
+
+        #every letter as a one-character string, so that a batch of indices becomes letters with a single lookup
+        self.letter_array = np.array(alphabet, dtype='<U1')
+
+    def batch(self, n:int)->np.ndarray:
+        """
+        Returns n random permutations of the base letters, as an (n x positions) uint8 array of alphabet indices.
+        Every row is an unbiased shuffle of the base, and the whole batch is shuffled with a single numpy call
+
+        Parameters
+        ----------
+        n:int
+            the number of permutations
+        """
+        return self.rng.permuted(np.broadcast_to(self.base, (n, len(self.base))), axis=1)
+
+    def letters(self, indices:np.ndarray)->list:
+        """
+        Returns permutations of alphabet indices (i.e. a batch) as lists of letters
+        """
+        return self.letter_array[indices].tolist()
+
+    def strings(self, indices:np.ndarray)->list:
+        """
+        Returns permutations of alphabet indices (i.e. a batch) as strings
+        """
+        indices = np.atleast_2d(indices)
+        #the letters of a row are contiguous, so every row is read as a single string
+        return np.ascontiguousarray(self.letter_array[indices]).view(f'<U{indices.shape[1]}').ravel().tolist()
+
+    def permutation(self)->list:
+        """
+        Returns a single random permutation of the base letters, as a list of letters
+        """
+        return self.letters(self.batch(1))[0]
+
+    def spawn(self, n:int)->list:
+        """
+        Returns n generators with independent streams (i.e. one per worker process), spawned from the seed of this one.
+        The same seed always spawns the same generators
+
+        Parameters
+        ----------
+        n:int
+            the number of generators
+        """
+        return [PermutationGenerator(self.alphabet, self.letter_array[self.base], child) for child in self.seed_sequence.spawn(n)]
+
+    def substream(self, key:int)->'PermutationGenerator':
+        """
+        Returns the generator of the stream with the given key, that is the same as the key-th generator
+        that spawn returns the first time it is called, but does not depend on how many generators were spawned.
+        So a chunk of iterations that is numbered with key always draws the same permutations,
+        whichever worker runs it, and whenever it is run again
+
+        Parameters
+        ----------
+        key:int
+            the key of the stream, i.e. the first iteration of a chunk
+        """
+        child = np.random.SeedSequence(self.seed_sequence.entropy, spawn_key=self.seed_sequence.spawn_key+(key,),
+                                       pool_size=self.seed_sequence.pool_size)
+        return PermutationGenerator(self.alphabet, self.letter_array[self.base], child)
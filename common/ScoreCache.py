@@ -0,0 +1,203 @@
+import sys
+import numpy as np
+from collections import OrderedDict
+from CubeSymmetry import CubeSymmetry
+
+class ScoreCache:
+    """
+    Class that memoizes the (mono, rainbow) counts of a Judge, keyed by the canonical key of the permutation,
+    so equivalent permutations (see CubeSymmetry) share one entry.
+    It can be used in place of the Judge it wraps: count_words and count_words_many go through the cache,
+    and every other attribute (swap_scorer, words, ...) is taken from the Judge.
+    The cache is bounded by a memory cap, and the least recently used entries are evicted first.
+
+    Attributes
+    ----------
+    judge:Judge
+        the Judge that counts the words on a cache miss
+
+    max_bytes:int
+        the memory cap of the entries, in bytes
+
+    symmetry:CubeSymmetry
+        the object that computes the canonical keys
+
+    entries:OrderedDict
+        key:(mono, rainbow) pairs, from the least to the most recently used
+
+    bytes:int
+        approximate memory used by the entries, in bytes
+
+    hits:int
+        number of lookups that were found in the cache
+
+    misses:int
+        number of lookups that were not found in the cache
+
+    evictions:int
+        number of entries removed to stay under max_bytes
+
+    Methods
+    -------
+    key(letters:list)->int
+        Returns the canonical key of a permutation, given as letters or as an array of alphabet indices
+
+    lookup(key:int)->tuple
+        Returns the cached (mono, rainbow) counts of a key, or None
+
+    store(key:int, counts:tuple)
+        Adds the counts of a key to the cache, evicting the least recently used entries if needed
+
+    count_words(letters:list)->tuple
+        Same as Judge.count_words, through the cache
+
+    count_words_many(permutations:list)->tuple
+        Same as Judge.count_words_many, through the cache
+
+    stats()->str
+        Returns a one line summary of the hits, misses and memory of the cache
+    """
+    #approximate bytes used by the OrderedDict for every entry, on top of the key and the value
+    entry_overhead = 104
+
+    def __init__(self, judge, max_bytes:int=64*2**20, symmetry:CubeSymmetry=None):
+        """
+        Constructor that wraps a Judge with an empty cache
+        """
+        self.judge = judge
+        self.max_bytes = max_bytes
+        self.symmetry = symmetry if symmetry is not None else CubeSymmetry(judge.alphabet, judge.geometry)
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __getattr__(self, name:str):
+        #only called for the attributes that the cache does not have
+        if name == 'judge':
+            raise AttributeError(name)
+        return getattr(self.judge, name)
+
+    def key(self, letters:list)->int:
+        """
+        Returns the canonical key of a permutation.
+
+        Parameters
+        ----------
+        letters:list
+            a list containing letters, where every letter in the alphabet appears at least once,
+            or an array of alphabet indices (a row of the batches of Judge.count_words_many)
+        """
+        if isinstance(letters, np.ndarray) and letters.dtype.kind in 'iu':
+            letters = [self.symmetry.alphabet[i] for i in letters.tolist()]
+        return self.symmetry.key(letters)
+
+    def lookup(self, key:int)->tuple:
+        """
+        Returns the cached (mono, rainbow) counts of a key, or None when they are not in the cache.
+
+        Parameters
+        ----------
+        key:int
+            canonical key of a permutation, see the key method
+        """
+        counts = self.entries.get(key)
+        if counts is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return counts
+
+    def store(self, key:int, counts:tuple):
+        """
+        Adds the (mono, rainbow) counts of a key to the cache,
+        evicting the least recently used entries until it fits under max_bytes.
+
+        Parameters
+        ----------
+        key:int
+            canonical key of a permutation, see the key method
+
+        counts:tuple
+            the (mono, rainbow) counts of the permutation
+        """
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return
+
+        counts = (int(counts[0]), int(counts[1]))
+        self.entries[key] = counts
+        self.bytes += self.entry_bytes(key, counts)
+
+        while self.bytes > self.max_bytes and self.entries:
+            old_key, old_counts = self.entries.popitem(last=False)
+            self.bytes -= self.entry_bytes(old_key, old_counts)
+            self.evictions += 1
+
+    def entry_bytes(self, key:int, counts:tuple)->int:
+        """
+        Returns the approximate memory used by one entry, in bytes
+        """
+        return sys.getsizeof(key) + sys.getsizeof(counts) + sys.getsizeof(counts[0]) + sys.getsizeof(counts[1]) + self.entry_overhead
+
+    def count_words(self, letters:list)->tuple:
+        """
+        Counts how many mono and rainbow words can be spelled given a permutation,
+        using the cached counts when the permutation (or an equivalent one) was already counted.
+
+        Parameters
+        ----------
+        letters:list
+            a list containing letters, where every letter in the alphabet appears at least once
+        """
+        key = self.key(letters)
+        counts = self.lookup(key)
+        if counts is None:
+            counts = self.judge.count_words(letters)
+            self.store(key, counts)
+        return counts
+
+    def count_words_many(self, permutations)->tuple:
+        """
+        Counts how many mono and rainbow words can be spelled by every permutation in a batch,
+        and returns two arrays. Only the permutations that are not in the cache go to Judge.count_words_many.
+
+        Parameters
+        ----------
+        permutations:list
+            a 2-D array, or a list of permutations, where every permutation is a list of letters
+            (or a string), or an array of alphabet indices
+        """
+        keys = [self.key(letters) for letters in permutations]
+        counts = [self.lookup(key) for key in keys]
+
+        missing = [i for i, count in enumerate(counts) if count is None]
+        if missing:
+            #an array of indices stays an array, so the judge reads its rows as indices and not as letters
+            if isinstance(permutations, np.ndarray):
+                batch = permutations[missing]
+            else:
+                batch = [permutations[i] for i in missing]
+            mono, rainbow = self.judge.count_words_many(batch)
+            for i, m, r in zip(missing, mono, rainbow):
+                counts[i] = (int(m), int(r))
+                self.store(keys[i], counts[i])
+
+        return np.array([count[0] for count in counts], dtype=np.int64), np.array([count[1] for count in counts], dtype=np.int64)
+
+    def stats(self)->str:
+        """
+        Returns a one line summary of the hits, misses and memory of the cache
+
+        Example
+        -------
+        >> stats()
+        >> 'cache: 3120 hits, 9880 misses (24.0% hit rate), 0 evictions, 9880 entries, 2.5 MB'
+        """
+        lookups = self.hits + self.misses
+        hit_rate = 100*self.hits/lookups if lookups else 0
+        return ('cache: '+str(self.hits)+' hits, '+str(self.misses)+' misses ('+format(hit_rate, '.1f')+'% hit rate), '
+                +str(self.evictions)+' evictions, '+str(len(self.entries))+' entries, '+format(self.bytes/2**20, '.1f')+' MB')
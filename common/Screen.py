@@ -0,0 +1,141 @@
+import math
+import numpy as np
+
+class Screen:
+    """
+    Class for the cheap first stage of a multi-fidelity search, that decides which candidates of a batch are worth
+    a full Judge.count_words. The mono words of the whole batch are counted exactly (see Judge.count_mono_many), which is
+    much cheaper than the rainbow words, and the rainbow words are estimated from a small fixed subset of the signatures
+    of the compiled lexicon: the ones whose rainbow status follows the total rainbow count the most closely on a sample
+    of permutations (see calibrate), scaled with a least squares line fitted on the same sample.
+
+    Attributes
+    ----------
+    judge:Judge
+        the compiled mode Judge that counts the words
+
+    signature_ids:np.ndarray
+        the sorted ids of the signatures that estimate the rainbow words
+
+    slope:float
+        the estimate of the rainbow words is slope * (rainbow words of the subset) + intercept
+
+    intercept:float
+        see slope
+
+    Methods
+    -------
+    calibrate(judge:Judge, sample:np.ndarray, size:int=1000)->Screen
+        Class method. Picks the subset of the signatures from a sample of fully scored permutations
+
+    spec()->dict
+        Returns what a worker process needs to create the same screen (with Screen(judge, **spec))
+
+    score_many(permutations)->tuple
+        Returns the exact mono words and the estimated rainbow words of every permutation in a batch
+
+    select(mono:np.ndarray, rainbow:np.ndarray, fraction:float, mono_floor:int=None)->np.ndarray
+        Returns a boolean mask of the candidates that pass the screen
+    """
+    #number of permutations whose rainbow subset is searched at once, which bounds the branches of the search
+    chunk = 256
+
+    def __init__(self, judge, signature_ids, slope:float=1.0, intercept:float=0.0):
+        self.judge = judge
+        self.signature_ids = np.asarray(signature_ids, dtype=np.intp)
+        self.slope = float(slope)
+        self.intercept = float(intercept)
+
+        self.weights = judge.compiled.weights[self.signature_ids]
+
+    @classmethod
+    def calibrate(cls, judge, sample:np.ndarray, size:int=1000)->'Screen':
+        """
+        Returns a screen with the size signatures that predict the rainbow words of the sample the best.
+        Every signature is rated with the covariance between its rainbow status and the total rainbow count
+        of the sample, times its weight, i.e. how much of the spread of the total it carries.
+        So the subset leaves out the words that are rainbow words of (almost) every permutation,
+        or of (almost) none of them.
+
+        Parameters
+        ----------
+        judge:Judge
+            the compiled mode Judge that counts the words
+
+        sample:np.ndarray
+            (permutations x positions) array of alphabet indices, i.e. a batch of PermutationGenerator.
+            A few hundred random permutations are enough
+
+        size:int
+            the number of signatures of the subset. default value is 1000
+        """
+        indices = judge.compiled.permutations_indices(sample)
+        weights = judge.compiled.weights
+        rainbow = np.concatenate([judge.rainbow_mask_many(indices[start:start+cls.chunk])
+                                  for start in range(0, len(indices), cls.chunk)]).astype(np.float64)
+        total = rainbow @ weights
+
+        covariance = ((rainbow - rainbow.mean(axis=0)) * (total - total.mean())[:,None]).mean(axis=0) * weights
+        signature_ids = np.sort(np.argsort(-covariance, kind='stable')[:size])
+
+        #least squares line from the rainbow words of the subset to the total
+        estimate = rainbow[:,signature_ids] @ weights[signature_ids]
+        if len(indices) > 1 and estimate.var() > 0:
+            slope, intercept = np.polyfit(estimate, total, 1)
+        else:
+            slope, intercept = 1.0, 0.0
+        return cls(judge, signature_ids, slope, intercept)
+
+    def spec(self)->dict:
+        """
+        Returns what a worker process needs to create the same screen, with Screen(judge, **spec)
+        """
+        return {'signature_ids': self.signature_ids, 'slope': self.slope, 'intercept': self.intercept}
+
+    def score_many(self, permutations)->tuple:
+        """
+        Returns a two-item tuple with the exact number of mono words (an integer array) and the estimated number of
+        rainbow words (a float array) of every permutation in a batch
+
+        Parameters
+        ----------
+        permutations:list
+            a 2-D array of alphabet indices, or a list of permutations, see Judge.count_words_many
+        """
+        indices = self.judge.compiled.permutations_indices(permutations)
+        mono = self.judge.count_mono_many(indices)
+
+        rainbow = np.zeros(len(indices), dtype=np.float64)
+        for start in range(0, len(indices), self.chunk):
+            rainbow[start:start+self.chunk] = self.judge.rainbow_mask_many(indices[start:start+self.chunk], self.signature_ids) @ self.weights
+        return mono, self.slope * rainbow + self.intercept
+
+    def select(self, mono:np.ndarray, rainbow:np.ndarray, fraction:float, mono_floor:int=None)->np.ndarray:
+        """
+        Returns a boolean mask of the candidates that pass the screen: the top fraction of the batch by rainbow words,
+        the top fraction by mono + rainbow words, and every candidate that has at least mono_floor mono words
+        (mono words are exact, so with the mono record as the floor a candidate that ties or beats it is never rejected).
+        The counts can be the estimates of score_many, or the full counts (to see which candidates should have passed)
+
+        Parameters
+        ----------
+        mono:np.ndarray
+            the mono words of every candidate
+
+        rainbow:np.ndarray
+            the rainbow words of every candidate
+
+        fraction:float
+            the fraction of the batch that passes, by each score
+
+        mono_floor:int
+            optional, the mono words that always pass. default value is None, for no floor
+        """
+        passed = np.zeros(len(mono), dtype=bool)
+        top = min(len(mono), math.ceil(fraction * len(mono)))
+        if top > 0:
+            passed[np.argsort(-rainbow, kind='stable')[:top]] = True
+            passed[np.argsort(-(mono + rainbow), kind='stable')[:top]] = True
+        if mono_floor is not None:
+            passed |= mono >= mono_floor
+        return passed
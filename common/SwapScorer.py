@@ -0,0 +1,266 @@
+import numpy as np
+
+class SwapScorer:
+    """
+    Class that holds a permutation and the mono/rainbow state of every signature of the compiled lexicon,
+    so that swapping two letters only re-checks the signatures that contain one of those letters (found with
+    the inverted index of the compiled lexicon), instead of the whole lexicon.
+
+    Attributes
+    ----------
+    judge:Judge
+        a compiled Judge (created with compiled=True)
+
+    letters:list
+        the current permutation
+
+    indices:np.ndarray
+        the current permutation as alphabet indices
+
+    fits:np.ndarray
+        (faces x signatures) boolean matrix of the colors that can spell every signature, see Judge.color_fits
+
+    mono:np.ndarray
+        boolean mask of the signatures that are mono words with the current permutation
+
+    rainbow:np.ndarray
+        boolean mask of the signatures that are rainbow words with the current permutation
+
+    mono_count:int
+        total of mono words with the current permutation
+
+    rainbow_count:int
+        total of rainbow words with the current permutation
+
+    Methods
+    -------
+    count_words()->tuple
+        Returns the current (mono, rainbow) totals
+
+    affected_words(a:int, b:int)->np.ndarray
+        Returns the ids of the signatures that can change when the letters at indices a and b are swapped
+
+    score_swap(a:int, b:int)->tuple
+        Returns the (mono, rainbow) delta of swapping the letters at indices a and b, without applying it
+
+    count_swap_until(a:int, b:int, target:int, measure:str='both', stop_above:bool=True)->tuple
+        Returns the (mono, rainbow, exact) counts of swapping the letters at indices a and b, stopping as soon as
+        the score is known to reach the target or to stay below it
+
+    apply_swap(a:int, b:int)->tuple
+        Swaps the letters at indices a and b, and returns the new (mono, rainbow) totals
+
+    undo_swap(a:int, b:int)->tuple
+        Reverts apply_swap(a, b), and returns the (mono, rainbow) totals from before it
+    """
+    def __init__(self, judge, letters:list):
+        """
+        Constructor that scores the whole lexicon once for the given permutation
+        """
+        if judge.compiled is None:
+            raise ValueError("SwapScorer needs a Judge created with compiled=True")
+
+        self.judge = judge
+        self.letters = list(letters)
+        self.indices = judge.compiled.permutation_indices(self.letters)
+
+        self.fits = judge.color_fits(self.indices)
+        self.mono = self.fits.any(axis=0) & judge.compiled.spellable
+        self.rainbow = judge.rainbow_mask(self.indices)
+        self.mono_count = judge.compiled.count(self.mono)
+        self.rainbow_count = judge.compiled.count(self.rainbow)
+
+        #result of the last score_swap, so that applying the same swap right after is free
+        self.last_scored = None
+
+    def count_words(self)->tuple:
+        """
+        Returns the (mono, rainbow) totals of the current permutation
+        """
+        return self.mono_count, self.rainbow_count
+
+    def affected_words(self, a:int, b:int)->np.ndarray:
+        """
+        Returns the ids of the signatures that contain the letter at index a or the letter at index b.
+        The other signatures keep the exact same positions for all of their letters, so they can not change.
+        When both letters are the same the permutation does not change, and the array is empty.
+
+        Parameters
+        ----------
+        a:int
+            index of the first letter in the permutation
+
+        b:int
+            index of the second letter in the permutation
+        """
+        if self.indices[a] == self.indices[b]:
+            return np.empty(0, dtype=np.intp)
+        return self.judge.compiled.words_with_any([self.indices[a], self.indices[b]])
+
+    def swapped_state(self, a:int, b:int)->tuple:
+        """
+        Checks the affected signatures with the letters at indices a and b swapped.
+        Returns a four-item tuple (signature_ids, fits, mono, rainbow), with the ids of the affected signatures
+        and their color fits, mono and rainbow masks after the swap
+
+        Parameters
+        ----------
+        a:int
+            index of the first letter in the permutation
+
+        b:int
+            index of the second letter in the permutation
+        """
+        if self.last_scored is not None and self.last_scored[0] == (a, b):
+            return self.last_scored[1]
+
+        signature_ids, indices, fits, mono = self.swapped_mono(a, b)
+
+        state = (signature_ids, fits, mono, self.judge.rainbow_mask(indices, signature_ids))
+        self.last_scored = ((a, b), state)
+        return state
+
+    def swapped_mono(self, a:int, b:int)->tuple:
+        """
+        Checks the mono words of the affected signatures with the letters at indices a and b swapped.
+        Returns a four-item tuple (signature_ids, indices, fits, mono), with the ids of the affected signatures,
+        the swapped permutation as alphabet indices, and the color fits and mono mask of the signatures after the swap
+
+        Parameters
+        ----------
+        a:int
+            index of the first letter in the permutation
+
+        b:int
+            index of the second letter in the permutation
+        """
+        signature_ids = self.affected_words(a, b)
+
+        indices = self.indices.copy()
+        indices[a], indices[b] = indices[b], indices[a]
+
+        #two letters of the same color leave the letters of every color as they were
+        #otherwise only the colors of a and b have to be checked again
+        fits = self.fits[:,signature_ids]
+        faces = self.judge.geometry.faces
+        if a % faces != b % faces:
+            colors = [a % faces, b % faces]
+            fits[colors] = self.judge.color_fits(indices, signature_ids, colors)
+        mono = fits.any(axis=0) & self.judge.compiled.spellable[signature_ids]
+
+        return signature_ids, indices, fits, mono
+
+    def score_swap(self, a:int, b:int)->tuple:
+        """
+        Returns the (mono, rainbow) delta of swapping the letters at indices a and b,
+        without changing the current permutation.
+
+        Parameters
+        ----------
+        a:int
+            index of the first letter in the permutation
+
+        b:int
+            index of the second letter in the permutation
+
+        Example
+        -------
+        >> scorer.count_words()
+        >> (72, 898)
+        >> scorer.score_swap(0, 7)
+        >> (-3, 41)
+        """
+        signature_ids, fits, mono, rainbow = self.swapped_state(a, b)
+        lex = self.judge.compiled
+        delta_mono = lex.count(mono, signature_ids) - lex.count(self.mono[signature_ids], signature_ids)
+        delta_rainbow = lex.count(rainbow, signature_ids) - lex.count(self.rainbow[signature_ids], signature_ids)
+        return delta_mono, delta_rainbow
+
+    def count_swap_until(self, a:int, b:int, target:int, measure:str='both', stop_above:bool=True)->tuple:
+        """
+        Returns the (mono, rainbow, exact) counts of the permutation with the letters at indices a and b swapped,
+        without changing the current permutation, like Judge.count_words_until: the affected rainbow words are
+        checked in chunks, and the count stops as soon as the score reaches the target or can no longer reach it.
+        When exact is False the counts are lower bounds if the score reaches the target, and upper bounds otherwise.
+        An exact count is kept, so applying the same swap right after is free.
+
+        Parameters
+        ----------
+        a:int
+            index of the first letter in the permutation
+
+        b:int
+            index of the second letter in the permutation
+
+        target:int
+            the score to reach
+
+        measure:str
+            the score that is compared against the target, 'mono', 'rainbow' or 'both' (mono + rainbow).
+            default value is 'both'
+
+        stop_above:bool
+            optional, when False the count only stops early when the target can not be reached,
+            so every swap that reaches it gets an exact count. default value is True
+        """
+        if self.last_scored is not None and self.last_scored[0] == (a, b):
+            delta_mono, delta_rainbow = self.score_swap(a, b)
+            return self.mono_count + delta_mono, self.rainbow_count + delta_rainbow, True
+
+        lex = self.judge.compiled
+        signature_ids, indices, fits, mono = self.swapped_mono(a, b)
+        mono_count = self.mono_count - lex.count(self.mono[signature_ids], signature_ids) + lex.count(mono, signature_ids)
+
+        #the rainbow words that are not affected by the swap stay as they are
+        unchanged = self.rainbow_count - lex.count(self.rainbow[signature_ids], signature_ids)
+        rainbow_target = self.judge.rainbow_target(mono_count, target, measure)
+        rainbow, low, high = self.judge.rainbow_until(indices, rainbow_target - unchanged, signature_ids, stop_above)
+        low, high = unchanged + low, unchanged + high
+
+        if low == high:
+            self.last_scored = ((a, b), (signature_ids, fits, mono, rainbow))
+
+        return mono_count, (low if low >= rainbow_target else high), low == high
+
+    def apply_swap(self, a:int, b:int)->tuple:
+        """
+        Swaps the letters at indices a and b, updating only the affected signatures,
+        and returns the new (mono, rainbow) totals.
+
+        Parameters
+        ----------
+        a:int
+            index of the first letter in the permutation
+
+        b:int
+            index of the second letter in the permutation
+        """
+        delta_mono, delta_rainbow = self.score_swap(a, b)
+        signature_ids, fits, mono, rainbow = self.swapped_state(a, b)
+
+        self.mono_count += delta_mono
+        self.rainbow_count += delta_rainbow
+        self.fits[:,signature_ids] = fits
+        self.mono[signature_ids] = mono
+        self.rainbow[signature_ids] = rainbow
+
+        self.letters[a], self.letters[b] = self.letters[b], self.letters[a]
+        self.indices[a], self.indices[b] = self.indices[b], self.indices[a]
+        self.last_scored = None
+
+        return self.mono_count, self.rainbow_count
+
+    def undo_swap(self, a:int, b:int)->tuple:
+        """
+        Reverts apply_swap(a, b), and returns the (mono, rainbow) totals from before it.
+        A swap is its own inverse, so this is the same as applying it again.
+
+        Parameters
+        ----------
+        a:int
+            index of the first letter in the permutation
+
+        b:int
+            index of the second letter in the permutation
+        """
+        return self.apply_swap(a, b)
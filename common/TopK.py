@@ -0,0 +1,112 @@
+import heapq
+import itertools
+import numpy as np
+
+class TopK:
+    """
+    A compact, picklable snapshot of the best nodes of a PriorityQueue (or a HallOfFame), sorted from the highest
+    (priority, sub) to the lowest, so that a worker process can send its results to the main process
+    in a single message instead of a queue object.
+    The best nodes of many snapshots are found with a k-way merge of the sorted snapshots, which takes
+    O(capacity log snapshots) instead of draining and re-putting every queue.
+
+    Attributes
+    ----------
+    capacity:int
+        the maximum number of nodes
+
+    priorities:np.ndarray
+        the priority of every node, from the highest to the lowest
+
+    subs:np.ndarray
+        the sub of every node, aligned with priorities
+
+    data:list
+        the data of every node, aligned with priorities
+
+    Methods
+    -------
+    from_queue(queue:PriorityQueue, capacity:int=None)->TopK
+        Class method. Returns a snapshot of the nodes of a queue, without changing the queue
+
+    merge(snapshots:list, capacity:int=None)->TopK
+        Class method. Returns the best nodes of many snapshots
+
+    to_queue(queue:PriorityQueue)->PriorityQueue
+        Puts every node in a queue, and returns it
+    """
+    __slots__ = ('capacity', 'priorities', 'subs', 'data')
+
+    def __init__(self, capacity:int, nodes:list=()):
+        """
+        Constructor from (priority, sub, data) nodes that are already sorted from the highest to the lowest
+        """
+        nodes = list(nodes)[:capacity]
+        self.capacity = capacity
+        self.priorities = np.array([node[0] for node in nodes], dtype=np.int64)
+        self.subs = np.array([node[1] for node in nodes], dtype=np.int64)
+        self.data = [node[2] for node in nodes]
+
+    def __len__(self)->int:
+        return len(self.data)
+
+    def __iter__(self):
+        """
+        Yields the (priority, sub, data) nodes, from the highest to the lowest
+        """
+        return zip(self.priorities.tolist(), self.subs.tolist(), self.data)
+
+    def __str__(self)->str:
+        return "->".join("("+str(priority)+","+str(data)+")" for priority, sub, data in self)
+
+    @classmethod
+    def from_queue(cls, queue, capacity:int=None)->'TopK':
+        """
+        Returns a snapshot of the nodes of a PriorityQueue or a HallOfFame, without changing the queue.
+
+        Parameters
+        ----------
+        queue:PriorityQueue
+            the queue, its nodes are kept from the lowest to the highest
+
+        capacity:int
+            optional, the maximum number of nodes. default value is None, for the capacity of the queue
+        """
+        return cls(queue.capacity if capacity is None else capacity, reversed(queue.nodes))
+
+    @classmethod
+    def merge(cls, snapshots:list, capacity:int=None)->'TopK':
+        """
+        Returns the best nodes of many snapshots, i.e. one per worker process, with a k-way merge.
+        Nodes with the same data (i.e. the record every worker started from) are only kept once,
+        so the data must be hashable (i.e. a string or a tuple), and equal nodes keep the order of the snapshots.
+
+        Parameters
+        ----------
+        snapshots:list
+            the TopK objects to merge
+
+        capacity:int
+            optional, the maximum number of nodes. default value is None, for the largest capacity of the snapshots
+        """
+        if capacity is None:
+            capacity = max((snapshot.capacity for snapshot in snapshots), default=0)
+
+        merged = heapq.merge(*snapshots, key=lambda node: (-node[0], -node[1]))
+
+        seen = set()
+        unique = (node for node in merged if not (node[2] in seen or seen.add(node[2])))
+        return cls(capacity, itertools.islice(unique, capacity))
+
+    def to_queue(self, queue):
+        """
+        Puts every node in a PriorityQueue (or a HallOfFame), and returns it.
+
+        Parameters
+        ----------
+        queue:PriorityQueue
+            the queue that receives the nodes
+        """
+        for priority, sub, data in self:
+            queue.put(priority, sub, data)
+        return queue
@@ -0,0 +1,206 @@
+import math
+import sys
+import numpy as np
+
+class VisitedSet:
+    """
+    Class for the set of the permutations that a tree search has already evaluated, keyed by their canonical keys
+    (see CubeSymmetry.key, 5 bits per letter), where add and in are O(1).
+
+    By default the set is exact, and the full keys are kept as fixed-width byte strings in a sorted NumPy array,
+    so every permutation takes the bytes of its key (23 bytes for 6 cubes with 6 faces, against about 75 for
+    a Python set of the ints). The new keys first go to a small Python set (the buffer), that is merged into the
+    array when it holds a 64th of it, and a lookup is a binary search of the array (a few microseconds, that is
+    nothing next to scoring a permutation). An exact set can not take less than the bytes of the keys.
+    With max_bytes every key is hashed to a 64-bit fingerprint that goes to a Bloom filter of that size instead,
+    for very long runs: its memory is bounded (a few bytes per permutation), but it can report a permutation that
+    was not added as visited (a false positive, that is skipped by the search), and the rate of false positives
+    grows as it fills up (see false_positive_rate).
+
+    Attributes
+    ----------
+    max_bytes:int
+        the size of the Bloom filter in bytes, None for the exact set
+
+    capacity:int
+        the number of permutations the Bloom filter is sized for (it picks the number of hash functions from it)
+
+    hashes:int
+        the number of bits set by every permutation in the Bloom filter
+
+    keys:np.ndarray
+        the keys of the exact set that were merged, sorted, as little-endian byte strings
+
+    buffer:set
+        the keys of the exact set that were not merged yet
+
+    bits:bytearray
+        the bits of the Bloom filter
+
+    Methods
+    -------
+    fingerprint(key:int)->int
+        Static method. Returns the 64-bit fingerprint of a key, for the Bloom filter
+
+    add(key:int)->bool
+        Adds a key, returns True if it was not in the set
+
+    false_positive_rate()->float
+        Returns the probability that a key that was not added is reported as visited
+
+    memory_bytes()->int
+        Returns the approximate memory of the set, in bytes
+
+    stats()->str
+        Returns a one line summary of the size and memory of the set
+    """
+    mask = (1 << 64) - 1
+    #the smallest buffer of the exact set that is merged into the sorted keys
+    min_buffer = 4096
+
+    def __init__(self, max_bytes:int=None, capacity:int=1000000):
+        """
+        Constructor of an empty set, an exact set by default, or a Bloom filter of max_bytes bytes
+        sized for capacity permutations
+        """
+        self.max_bytes = max_bytes
+        self.capacity = capacity
+        self.size = 0
+        if max_bytes is None:
+            self.keys = np.zeros(0, dtype='S1')
+            self.buffer = set()
+            #memory of the ints of the buffer, the set itself is measured by memory_bytes
+            self.buffer_bytes = 0
+            self.hashes = 0
+        else:
+            self.bits = bytearray(max_bytes)
+            self.bit_count = 8*max_bytes
+            self.hashes = min(16, max(1, round(self.bit_count/capacity*math.log(2))))
+
+    @staticmethod
+    def fingerprint(key:int)->int:
+        """
+        Returns the 64-bit fingerprint of a key (never 0), mixing the key 64 bits at a time
+        with the finalizer of splitmix64
+
+        Parameters
+        ----------
+        key:int
+            a canonical key, see CubeSymmetry.key
+        """
+        mask = VisitedSet.mask
+        h = 0
+        while True:
+            h ^= key & mask
+            h = ((h ^ (h >> 30)) * 0xbf58476d1ce4e5b9) & mask
+            h = ((h ^ (h >> 27)) * 0x94d049bb133111eb) & mask
+            h ^= h >> 31
+            key >>= 64
+            if not key:
+                return h or 1
+
+    @staticmethod
+    def key_bytes(key:int)->bytes:
+        """
+        Returns a key as little-endian bytes, without the trailing zero bytes that a NumPy byte string drops
+        """
+        return key.to_bytes((key.bit_length() + 7) // 8, 'little')
+
+    def __len__(self)->int:
+        return self.size
+
+    def __contains__(self, key:int)->bool:
+        if self.max_bytes is None:
+            return key in self.buffer or self.merged(key)
+        return all(self.bits[bit >> 3] & (1 << (bit & 7)) for bit in self.filter_bits(self.fingerprint(key)))
+
+    def add(self, key:int)->bool:
+        """
+        Adds a key to the set. Returns True if it was not in the set, False if it was (or, in a Bloom filter, if it looks like it was)
+
+        Parameters
+        ----------
+        key:int
+            a canonical key, see CubeSymmetry.key
+        """
+        if self.max_bytes is None:
+            if key in self.buffer or self.merged(key):
+                return False
+            self.buffer.add(key)
+            self.buffer_bytes += sys.getsizeof(key)
+            self.size += 1
+            if len(self.buffer) >= max(self.min_buffer, len(self.keys) >> 6):
+                self.merge()
+            return True
+
+        new = False
+        for bit in self.filter_bits(self.fingerprint(key)):
+            if not self.bits[bit >> 3] & (1 << (bit & 7)):
+                self.bits[bit >> 3] |= 1 << (bit & 7)
+                new = True
+        self.size += new
+        return new
+
+    def merged(self, key:int)->bool:
+        """
+        Returns True if a key is in the sorted keys of the exact set, with a binary search
+        """
+        b = self.key_bytes(key)
+        if len(b) > self.keys.itemsize:
+            return False
+        i = int(np.searchsorted(self.keys, b))
+        return i < len(self.keys) and self.keys[i] == b
+
+    def merge(self):
+        """
+        Moves the buffer of the exact set into the sorted keys, widening them when a new key is longer
+        """
+        new = np.array([self.key_bytes(key) for key in self.buffer])
+        new.sort()
+        if new.itemsize > self.keys.itemsize:
+            self.keys = self.keys.astype(new.dtype)
+        self.keys = np.insert(self.keys, np.searchsorted(self.keys, new), new)
+        self.buffer.clear()
+        self.buffer_bytes = 0
+
+    def filter_bits(self, f:int):
+        """
+        Yields the bits of a fingerprint in the Bloom filter, by double hashing with the two halves of the fingerprint
+        """
+        h1, h2 = f >> 32, (f & 0xffffffff) | 1
+        for i in range(self.hashes):
+            yield (h1 + i*h2) % self.bit_count
+
+    def false_positive_rate(self)->float:
+        """
+        Returns the probability that a key that was not added is reported as visited, 0 for the exact set,
+        or the estimate (1 - e^(-hashes*size/bits))^hashes of the Bloom filter
+        """
+        if self.max_bytes is None:
+            return 0.0
+        return (1 - math.exp(-self.hashes*self.size/self.bit_count))**self.hashes
+
+    def memory_bytes(self)->int:
+        """
+        Returns the approximate memory of the set, in bytes: the size of the Bloom filter,
+        or the sorted keys and the buffer (a Python set with the ints of its keys)
+        """
+        if self.max_bytes is not None:
+            return len(self.bits)
+        return self.keys.nbytes + sys.getsizeof(self.buffer) + self.buffer_bytes
+
+    def stats(self)->str:
+        """
+        Returns a one line summary of the size and memory of the set
+
+        Example
+        -------
+        >> stats()
+        >> 'visited: 150000 permutations, 3.5 MB (24.3 bytes each), exact'
+        """
+        memory = self.memory_bytes()
+        line = ('visited: '+str(self.size)+' permutations, '+format(memory/2**20, '.1f')+' MB ('
+                +format(memory/max(1, self.size), '.1f')+' bytes each), ')
+        if self.max_bytes is None:
+            return line+'exact'
+        return line+'Bloom filter with '+str(self.hashes)+' hashes, '+format(100*self.false_positive_rate(), '.3f')+'% false positives'
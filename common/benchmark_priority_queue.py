@@ -0,0 +1,47 @@
+import random
+import time
+from PriorityQueue import PriorityQueue, LinkedPriorityQueue
+
+#compares PriorityQueue with the original LinkedPriorityQueue on the same stream of nodes,
+#with priorities and subs that look like the word counts of the searches (lots of ties),
+#once with puts only (like RandomSearch) and once with a get after every 180 puts (like BestFirstSearch)
+
+random.seed(2000)
+
+capacities = [10, 100, 360, 10000]
+puts = 20000
+
+nodes = []
+for i in range(puts):
+    mono = int(random.gauss(70, 10))
+    rainbow = int(random.gauss(900, 60))
+    nodes.append((rainbow, mono + rainbow, ('permutation', i)))
+
+
+def run(queue, gets_every:int=0)->tuple:
+    """
+    Puts every node in the queue, getting the front node every gets_every puts,
+    and then empties it. Returns the seconds it took, and every node that was got
+    """
+    got = []
+    start = time.perf_counter()
+    for i, (priority, sub, data) in enumerate(nodes):
+        queue.put(priority, sub, data)
+        if gets_every and i % gets_every == gets_every-1:
+            got.append(queue.get())
+    while not queue.is_empty():
+        got.append(queue.get())
+    return time.perf_counter()-start, got
+
+
+print('capacity   pattern         linked (us/put)   sorted array (us/put)   speed-up')
+for capacity in capacities:
+    for pattern, gets_every in (('puts only', 0), ('get every 180', 180)):
+        linked_time, linked_got = run(LinkedPriorityQueue(capacity), gets_every)
+        array_time, array_got = run(PriorityQueue(capacity), gets_every)
+
+        #both queues must return the same nodes, in the same order
+        assert linked_got == array_got, 'the queues disagree at capacity '+str(capacity)
+
+        print(format(capacity, '<10'), format(pattern, '<15'), format(1e6*linked_time/puts, '>15.2f'),
+              format(1e6*array_time/puts, '>23.2f'), format(linked_time/array_time, '>10.1f')+'x')
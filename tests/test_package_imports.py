@@ -0,0 +1,69 @@
+import importlib
+import os
+import sys
+import pytest
+
+#the drivers import the common modules as a package (from ..common.Judge import Judge), while the common modules
+#import each other by name (from CompiledLexicon import CompiledLexicon), so every common class is loaded twice.
+#These tests go through the package import path, like a driver and its pool workers do
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = os.path.basename(ROOT)
+sys.path.insert(0, os.path.dirname(ROOT))
+sys.path.insert(0, os.path.join(ROOT, 'common'))
+
+
+def package_module(name:str):
+    """
+    Imports a module of the repository as a driver sees it, e.g. package_module('common.Judge')
+    """
+    return importlib.import_module(PACKAGE + '.' + name)
+
+
+@pytest.fixture(scope='module')
+def lexicon():
+    #the lexicon reads src/ relative to the working directory
+    cwd = os.getcwd()
+    os.chdir(ROOT)
+    try:
+        yield package_module('common.Lexicon').Lexicon()
+    finally:
+        os.chdir(cwd)
+
+
+def test_letter_reps_of_package_geometry(lexicon):
+    CubeGeometry = package_module('common.CubeGeometry').CubeGeometry
+
+    reps = lexicon.calculate_letter_reps(CubeGeometry(cubes=6, faces=6))
+    assert reps == lexicon.calculate_letter_reps(6)
+    assert len(reps[2]) == 36
+
+
+def test_worker_attaches_shared_lexicon(lexicon):
+    ParallelTempering = package_module('2_simulated_annealing.ParallelTempering')
+    CubeGeometry = package_module('common.CubeGeometry').CubeGeometry
+    Judge = package_module('common.Judge').Judge
+
+    memory, shared = lexicon.compile().share()
+    try:
+        ParallelTempering.init_worker(shared, CubeGeometry())
+        judge = ParallelTempering.judge
+        assert judge.compiled.shared_memory.name == shared['name']
+
+        letters = lexicon.calculate_letter_reps(6)[2]
+        reference = Judge(lexicon.alphabet, lexicon.word_list, compiled=True)
+        assert judge.count_words(letters) == reference.count_words(letters)
+    finally:
+        if ParallelTempering.judge is not None:
+            ParallelTempering.judge.compiled.shared_memory.close()
+        memory.close()
+        memory.unlink()
+
+
+def test_beam_search_random_permutation(lexicon):
+    BeamSearch = package_module('3_n_ary_tree.BeamSearch')
+    base = [lexicon.alphabet[i] for i in lexicon.calculate_letter_reps(BeamSearch.geometry)[1]]
+
+    permutation = BeamSearch.random_permutation(lexicon.alphabet, base)
+    assert sorted(permutation) == sorted(base)
+    assert permutation == BeamSearch.random_permutation(lexicon.alphabet, base)